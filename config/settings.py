@@ -1,6 +1,6 @@
 import os
 from pathlib import Path
-from typing import List, Optional
+from typing import List, Optional, Union
 from pydantic import BaseModel
 from dotenv import load_dotenv
 
@@ -19,9 +19,75 @@ class MemoryConfig(BaseModel):
     """Memory system configuration."""
     db_path: Path
     vector_db_path: Path
-    short_term_capacity: int = 50
+    # Item count (50) or a budget such as "4000 tokens" or "64kb"
+    short_term_capacity: Union[int, str] = 50
+    # Budget eviction: "oldest" first or lowest "score" first
+    short_term_eviction: str = "oldest"
+    # Rollups of evicted short-term items: items per rollup, tier size, flush delay, length
+    rollup_batch_size: int = 10
+    rollup_max_entries: int = 5
+    rollup_flush_seconds: float = 30.0
+    rollup_max_chars: int = 300
+    # Named short-term sessions: append-only log plus compacted checkpoints
+    sessions_path: Path = Path("./data/memory/sessions")
+    session_checkpoint_every: int = 200
+    default_session: str = "default"
+    # Preference cache: write-through delay and batch size, cross-process change check interval
+    preference_flush_seconds: float = 1.0
+    preference_batch_size: int = 50
+    preference_check_seconds: float = 2.0
+    # Request -> tool-call macros mined from history; fast path above min confidence
+    macro_min_support: int = 3
+    macro_min_confidence: float = 0.9
+    pattern_mine_interval_seconds: int = 900
+    pattern_mine_rows: int = 5000
+    # Bulk re-index: embedding processes (0 = in-process) and rows per batch
+    reindex_workers: int = 2
+    reindex_batch_size: int = 256
     long_term_retention_days: int = 30
     embedding_model: str = "all-MiniLM-L6-v2"
+    vector_backend: str = "chroma"  # "chroma" or "flat"
+    # Flat backend search: "exact" scan or "ivf" approximate index
+    vector_index: str = "exact"
+    ivf_nlist: int = 256
+    ivf_nprobe: int = 16
+    ivf_train_size: int = 10_000
+    # Flat backend storage: "none" (float32) or "int8" with per-vector scale
+    vector_quantization: str = "none"
+    pca_dim: Optional[int] = None
+    pca_train_size: int = 10_000
+    # Top candidates re-scored exactly against the embedding cache (0 = off)
+    rerank_candidates: int = 0
+    # Memory namespace; derived from the git root (or cwd) when unset
+    namespace: Optional[str] = None
+    # Scoped retrieval falls back to all namespaces when the current one has too few hits
+    namespace_fallback: bool = True
+    # "month" stores vectors in one collection per UTC month, "none" in one collection
+    vector_partitioning: str = "month"
+    # Partitioned search stops once enough hits are within this distance
+    vector_partition_stop_distance: float = 1.0
+    # Collapse new vectors within this distance (2 - 2cos) of an existing one; 0 = exact only
+    vector_dedup_distance: float = 0.02
+    # Hybrid retrieval: per-leg candidates, vector distance cut-off, RRF constant
+    retrieval_candidates: int = 50
+    retrieval_max_distance: float = 1.0
+    rrf_k: int = 60
+    # Re-ranking: recency half-life and weight, failed-command weight, MMR trade-off
+    recency_half_life_days: float = 14.0
+    recency_weight: float = 0.3
+    failure_weight: float = 0.5
+    mmr_lambda: float = 0.7
+    archive_path: Path = Path("./data/memory/archive")
+    retention_interval_seconds: int = 3600
+    retention_batch_size: int = 500
+    vector_batch_size: int = 64
+    indexer_poll_seconds: float = 1.0
+    query_cache_size: int = 256
+    # Memoized similar-memory results in ContextManager, by normalized query
+    context_cache_size: int = 64
+    # Defaults to embedding_cache.db next to vector_db_path
+    embedding_cache_path: Optional[Path] = None
+    embedding_cache_max_entries: int = 100_000
 
 class SafetyConfig(BaseModel):
     """Safety and validation configuration."""
@@ -45,6 +111,19 @@ class Settings:
         self.memory = MemoryConfig(
             db_path=Path(os.getenv("MEMORY_DB_PATH", "./data/memory/agentos.db")),
             vector_db_path=Path(os.getenv("VECTOR_DB_PATH", "./data/memory/embeddings")),
+            archive_path=Path(os.getenv("MEMORY_ARCHIVE_PATH", "./data/memory/archive")),
+            sessions_path=Path(os.getenv("MEMORY_SESSIONS_PATH", "./data/memory/sessions")),
+            default_session=os.getenv("AGENTOS_SESSION", "default"),
+            namespace=os.getenv("AGENTOS_NAMESPACE") or None,
+            namespace_fallback=os.getenv("MEMORY_NAMESPACE_FALLBACK", "true").lower() == "true",
+            long_term_retention_days=int(os.getenv("MEMORY_RETENTION_DAYS", "30")),
+            short_term_capacity=os.getenv("SHORT_TERM_CAPACITY", "50"),
+            short_term_eviction=os.getenv("SHORT_TERM_EVICTION", "oldest"),
+            retention_interval_seconds=int(os.getenv("MEMORY_RETENTION_INTERVAL", "3600")),
+            vector_backend=os.getenv("VECTOR_BACKEND", "chroma"),
+            vector_index=os.getenv("VECTOR_INDEX", "exact"),
+            vector_quantization=os.getenv("VECTOR_QUANTIZATION", "none"),
+            vector_partitioning=os.getenv("VECTOR_PARTITIONING", "month"),
         )
         
         self.safety = SafetyConfig(
@@ -62,6 +141,8 @@ class Settings:
         """Create required directories."""
         self.memory.db_path.parent.mkdir(parents=True, exist_ok=True)
         self.memory.vector_db_path.mkdir(parents=True, exist_ok=True)
+        self.memory.archive_path.mkdir(parents=True, exist_ok=True)
+        self.memory.sessions_path.mkdir(parents=True, exist_ok=True)
         self.log_path.parent.mkdir(parents=True, exist_ok=True)
 
 settings = Settings()
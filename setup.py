@@ -45,6 +45,8 @@ setup(
     entry_points={
         "console_scripts": [
             "agentos=agentos.cli:main",
+            "agentos-reindex=agentos.cli:reindex",
+            "agentos-gc=agentos.cli:gc",
         ],
     },
     classifiers=[
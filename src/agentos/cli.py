@@ -26,8 +26,8 @@ logger = structlog.get_logger()
 class CLI:
     """Interactive CLI for AgentOS."""
     
-    def __init__(self):
-        self.agent = AgentOS()
+    def __init__(self, session: Optional[str] = None, namespace: Optional[str] = None):
+        self.agent = AgentOS(session=session, namespace=namespace)
         self.session = PromptSession(
             history=FileHistory(".agentos_history"),
             auto_suggest=AutoSuggestFromHistory(),
@@ -47,6 +47,9 @@ Available commands:
   - /help    - Show help
   - /clear   - Clear conversation history
   - /status  - Show system status
+  - /sessions - List saved sessions
+  - /session NAME - Switch to (or create) a named session
+  - /history-stats [DAYS] - Command stats per tool (default 7 days)
   - /exit    - Exit AgentOS
 
 Type your request to begin...
@@ -57,39 +60,42 @@ Type your request to begin...
         """Main CLI loop."""
         self.print_banner()
         
-        while self.running:
-            try:
-                # Get user input
-                user_input = await asyncio.get_event_loop().run_in_executor(
-                    None,
-                    lambda: self.session.prompt("You: ", style="bold green")
-                )
+        try:
+            while self.running:
+                try:
+                    # Get user input
+                    user_input = await asyncio.get_event_loop().run_in_executor(
+                        None,
+                        lambda: self.session.prompt("You: ", style="bold green")
+                    )
                 
-                if not user_input.strip():
-                    continue
+                    if not user_input.strip():
+                        continue
                 
-                # Handle special commands
-                if user_input.startswith("/"):
-                    self._handle_special_command(user_input)
-                    continue
+                    # Handle special commands
+                    if user_input.startswith("/"):
+                        self._handle_special_command(user_input)
+                        continue
                 
-                # Process request
-                console.print("\n[bold cyan]AgentOS:[/bold cyan] Processing...\n")
+                    # Process request
+                    console.print("\n[bold cyan]AgentOS:[/bold cyan] Processing...\n")
                 
-                response = await self.agent.process_request(user_input)
+                    response = await self.agent.process_request(user_input)
                 
-                # Display response
-                self._display_response(response)
+                    # Display response
+                    self._display_response(response)
                 
-            except KeyboardInterrupt:
-                console.print("\n\n[yellow]Use /exit to quit[/yellow]")
-                continue
-            except EOFError:
-                break
-            except Exception as e:
-                logger.error("cli_error", error=str(e))
-                console.print(f"\n[red]Error: {str(e)}[/red]\n")
-        
+                except KeyboardInterrupt:
+                    console.print("\n\n[yellow]Use /exit to quit[/yellow]")
+                    continue
+                except EOFError:
+                    break
+                except Exception as e:
+                    logger.error("cli_error", error=str(e))
+                    console.print(f"\n[red]Error: {str(e)}[/red]\n")
+        finally:
+            # Also on Ctrl+C or an unexpected error: checkpoint the session, stop threads
+            self.agent.context_manager.close()
         console.print("\n[cyan]Goodbye![/cyan]\n")
     
     def _handle_special_command(self, command: str):
@@ -109,6 +115,25 @@ Type your request to begin...
         elif cmd == "/status":
             self._show_status()
         
+        elif cmd == "/history-stats" or cmd.startswith("/history-stats "):
+            parts = cmd.split()
+            if len(parts) > 1 and not parts[1].isdigit():
+                console.print(f"\n[red]Usage: /history-stats [DAYS][/red]\n")
+            else:
+                self._show_history_stats(int(parts[1]) if len(parts) > 1 else 7)
+        
+        elif cmd == "/sessions":
+            self._show_sessions()
+        
+        elif cmd.startswith("/session "):
+            # Session names are case-sensitive, so take them from the raw input
+            name = command.strip().split(maxsplit=1)[1]
+            try:
+                restored = self.agent.context_manager.switch_session(name)
+                console.print(f"\n[green]✓ Switched to session '{name}' ({restored} items restored)[/green]\n")
+            except ValueError as e:
+                console.print(f"\n[red]{str(e)}[/red]\n")
+        
         else:
             console.print(f"\n[red]Unknown command: {command}[/red]\n")
     
@@ -134,6 +159,9 @@ AgentOS understands natural language. Just tell it what you want:
 - `/help` - Show this help
 - `/clear` - Clear conversation memory
 - `/status` - Show system status
+- `/sessions` - List saved sessions
+- `/session NAME` - Save this session and switch to (or create) another
+- `/history-stats [DAYS]` - Commands, failures and latency per tool (default 7 days)
 - `/exit` - Exit AgentOS
 
 ## Tips
@@ -149,6 +177,7 @@ AgentOS understands natural language. Just tell it what you want:
         """Show system status."""
         import psutil
         
+        index_lag = self.agent.context_manager.indexer.lag()
         status = f"""
 [bold cyan]System Status[/bold cyan]
 
@@ -158,10 +187,49 @@ Disk Usage: {psutil.disk_usage('/').percent}%
 
 Session Info:
 - Commands executed: {len(self.agent.context_manager.short_term.get_recent(100))}
+- Session: {self.agent.context_manager.sessions.name}
+- Memory namespace: {self.agent.context_manager.namespace}
 - Active task: {self.agent.context_manager.short_term.get_task_context().get('name', 'None')}
+- Vector index lag: {index_lag['pending']} pending ({index_lag['oldest_age_seconds']:.1f}s oldest)
 """
         console.print(Panel(status, border_style="cyan"))
     
+    def _show_history_stats(self, days: int):
+        """Show per-tool command stats from the daily rollup."""
+        from rich.table import Table
+        
+        stats = self.agent.context_manager.long_term.command_stats(days=max(days, 1))
+        if not stats:
+            console.print(f"\n[yellow]No commands in the last {days} days[/yellow]\n")
+            return
+        table = Table(title=f"Command history - last {days} days", border_style="cyan")
+        table.add_column("Tool", style="bold")
+        table.add_column("Runs", justify="right")
+        table.add_column("Failed", justify="right", style="red")
+        table.add_column("Success", justify="right")
+        table.add_column("Avg ms", justify="right")
+        for row in stats:
+            table.add_row(
+                row["tool"],
+                str(row["count"]),
+                str(row["failure_count"]),
+                f"{row['success_rate']:.0%}",
+                f"{row['avg_duration_ms']:.0f}",
+            )
+        total = sum(row["count"] for row in stats)
+        failed = sum(row["failure_count"] for row in stats)
+        table.caption = f"{total} commands, {failed} failed"
+        console.print(table)
+    
+    def _show_sessions(self):
+        """List saved sessions, marking the current one."""
+        current = self.agent.context_manager.sessions.name
+        names = self.agent.context_manager.list_sessions()
+        if current not in names:
+            names.append(current)
+        lines = [f"{'*' if name == current else ' '} {name}" for name in sorted(names)]
+        console.print(Panel("\n".join(lines), title="[bold cyan]Sessions[/bold cyan]", border_style="cyan"))
+    
     def _display_response(self, response: str):
         """Display agent response with formatting."""
         console.print(Panel(
@@ -173,7 +241,9 @@ Session Info:
 
 @click.command()
 @click.option('--debug', is_flag=True, help='Enable debug logging')
-def main(debug: bool):
+@click.option('--session', default=None, help='Named session to restore (default: AGENTOS_SESSION or "default")')
+@click.option('--namespace', default=None, help='Memory namespace (default: AGENTOS_NAMESPACE, else the git root or cwd)')
+def main(debug: bool, session: Optional[str], namespace: Optional[str]):
     """Launch AgentOS CLI."""
     if debug:
         settings.log_level = "DEBUG"
@@ -186,11 +256,63 @@ def main(debug: bool):
     )
     
     # Run CLI
-    cli = CLI()
+    cli = CLI(session=session, namespace=namespace)
     try:
         asyncio.run(cli.run())
     except KeyboardInterrupt:
         console.print("\n[yellow]Interrupted[/yellow]")
 
+@click.command()
+@click.option('--kind', 'kinds', type=click.Choice(["commands", "tasks"]), multiple=True,
+              help='Collection to rebuild (default: both)')
+@click.option('--workers', type=int, default=None, help='Embedding processes (0 = in-process)')
+@click.option('--batch-size', type=int, default=None, help='History rows per embedding batch')
+@click.option('--reset', is_flag=True, help='Drop the vector collections first (e.g. after a backend change)')
+@click.option('--restart', is_flag=True, help='Ignore any checkpoint from an interrupted run')
+def reindex(kinds, workers: Optional[int], batch_size: Optional[int], reset: bool, restart: bool):
+    """Rebuild vector memory from SQLite history."""
+    from rich.progress import BarColumn, Progress, TextColumn, TimeRemainingColumn
+    from agentos.memory.long_term import LongTermMemory
+    from agentos.memory.vector_store import VectorStore
+    from agentos.memory.reindex import Reindexer
+    
+    reindexer = Reindexer(LongTermMemory(), VectorStore(), workers=workers, batch_size=batch_size)
+    with Progress(
+        TextColumn("[cyan]{task.description}"),
+        BarColumn(),
+        TextColumn("{task.completed}/{task.total} rows"),
+        TextColumn("{task.fields[rate]:.0f} rows/s"),
+        TimeRemainingColumn(),
+        console=console,
+    ) as progress_bar:
+        tasks = {}
+        
+        def on_progress(kind: str, done: int, total: int, rate: float):
+            if kind not in tasks:
+                tasks[kind] = progress_bar.add_task(kind, total=total, rate=0.0)
+            progress_bar.update(tasks[kind], completed=done, rate=rate)
+        
+        report = reindexer.run(kinds=kinds or ("commands", "tasks"), reset=reset, restart=restart, progress=on_progress)
+    
+    resumed = " (resumed)" if report.resumed else ""
+    for kind, rows in report.rows.items():
+        console.print(f"[green]✓ {kind}: {rows} rows, {report.inserted[kind]} new entries[/green]")
+    console.print(f"[cyan]Reindexed in {report.seconds:.1f}s - {report.rows_per_second:.0f} rows/s{resumed}[/cyan]")
+
+@click.command()
+@click.option('--days', type=int, default=None, help='Also drop vectors older than this (default: the retention window)')
+@click.option('--batch-size', type=int, default=500, help='Entries per page and per delete')
+def gc(days: Optional[int], batch_size: int):
+    """Scan the whole vector index and delete entries whose history row is gone."""
+    from datetime import datetime, timedelta, timezone
+    from agentos.memory.long_term import LongTermMemory
+    from agentos.memory.vector_store import VectorStore
+    
+    retention_days = days if days is not None else settings.memory.long_term_retention_days
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    removed = VectorStore().garbage_collect(LongTermMemory(), cutoff=cutoff, batch_size=batch_size)
+    for kind, count in removed.items():
+        console.print(f"[green]✓ {kind}: {count} entries removed[/green]")
+
 if __name__ == "__main__":
     main()
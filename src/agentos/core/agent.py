@@ -1,4 +1,6 @@
 import json
+import time
+import uuid
 from typing import Dict, Any, List, Optional
 import structlog
 
@@ -23,7 +25,7 @@ class AgentOS:
     - Safety checks
     """
     
-    def __init__(self):
+    def __init__(self, session: Optional[str] = None, namespace: Optional[str] = None):
         print(f"[DEBUG] AgentOS initializing...")
         # LLM client
         print(f"[DEBUG] Initializing LLM client...")
@@ -32,7 +34,7 @@ class AgentOS:
         
         # Memory system
         print(f"[DEBUG] Initializing memory system...")
-        self.context_manager = ContextManager()
+        self.context_manager = ContextManager(session=session, namespace=namespace)
         print(f"[DEBUG] Memory system initialized")
         
         # Tools
@@ -113,11 +115,22 @@ SAFETY:
         3. Execute tools
         4. Update memory
         5. Return response
+        
+        A request matching a high-confidence learned macro of read-only
+        tools skips steps 1-2 and runs the macro's calls directly.
         """
         print(f"[DEBUG] Processing request - Input: {user_input[:80]}")
         logger.info("processing_request", input=user_input[:100])
+        request_id = uuid.uuid4().hex
         
         try:
+            # Fast path: a learned macro replaces the planning call
+            macro = self.context_manager.patterns.match(user_input)
+            if macro is not None:
+                result = self._run_macro(user_input, macro, request_id)
+                if result is not None:
+                    return result
+            
             # Step 1: Build context
             print(f"[DEBUG] Step 1: Building context from memory...")
             context = self.context_manager.get_context_for_query(user_input)
@@ -141,6 +154,7 @@ SAFETY:
                     user_input,
                     response["tool_calls"],
                     messages,
+                    request_id=request_id,
                 )
                 if result:
                     return result
@@ -168,6 +182,7 @@ SAFETY:
         original_request: str,
         tool_calls: List[Dict[str, Any]],
         messages: List[Dict[str, str]],
+        request_id: Optional[str] = None,
     ) -> str:
         """Execute tools and get final response."""
         print(f"[DEBUG] Handling tool execution - Tool calls: {len(tool_calls)}")
@@ -182,7 +197,9 @@ SAFETY:
             logger.info("executing_tool", tool=tool_name, args=arguments)
             
             # Route to appropriate tool
+            started = time.perf_counter()
             result = self._execute_tool(tool_name, arguments)
+            duration_ms = int((time.perf_counter() - started) * 1000)
             print(f"[DEBUG] Tool execution completed - Result success: {result.get('success', False)}")
             
             tool_results.append({
@@ -194,9 +211,14 @@ SAFETY:
             print(f"[DEBUG] Recording command in memory...")
             self.context_manager.record_command(
                 command=f"{tool_name}({json.dumps(arguments)})",
-                output=json.dumps(result)[:500],
+                output=json.dumps(result),
                 success=result.get("success", False),
-                metadata={"tool": tool_name},
+                metadata={
+                    "tool": tool_name,
+                    "request": original_request,
+                    "request_id": request_id,
+                    "duration_ms": duration_ms,
+                },
             )
         
         # Add tool calls to messages
@@ -256,6 +278,35 @@ SAFETY:
         print(f"[DEBUG] Returning response content of length: {len(response_content)}")
         return response_content
     
+    def _run_macro(self, user_input: str, macro: Dict[str, Any], request_id: str) -> Optional[str]:
+        """Execute a learned macro; returns None if a call fails so the LLM takes over."""
+        print(f"[DEBUG] Running learned macro {macro['id']} - Calls: {len(macro['calls'])}, Confidence: {macro['confidence']:.2f}")
+        tool_results = []
+        for tool_name, arguments in macro["calls"]:
+            started = time.perf_counter()
+            result = self._execute_tool(tool_name, arguments)
+            duration_ms = int((time.perf_counter() - started) * 1000)
+            self.context_manager.record_command(
+                command=f"{tool_name}({json.dumps(arguments)})",
+                output=json.dumps(result),
+                success=result.get("success", False),
+                metadata={
+                    "tool": tool_name,
+                    "request": user_input,
+                    "request_id": request_id,
+                    "macro_id": macro["id"],
+                    "duration_ms": duration_ms,
+                },
+            )
+            if not result.get("success", False):
+                logger.info("macro_fallback", macro_id=macro["id"], tool=tool_name)
+                print(f"[DEBUG] Macro call failed, falling back to LLM planning - Tool: {tool_name}")
+                return None
+            tool_results.append({"tool": tool_name, "result": result})
+        self.context_manager.patterns.record_use(macro["id"])
+        logger.info("macro_executed", macro_id=macro["id"], calls=len(tool_results))
+        return self._format_tool_results(tool_results, user_input)
+    
     def _format_tool_results(self, tool_results: List[Dict[str, Any]], original_request: str) -> str:
         """Format tool results into a readable response when LLM returns None."""
         print(f"[DEBUG] Formatting tool results - Count: {len(tool_results)}")
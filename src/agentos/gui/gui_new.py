@@ -447,6 +447,8 @@ EXAMPLES:
     def on_exit(self):
         """Exit application"""
         if messagebox.askokcancel("Exit", "Exit AgentOS Terminal?"):
+            if self.agent_ready:
+                self.agent.context_manager.close()
             self.root.quit()
     
     def run(self):
@@ -7,6 +7,22 @@ Classes:
     - ContextManager: Unified interface for all memory systems
     - VectorStore: Semantic search using ChromaDB
     - CircularBuffer: Fixed-size memory buffer for efficient storage
+    - BlobStore: Compressed, content-addressed storage for command outputs
+    - RetentionJob: Background archival, batched cleanup and vacuum
+    - VectorIndexer: Background indexer draining the durable vector outbox
+    - EmbeddingCache: Persistent embedding cache keyed by model and text hash
+    - FlatVectorClient: In-process NumPy exact-search vector backend
+    - IVFIndex: Inverted-file approximate index for very large collections
+    - Int8Codec / PCAProjector: Compressed embedding storage for the flat backend
+    - HybridRetriever: BM25 + vector retrieval fused with reciprocal-rank fusion
+    - MemoryReranker: Recency, outcome and MMR diversity re-ranking of retrieved memories
+    - RollupSummarizer: Background rollups of items evicted from short-term memory
+    - SessionStore: Named short-term sessions persisted as a log plus checkpoints
+    - MemoryWriter: Single-writer queue that serializes memory mutations
+    - PreferenceCache: In-memory preferences with batched background write-through
+    - PatternMiner: Mines request -> tool-call macros from history for a no-LLM fast path
+    - Reindexer: Parallel, resumable rebuild of the vector store from SQLite history
+    - resolve_namespace: Per-project memory namespace from the git root or cwd
 """
 
 from .short_term import ShortTermMemory, MemoryItem
@@ -14,6 +30,22 @@ from .long_term import LongTermMemory
 from .context_manager import ContextManager
 from .vector_store import VectorStore
 from .buffer import CircularBuffer
+from .blob_store import BlobStore
+from .retention import RetentionJob, RetentionReport
+from .indexer import VectorIndexer
+from .embedding_cache import EmbeddingCache, CachedEmbedder
+from .flat_index import FlatCollection, FlatVectorClient
+from .ann_index import IVFIndex
+from .quantization import Int8Codec, PCAProjector, measure_compression
+from .retrieval import HybridRetriever
+from .reranker import MemoryReranker
+from .rollup import RollupSummarizer, Rollup
+from .session_store import SessionStore
+from .writer import MemoryWriter
+from .preferences import PreferenceCache
+from .patterns import PatternMiner
+from .reindex import Reindexer, ReindexReport
+from .namespace import resolve_namespace, namespace_for
 
 __all__ = [
     "ShortTermMemory",
@@ -22,6 +54,30 @@ __all__ = [
     "ContextManager",
     "VectorStore",
     "CircularBuffer",
+    "BlobStore",
+    "RetentionJob",
+    "RetentionReport",
+    "VectorIndexer",
+    "EmbeddingCache",
+    "CachedEmbedder",
+    "FlatCollection",
+    "FlatVectorClient",
+    "IVFIndex",
+    "Int8Codec",
+    "PCAProjector",
+    "measure_compression",
+    "HybridRetriever",
+    "MemoryReranker",
+    "RollupSummarizer",
+    "Rollup",
+    "SessionStore",
+    "MemoryWriter",
+    "PreferenceCache",
+    "PatternMiner",
+    "Reindexer",
+    "ReindexReport",
+    "resolve_namespace",
+    "namespace_for",
 ]
 
 print(f"[DEBUG] Memory system module loaded")
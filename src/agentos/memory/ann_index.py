@@ -0,0 +1,184 @@
+"""
+Approximate nearest-neighbour search for very large vector collections.
+
+`IVFIndex` is an inverted-file index: a spherical k-means coarse quantizer
+splits unit vectors into `nlist` cells and a query only scans the `nprobe`
+closest cells. Recall trades against latency through `nprobe`.
+
+Run this file directly for a recall@k benchmark against exact search:
+
+    python src/agentos/memory/ann_index.py --n 100000 --nprobe 4 8 16 32
+"""
+
+import argparse
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+import structlog
+
+logger = structlog.get_logger()
+
+# Rows per block when assigning vectors to centroids, to bound memory
+ASSIGN_BLOCK_ROWS = 65536
+
+class IVFIndex:
+    """
+    Inverted-file index over unit-normalised vectors.
+
+    The index stores only slot numbers per cell; vectors stay in the owning
+    collection. Once trained, new vectors are assigned to their nearest
+    centroid as they arrive, so the index builds incrementally. Only the
+    centroids are persisted; cell membership is recomputed on load with
+    one blocked matrix product.
+    """
+
+    def __init__(self, nlist: int = 256, nprobe: int = 16):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.centroids: Optional[np.ndarray] = None
+        self._lists: List[List[int]] = []
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def train(self, vectors: np.ndarray, iterations: int = 10, seed: int = 0) -> None:
+        """Fit the coarse quantizer with spherical k-means."""
+        rng = np.random.default_rng(seed)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        nlist = min(self.nlist, len(vectors))
+        centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            assignment = self._assign(vectors, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, vectors)
+            counts = np.bincount(assignment, minlength=nlist)
+            empty = counts == 0
+            if empty.any():
+                # Re-seed empty cells from random points
+                sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = sums / norms
+
+        self.centroids = centroids.astype(np.float32)
+        self.nlist = nlist
+        self._lists = [[] for _ in range(nlist)]
+        print(f"[DEBUG] IVFIndex trained - Cells: {nlist}, Training vectors: {len(vectors)}")
+
+    @staticmethod
+    def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        assignment = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), ASSIGN_BLOCK_ROWS):
+            block = vectors[start:start + ASSIGN_BLOCK_ROWS]
+            assignment[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        return assignment
+
+    def add(self, slots: Sequence[int], vectors: np.ndarray) -> None:
+        """Assign new vectors (already stored at `slots`) to their cells."""
+        if not self.is_trained or not len(slots):
+            return
+        for slot, cell in zip(slots, self._assign(np.asarray(vectors, dtype=np.float32), self.centroids)):
+            self._lists[cell].append(int(slot))
+
+    def reset(self, slots: Sequence[int], vectors: np.ndarray) -> None:
+        """Rebuild cell membership for the given slots (after load or compaction)."""
+        if not self.is_trained:
+            return
+        self._lists = [[] for _ in range(self.nlist)]
+        self.add(slots, vectors)
+
+    def candidates(self, query: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        """Slots in the `nprobe` cells closest to the query."""
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        scores = self.centroids @ query
+        cells = np.argpartition(-scores, nprobe - 1)[:nprobe]
+        members = [self._lists[cell] for cell in cells if self._lists[cell]]
+        if not members:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate([np.asarray(m, dtype=np.int64) for m in members])
+
+    def save(self, path: Path) -> None:
+        if self.is_trained:
+            np.save(Path(path), self.centroids)
+
+    def load(self, path: Path) -> bool:
+        path = Path(path)
+        if not path.exists():
+            return False
+        self.centroids = np.load(path)
+        self.nlist = len(self.centroids)
+        self._lists = [[] for _ in range(self.nlist)]
+        return True
+
+def recall_at_k(approx_ids: Sequence[Sequence[int]], exact_ids: Sequence[Sequence[int]], k: int) -> float:
+    """Mean fraction of the exact top-k found in the approximate top-k."""
+    hits = [
+        len(set(list(approx)[:k]) & set(list(exact)[:k])) / k
+        for approx, exact in zip(approx_ids, exact_ids)
+    ]
+    return float(np.mean(hits)) if hits else 0.0
+
+def synthetic_history(n: int, dim: int = 384, clusters: int = 500, seed: int = 0) -> np.ndarray:
+    """Clustered unit vectors resembling a history of repeated, similar commands."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, n)] + 0.35 * rng.normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def run_recall_benchmark(
+    n: int = 50_000,
+    dim: int = 384,
+    queries: int = 200,
+    k: int = 10,
+    nlist: int = 256,
+    nprobes: Sequence[int] = (1, 4, 8, 16, 32),
+    seed: int = 0,
+) -> List[Dict[str, float]]:
+    """Measure recall@k and per-query latency of IVF against exact search."""
+    corpus = synthetic_history(n, dim, seed=seed)
+    query_vectors = synthetic_history(queries, dim, seed=seed + 1)
+
+    started = time.perf_counter()
+    exact = [np.argsort(-(corpus @ q))[:k] for q in query_vectors]
+    exact_ms = (time.perf_counter() - started) * 1000 / queries
+
+    index = IVFIndex(nlist=nlist)
+    index.train(corpus[: min(n, nlist * 64)])
+    index.add(range(n), corpus)
+
+    results = []
+    for nprobe in nprobes:
+        started = time.perf_counter()
+        approx = []
+        for q in query_vectors:
+            pool = index.candidates(q, nprobe)
+            scores = corpus[pool] @ q
+            top = min(k, len(pool))
+            order = np.argpartition(-scores, top - 1)[:top] if top else np.zeros(0, dtype=np.int64)
+            approx.append(pool[order[np.argsort(-scores[order])]])
+        ivf_ms = (time.perf_counter() - started) * 1000 / queries
+        results.append({
+            "nprobe": nprobe,
+            f"recall@{k}": recall_at_k(approx, exact, k),
+            "ivf_ms": ivf_ms,
+            "exact_ms": exact_ms,
+        })
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="IVF recall@k benchmark against exact search")
+    parser.add_argument("--n", type=int, default=50_000, help="Synthetic history size")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=256)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    rows = run_recall_benchmark(args.n, args.dim, args.queries, args.k, args.nlist, args.nprobe)
+    print(f"{'nprobe':>7} {'recall@' + str(args.k):>10} {'ivf ms':>9} {'exact ms':>9}")
+    for row in rows:
+        print(f"{row['nprobe']:>7} {row[f'recall@{args.k}']:>10.3f} {row['ivf_ms']:>9.2f} {row['exact_ms']:>9.2f}")
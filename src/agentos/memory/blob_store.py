@@ -0,0 +1,108 @@
+import hashlib
+import sqlite3
+import zlib
+from pathlib import Path
+from typing import Callable, Dict, Optional
+import structlog
+
+from config.settings import settings
+
+logger = structlog.get_logger()
+
+class BlobStore:
+    """
+    Content-addressed, compressed storage for command outputs.
+
+    Outputs are keyed by their SHA-256 hash and zlib-compressed into a
+    side table of the memory database, so repeated outputs (the same
+    `ls` or `git status`) are stored once no matter how often they occur.
+    `connect` lets the owner share its per-thread connections.
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[Path] = None,
+        compression_level: int = 6,
+        connect: Optional[Callable[[], sqlite3.Connection]] = None,
+    ):
+        self.db_path = db_path or settings.memory.db_path
+        self.compression_level = compression_level
+        self._connect = connect or (lambda: sqlite3.connect(self.db_path))
+        self._init_table()
+        print(f"[DEBUG] BlobStore initialized - DB Path: {self.db_path}")
+
+    def _init_table(self) -> None:
+        """Create the blob side table."""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS output_blobs (
+                    hash TEXT PRIMARY KEY,
+                    data BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    compressed_size INTEGER NOT NULL,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            conn.commit()
+
+    @staticmethod
+    def hash_content(content: str) -> str:
+        """Return the content address for a text blob."""
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def put(self, content: str, conn: Optional[sqlite3.Connection] = None) -> str:
+        """
+        Store content and return its hash.
+
+        Identical content is deduplicated. When `conn` is given the insert
+        joins the caller's transaction instead of committing on its own.
+        """
+        digest = self.hash_content(content)
+        raw = content.encode("utf-8")
+        compressed = zlib.compress(raw, self.compression_level)
+        params = (digest, compressed, len(raw), len(compressed))
+        sql = """
+            INSERT OR IGNORE INTO output_blobs (hash, data, size, compressed_size)
+            VALUES (?, ?, ?, ?)
+        """
+        if conn is not None:
+            conn.execute(sql, params)
+        else:
+            with self._connect() as own_conn:
+                own_conn.execute(sql, params)
+                own_conn.commit()
+        return digest
+
+    def get(self, digest: str) -> Optional[str]:
+        """Fetch and decompress a blob by hash."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT data FROM output_blobs WHERE hash = ?", (digest,)
+            ).fetchone()
+        if row is None:
+            print(f"[DEBUG] Blob not found - Hash: {digest[:12]}")
+            return None
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def prune_unreferenced(self) -> int:
+        """Delete blobs no longer referenced by any command history row."""
+        with self._connect() as conn:
+            cursor = conn.execute("""
+                DELETE FROM output_blobs
+                WHERE hash NOT IN (
+                    SELECT output_hash FROM command_history
+                    WHERE output_hash IS NOT NULL
+                )
+            """)
+            conn.commit()
+            removed = cursor.rowcount
+        logger.info("blobs_pruned", count=removed)
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        """Return blob count and raw/compressed byte totals."""
+        with self._connect() as conn:
+            count, size, compressed = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(compressed_size), 0) FROM output_blobs"
+            ).fetchone()
+        return {"blobs": count, "raw_bytes": size, "compressed_bytes": compressed}
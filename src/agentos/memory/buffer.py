@@ -1,4 +1,5 @@
 from collections import deque
+from itertools import islice
 from typing import Any, Optional
 
 class CircularBuffer:
@@ -22,7 +23,9 @@ class CircularBuffer:
     
     def get_recent(self, n: int) -> list:
         """Get n most recent items."""
-        recent_items = list(self.buffer)[-n:]
+        # Walk back from the newest end instead of copying the whole buffer
+        recent_items = list(islice(reversed(self.buffer), max(n, 0)))
+        recent_items.reverse()
         print(f"[DEBUG] Retrieved recent items from CircularBuffer - Count: {len(recent_items)}/{n}")
         return recent_items
     
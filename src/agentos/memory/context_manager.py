@@ -1,12 +1,34 @@
-from typing import Any, Dict, List, Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import functools
+import threading
 import structlog
 
+from config.settings import settings
 from .short_term import ShortTermMemory
-from .long_term import LongTermMemory
+from .long_term import LongTermMemory, OUTPUT_PREVIEW_CHARS
 from .vector_store import VectorStore
+from .retention import RetentionJob
+from .indexer import VectorIndexer
+from .retrieval import HybridRetriever
+from .reranker import MemoryReranker
+from .rollup import RollupSummarizer
+from .session_store import SessionStore
+from .writer import MemoryWriter
+from .preferences import PreferenceCache
+from .patterns import PatternMiner
+from .namespace import resolve_namespace
 
 logger = structlog.get_logger()
 
+def _serialized(method: Callable) -> Callable:
+    """Run a mutating method on the memory writer thread and wait for it."""
+    @functools.wraps(method)
+    def wrapper(self: "ContextManager", *args: Any, **kwargs: Any) -> Any:
+        return self.writer.call(method, self, *args, **kwargs)
+    return wrapper
+
 class ContextManager:
     """
     Manages all memory systems and provides unified context.
@@ -15,18 +37,81 @@ class ContextManager:
     - Short-term (working memory)
     - Long-term (persistent storage)
     - Vector store (semantic search)
+    - Hybrid retrieval (BM25 + vector, fused)
+    - Retention (background archival and cleanup)
+    - Rollups (background summaries of items evicted from short-term memory)
+    - Sessions (named short-term memory restored across restarts)
+    - Preferences (in-memory, written through in the background)
+    - Patterns (request -> tool-call macros mined from history)
+    - Namespaces (history tagged and retrieved per project)
+    
+    Context builds are memoized. The recent-actions list and the summary
+    are cached against a short-term version. Similar commands/tasks are
+    cached per normalized query against a history version. Recording a
+    command or task bumps both versions. Clearing the session bumps only
+    the short-term one. Background indexing and retention passes also
+    invalidate the similar results.
+    
+    Safe for concurrent requests. Every mutation (recording, clearing,
+    switching sessions) runs on one writer thread, in submission order.
+    Context building reads short-term snapshots and per-thread SQLite
+    connections, so it takes no locks beyond the result caches.
     """
     
-    def __init__(self):
+    def __init__(self, session: Optional[str] = None, namespace: Optional[str] = None):
         print(f"[DEBUG] ContextManager initializing...")
-        self.short_term = ShortTermMemory()
+        self.namespace = resolve_namespace(namespace)
+        print(f"[DEBUG] Memory namespace: {self.namespace}")
+        self.writer = MemoryWriter()
+        self.writer.start()
+        self.rollups = RollupSummarizer()
+        self.rollups.start()
+        self.short_term = ShortTermMemory(on_evict=self.rollups.submit)
         print(f"[DEBUG] ShortTermMemory initialized")
+        self.sessions = SessionStore()
+        self.sessions.open(session or settings.memory.default_session, self.short_term)
         self.long_term = LongTermMemory()
         print(f"[DEBUG] LongTermMemory initialized")
+        self.preferences = PreferenceCache(self.long_term)
+        self.preferences.start()
+        self.long_term.preference_cache = self.preferences
         self.vector_store = VectorStore()
         print(f"[DEBUG] VectorStore initialized")
+        self._search_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="memory-search")
+        self.retriever = HybridRetriever(
+            self.long_term,
+            self.vector_store,
+            executor=self._search_pool,
+            reranker=MemoryReranker(self.vector_store.embedder),
+            namespace=self.namespace,
+        )
+        self.indexer = VectorIndexer(self.long_term, self.vector_store)
+        self.indexer.start()
+        self.retention = RetentionJob(self.long_term, vector_store=self.vector_store)
+        self.retention.start()
+        self.patterns = PatternMiner(self.long_term)
+        self.patterns.start()
+        self._short_term_version = 0
+        self._history_version = 0
+        self._cache_lock = threading.Lock()
+        self._recent_cache: Optional[Tuple[Any, List[Dict[str, Any]]]] = None
+        self._summary_cache: Optional[Tuple[Any, str]] = None
+        self._similar_cache: OrderedDict = OrderedDict()
         print(f"[DEBUG] ContextManager initialized successfully")
     
+    def close(self) -> None:
+        """Stop background memory jobs."""
+        print(f"[DEBUG] ContextManager shutting down background jobs")
+        self.writer.stop()
+        self.retention.stop()
+        self.patterns.stop()
+        self.indexer.stop()
+        self.rollups.stop()
+        self.preferences.stop()
+        self.sessions.close()
+        self._search_pool.shutdown(wait=False)
+    
+    @_serialized
     def record_command(
         self,
         command: str,
@@ -34,26 +119,42 @@ class ContextManager:
         success: bool,
         metadata: Optional[Dict[str, Any]] = None,
     ) -> None:
-        """Record command across all memory systems."""
+        """
+        Record command across all memory systems.
+        
+        Only SQLite is written on the request path: the history row, and for
+        successful commands a vector outbox row that the background indexer
+        embeds later. The full output is kept in long-term memory; short-term
+        memory and the vector store only hold previews.
+        """
         print(f"[DEBUG] Recording command across memory systems - Command: {command[:50]}, Success: {success}")
+        # Long-term memory (+ vector outbox for successful commands)
+        index_document = (
+            VectorStore.command_document(command, output[:OUTPUT_PREVIEW_CHARS]) if success else None
+        )
+        command_id = self.long_term.add_command(
+            command, output, success, metadata, index_document=index_document, namespace=self.namespace
+        )
+        
         # Short-term memory
         self.short_term.add(
             content=f"Command: {command}\nOutput: {output[:200]}",
             item_type="command",
-            metadata={"success": success, **(metadata or {})},
+            metadata={"success": success, "command_id": command_id, **(metadata or {})},
         )
         
-        # Long-term memory
-        self.long_term.add_command(command, output, success, metadata)
-        
-        # Vector store (only successful commands)
+        self._bump_versions()
         if success:
-            print(f"[DEBUG] Adding command to vector store")
-            self.vector_store.add_command(command, output, metadata)
+            self.indexer.wake()
         
         logger.info("command_recorded", command=command[:50], success=success)
         print(f"[DEBUG] Command recorded successfully across all memory systems")
     
+    def get_command_output(self, command_id: int) -> Optional[str]:
+        """Lazily fetch the full output of a recorded command."""
+        return self.long_term.get_command_output(command_id)
+    
+    @_serialized
     def record_task(
         self,
         description: str,
@@ -69,16 +170,84 @@ class ContextManager:
             item_type="task",
         )
         
-        # Long-term
-        self.long_term.add_task(description, steps, outcome, duration_seconds)
-        
-        # Vector store
-        print(f"[DEBUG] Adding task to vector store")
-        self.vector_store.add_task(description, steps, outcome)
+        # Long-term (+ vector outbox)
+        self.long_term.add_task(
+            description,
+            steps,
+            outcome,
+            duration_seconds,
+            index_document=VectorStore.task_document(description, steps, outcome),
+            namespace=self.namespace,
+        )
+        self._bump_versions()
+        self.indexer.wake()
         
         logger.info("task_recorded", description=description[:50])
         print(f"[DEBUG] Task recorded successfully across all memory systems")
     
+    def _bump_versions(self, history: bool = True) -> None:
+        with self._cache_lock:
+            self._short_term_version += 1
+            if history:
+                self._history_version += 1
+    
+    def _history_key(self) -> Tuple[int, int, int]:
+        # Search results change when history is recorded, indexed or purged
+        return (self._history_version, self.indexer.indexed_total, self.retention.passes)
+    
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        return " ".join(query.lower().split())
+    
+    def _recent_actions(self) -> List[Dict[str, Any]]:
+        version = self._short_term_version
+        cached = self._recent_cache
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        recent = self.short_term.get_recent(10)
+        print(f"[DEBUG] Retrieved {len(recent)} recent actions")
+        actions = [
+            {
+                "type": item.item_type,
+                "content": item.content,
+                "timestamp": item.timestamp.isoformat(),
+            }
+            for item in recent
+        ]
+        self._recent_cache = (version, actions)
+        return actions
+    
+    def _summary(self, task_ctx: Dict[str, Any]) -> str:
+        key = (self._short_term_version, task_ctx.get("name"), self.rollups.version)
+        cached = self._summary_cache
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        summary = self.short_term.get_context_summary()
+        rollups = self.rollups.rollups()
+        if rollups:
+            summary += "\nEarlier in session:\n" + "\n".join(f"  {rollup}" for rollup in rollups)
+        self._summary_cache = (key, summary)
+        return summary
+    
+    def _similar(self, query: str) -> Dict[str, List[Dict[str, Any]]]:
+        normalized = self.normalize_query(query)
+        key = self._history_key()
+        with self._cache_lock:
+            cached = self._similar_cache.get(normalized)
+            if cached is not None and cached[0] == key:
+                self._similar_cache.move_to_end(normalized)
+                print(f"[DEBUG] Context cache hit - Query: {normalized[:50]}")
+                return cached[1]
+        
+        similar = self.retriever.retrieve(query, {"commands": 3, "tasks": 2})
+        
+        with self._cache_lock:
+            self._similar_cache[normalized] = (key, similar)
+            self._similar_cache.move_to_end(normalized)
+            while len(self._similar_cache) > settings.memory.context_cache_size:
+                self._similar_cache.popitem(last=False)
+        return similar
+    
     def get_context_for_query(self, query: str) -> Dict[str, Any]:
         """
         Build comprehensive context for a query.
@@ -98,16 +267,7 @@ class ContextManager:
         }
         
         # Recent actions from short-term memory
-        recent = self.short_term.get_recent(10)
-        print(f"[DEBUG] Retrieved {len(recent)} recent actions")
-        context["recent_actions"] = [
-            {
-                "type": item.item_type,
-                "content": item.content,
-                "timestamp": item.timestamp.isoformat(),
-            }
-            for item in recent
-        ]
+        context["recent_actions"] = self._recent_actions()
         
         # Current task context
         task_ctx = self.short_term.get_task_context()
@@ -115,18 +275,15 @@ class ContextManager:
             print(f"[DEBUG] Found active task: {task_ctx.get('name')}")
             context["current_task"] = task_ctx
         
-        # Similar past commands (semantic search)
-        similar_cmds = self.vector_store.search_similar_commands(query, n_results=3)
-        print(f"[DEBUG] Found {len(similar_cmds)} similar commands")
-        context["similar_commands"] = similar_cmds
-        
-        # Similar past tasks
-        similar_tasks = self.vector_store.search_similar_tasks(query, n_results=2)
-        print(f"[DEBUG] Found {len(similar_tasks)} similar tasks")
-        context["similar_tasks"] = similar_tasks
+        # Similar past commands and tasks: lexical and vector search run
+        # concurrently and are fused, so only relevant items are returned
+        similar = self._similar(query)
+        context["similar_commands"] = similar["commands"]
+        context["similar_tasks"] = similar["tasks"]
+        print(f"[DEBUG] Found {len(context['similar_commands'])} similar commands, {len(context['similar_tasks'])} similar tasks")
         
         # Build summary
-        context["summary"] = self.short_term.get_context_summary()
+        context["summary"] = self._summary(task_ctx)
         print(f"[DEBUG] Context building completed")
         
         return context
@@ -166,9 +323,26 @@ class ContextManager:
         print(f"[DEBUG] Context formatted for LLM - Length: {len(result)} chars")
         return result
     
+    @_serialized
     def clear_session(self) -> None:
         """Clear short-term memory (start fresh session)."""
         print(f"[DEBUG] Clearing session - Clearing short-term memory")
         self.short_term.clear()
+        self.rollups.clear()
+        self._bump_versions(history=False)
         logger.info("session_cleared")
         print(f"[DEBUG] Session cleared successfully")
+    
+    @_serialized
+    def switch_session(self, name: str) -> int:
+        """Save the current session and restore the named one; returns items restored."""
+        print(f"[DEBUG] Switching session - From: {self.sessions.name}, To: {name}")
+        self.rollups.clear()
+        restored = self.sessions.open(name, self.short_term)
+        self._bump_versions(history=False)
+        logger.info("session_switched", session=name, items=restored)
+        return restored
+    
+    def list_sessions(self) -> List[str]:
+        """Names of all saved sessions."""
+        return self.sessions.list_sessions()
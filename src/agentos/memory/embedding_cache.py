@@ -0,0 +1,176 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence, Tuple
+import numpy as np
+import structlog
+
+logger = structlog.get_logger()
+
+# Recency of cache hits is buffered in memory and written once this many
+# keys are pending or this many seconds have passed (and on every put)
+TOUCH_FLUSH_ENTRIES = 1000
+TOUCH_FLUSH_SECONDS = 60.0
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache keyed by (model name, text hash).
+
+    Vectors are stored as float32 blobs in SQLite. When the cache grows past
+    `max_entries`, the least recently used tenth is evicted.
+
+    Hits only read: the keys they touch are buffered with their time and
+    their `last_used` is written in one batch by the next `put_many` (just
+    before eviction, so it sees current recency), or once the buffer is
+    large or old. Recency not yet flushed at exit is lost, which only
+    affects eviction order.
+    """
+
+    def __init__(self, path: Path, max_entries: int = 100_000):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._touched: Dict[Tuple[str, str], float] = {}
+        self._flushed_at = time.monotonic()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with sqlite3.connect(self.path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (model, text_hash)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+            conn.commit()
+            self._size = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        print(f"[DEBUG] EmbeddingCache initialized - Path: {self.path}, Entries: {self._size}/{self.max_entries}")
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, model: str, hashes: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Look up cached vectors; returns only the hits and queues a refresh of their recency."""
+        hits: Dict[str, np.ndarray] = {}
+        if not hashes:
+            return hits
+        unique = list(dict.fromkeys(hashes))
+        with self._lock, sqlite3.connect(self.path) as conn:
+            for start in range(0, len(unique), 500):
+                chunk = unique[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    (model, *chunk)
+                ).fetchall()
+                for text_hash, blob in rows:
+                    hits[text_hash] = np.frombuffer(blob, dtype=np.float32)
+            now = time.time()
+            for text_hash in hits:
+                self._touched[(model, text_hash)] = now
+            if (
+                len(self._touched) >= TOUCH_FLUSH_ENTRIES
+                or time.monotonic() - self._flushed_at >= TOUCH_FLUSH_SECONDS
+            ):
+                self._flush_touched(conn)
+                conn.commit()
+        return hits
+
+    def flush(self) -> int:
+        """Write buffered recency now; returns how many entries were updated."""
+        with self._lock, sqlite3.connect(self.path) as conn:
+            count = self._flush_touched(conn)
+            conn.commit()
+        return count
+
+    def _flush_touched(self, conn: sqlite3.Connection) -> int:
+        """Write buffered `last_used` values in one statement batch (caller holds the lock)."""
+        touched, self._touched = self._touched, {}
+        self._flushed_at = time.monotonic()
+        if touched:
+            conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                [(when, model, text_hash) for (model, text_hash), when in touched.items()]
+            )
+        return len(touched)
+
+    def put_many(self, model: str, vectors: Dict[str, np.ndarray]) -> None:
+        """Store vectors and evict least recently used entries past the bound."""
+        if not vectors:
+            return
+        now = time.time()
+        with self._lock, sqlite3.connect(self.path) as conn:
+            self._flush_touched(conn)
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                [
+                    (model, text_hash, np.asarray(vector, dtype=np.float32).tobytes(), now)
+                    for text_hash, vector in vectors.items()
+                ]
+            )
+            self._size += len(vectors)
+            if self._size > self.max_entries:
+                self._size = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                overflow = self._size - int(self.max_entries * 0.9)
+                if overflow > 0:
+                    conn.execute(
+                        """
+                        DELETE FROM embeddings WHERE rowid IN (
+                            SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?
+                        )
+                        """,
+                        (overflow,)
+                    )
+                    self._size -= overflow
+                    logger.info("embedding_cache_evicted", count=overflow)
+            conn.commit()
+
+    def __len__(self) -> int:
+        return self._size
+
+class CachedEmbedder:
+    """
+    Embedding function wrapper that consults an `EmbeddingCache` first.
+
+    Only texts missing from the cache are sent to the underlying model, in
+    a single batch, so recording or querying a repeated command costs a
+    lookup instead of a forward pass.
+    """
+
+    def __init__(
+        self,
+        embedding_function: Callable[[List[str]], Sequence[Sequence[float]]],
+        cache: EmbeddingCache,
+        model_name: str,
+    ):
+        self.embedding_function = embedding_function
+        self.cache = cache
+        self.model_name = model_name
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, texts: List[str]) -> List[np.ndarray]:
+        hashes = [EmbeddingCache.text_hash(text) for text in texts]
+        found = self.cache.get_many(self.model_name, hashes)
+
+        missing = {}
+        for text, text_hash in zip(texts, hashes):
+            if text_hash not in found and text_hash not in missing:
+                missing[text_hash] = text
+        if missing:
+            computed = self.embedding_function(list(missing.values()))
+            new_vectors = {
+                text_hash: np.asarray(vector, dtype=np.float32)
+                for text_hash, vector in zip(missing, computed)
+            }
+            self.cache.put_many(self.model_name, new_vectors)
+            found.update(new_vectors)
+
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        return [found[text_hash] for text_hash in hashes]
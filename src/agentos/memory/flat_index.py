@@ -0,0 +1,558 @@
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import structlog
+
+from .ann_index import IVFIndex
+from .quantization import Int8Codec, PCAProjector
+
+logger = structlog.get_logger()
+
+# Compact once this fraction of the stored slots is dead
+COMPACTION_THRESHOLD = 0.25
+# ...or once the sidecar holds this many records per live entry (and at least LOG_COMPACTION_MIN)
+LOG_COMPACTION_RATIO = 4
+LOG_COMPACTION_MIN = 256
+INITIAL_CAPACITY = 1024
+
+def _matches(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate a Chroma-style equality `where` filter against metadata."""
+    if not where:
+        return True
+    for key, expected in where.items():
+        if key == "$and":
+            if not all(_matches(metadata, clause) for clause in expected):
+                return False
+        elif key == "$or":
+            if not any(_matches(metadata, clause) for clause in expected):
+                return False
+        elif isinstance(expected, dict):
+            value = metadata.get(key)
+            for op, operand in expected.items():
+                if op == "$eq" and value != operand:
+                    return False
+                if op == "$ne" and value == operand:
+                    return False
+                if op == "$in" and value not in operand:
+                    return False
+                if op in ("$gt", "$gte", "$lt", "$lte") and value is None:
+                    return False
+                if op == "$gt" and not value > operand:
+                    return False
+                if op == "$gte" and not value >= operand:
+                    return False
+                if op == "$lt" and not value < operand:
+                    return False
+                if op == "$lte" and not value <= operand:
+                    return False
+        elif metadata.get(key) != expected:
+            return False
+    return True
+
+class FlatCollection:
+    """
+    Exact-search vector collection backed by a memory-mapped `.npy` file.
+
+    Unit-normalised float32 embeddings live in `vectors.npy`; ids, documents
+    and metadata live in an append-only JSONL sidecar that is replayed on
+    open. Top-k search is one matrix-vector product plus `argpartition`.
+    Deletes leave dead slots that are compacted away once they exceed
+    `COMPACTION_THRESHOLD` of the file; metadata updates append small
+    records, and the sidecar is also compacted once it holds
+    `LOG_COMPACTION_RATIO` records per live entry. Distances are squared L2 between
+    unit vectors (2 - 2·cos), matching Chroma's default space.
+
+    With `index="ivf"` the collection trains an `IVFIndex` once it holds
+    `ivf_train_size` entries and from then on scans only the probed cells.
+
+    With `quantization="int8"` vectors are stored as int8 codes plus a
+    per-vector scale in `scales.npy` and scored against the float query.
+    `pca_dim` additionally projects vectors onto that many principal
+    components, fitted once the collection reaches `pca_train_size`.
+    When `rerank` and `exact_embedder` are set, the top `rerank` candidates
+    are re-scored exactly by re-embedding their documents. Once PCA is
+    fitted, results are always re-scored this way (given an
+    `exact_embedder`), so distances stay full-dimension ones. The stored
+    format of an existing collection takes precedence over these options.
+
+    Implements the subset of the Chroma collection API used by `VectorStore`.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        name: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        index: str = "exact",
+        ivf_nlist: int = 256,
+        ivf_nprobe: int = 16,
+        ivf_train_size: int = 10_000,
+        quantization: str = "none",
+        pca_dim: Optional[int] = None,
+        pca_train_size: int = 10_000,
+        rerank: int = 0,
+        exact_embedder: Optional[Callable[[List[str]], Sequence[Sequence[float]]]] = None,
+    ):
+        if quantization not in ("none", "int8"):
+            raise ValueError(f"Unknown quantization: {quantization}")
+        self.name = name
+        self.metadata = metadata or {}
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._vectors_path = self.path / "vectors.npy"
+        self._scales_path = self.path / "scales.npy"
+        self._log_path = self.path / "entries.jsonl"
+        self._centroids_path = self.path / "ivf_centroids.npy"
+        self._pca_path = self.path / "pca.npz"
+        self._lock = threading.RLock()
+        self._ivf_nlist = ivf_nlist
+        self.ivf: Optional[IVFIndex] = IVFIndex(ivf_nlist, ivf_nprobe) if index == "ivf" else None
+        self.ivf_train_size = ivf_train_size
+        self.codec: Optional[Int8Codec] = Int8Codec() if quantization == "int8" else None
+        self.pca: Optional[PCAProjector] = PCAProjector(pca_dim) if pca_dim else None
+        self.pca_train_size = pca_train_size
+        self.rerank = rerank
+        self.exact_embedder = exact_embedder
+
+        self._vectors: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._alive = np.zeros(0, dtype=bool)
+        self._slot_ids: List[Optional[str]] = []
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._log_records = 0
+        self._load()
+        print(f"[DEBUG] FlatCollection '{name}' opened - Entries: {len(self._entries)}, Slots: {len(self._slot_ids)}, "
+              f"Quantization: {'int8' if self.codec else 'none'}, PCA: {self.pca.dim if self.pca else None}")
+
+    # ------------------------------------------------------------------ storage
+
+    def _load(self) -> None:
+        if self._vectors_path.exists():
+            self._vectors = np.lib.format.open_memmap(self._vectors_path, mode="r+")
+            quantized = self._vectors.dtype == np.int8
+            if quantized != (self.codec is not None):
+                logger.warning("flat_collection_format_mismatch", collection=self.name, stored_int8=quantized)
+            self.codec = Int8Codec() if quantized else None
+            if quantized:
+                self._scales = np.lib.format.open_memmap(self._scales_path, mode="r+")
+        if self._pca_path.exists():
+            self.pca = self.pca or PCAProjector(0)
+            self.pca.load(self._pca_path)
+        if not self._log_path.exists():
+            return
+        with open(self._log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                self._log_records += 1
+                if record["op"] == "put":
+                    self._apply_put(record["id"], record["slot"], record["document"], record["metadata"])
+                elif record["op"] == "update":
+                    self._apply_update(record["id"], record.get("document"), record.get("metadata"))
+                else:
+                    self._apply_delete(record["id"])
+        if self.ivf is not None and self.ivf.load(self._centroids_path):
+            self._rebuild_ivf()
+
+    def _apply_put(self, doc_id: str, slot: int, document: str, metadata: Dict[str, Any]) -> None:
+        self._apply_delete(doc_id)
+        while len(self._slot_ids) <= slot:
+            self._slot_ids.append(None)
+        if len(self._alive) < len(self._slot_ids):
+            grown = np.zeros(max(len(self._slot_ids), 2 * len(self._alive)), dtype=bool)
+            grown[:len(self._alive)] = self._alive
+            self._alive = grown
+        self._slot_ids[slot] = doc_id
+        self._alive[slot] = True
+        self._entries[doc_id] = {"slot": slot, "document": document, "metadata": metadata}
+
+    def _apply_update(self, doc_id: str, document: Optional[str], metadata: Optional[Dict[str, Any]]) -> None:
+        entry = self._entries.get(doc_id)
+        if entry is None:
+            return
+        if document is not None:
+            entry["document"] = document
+        if metadata is not None:
+            entry["metadata"] = metadata
+
+    def _apply_delete(self, doc_id: str) -> None:
+        entry = self._entries.pop(doc_id, None)
+        if entry is not None:
+            self._alive[entry["slot"]] = False
+            self._slot_ids[entry["slot"]] = None
+
+    def _live_slots(self) -> np.ndarray:
+        return np.flatnonzero(self._alive[:len(self._slot_ids)])
+
+    def _stored(self, rows: Any) -> np.ndarray:
+        """Float32 vectors in storage space (PCA-reduced if fitted) for a slice or slot array."""
+        if self.codec is None:
+            return np.asarray(self._vectors[rows], dtype=np.float32)
+        return self.codec.decode(self._vectors[rows], self._scales[rows])
+
+    def _scores(self, query: np.ndarray, rows: Any) -> np.ndarray:
+        if self.codec is None:
+            return self._vectors[rows] @ query
+        return self.codec.scores(query, self._vectors[rows], self._scales[rows])
+
+    def _encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        if self.pca is not None and self.pca.is_fitted:
+            vectors = self.pca.transform(vectors)
+        if self.codec is None:
+            return vectors, None
+        return self.codec.encode(vectors)
+
+    def _project_query(self, query: np.ndarray) -> np.ndarray:
+        if self.pca is not None and self.pca.is_fitted:
+            return self.pca.transform(query)[0]
+        return query
+
+    def _rebuild_ivf(self) -> None:
+        slots = self._live_slots()
+        self.ivf.reset(slots, self._stored(slots) if len(slots) else np.zeros((0, 1), np.float32))
+
+    def _update_ivf(self, start: int, count: int) -> None:
+        if self.ivf is None:
+            return
+        if self.ivf.is_trained:
+            self.ivf.add(range(start, start + count), self._stored(slice(start, start + count)))
+        else:
+            self._maybe_train_ivf()
+
+    def _maybe_train_ivf(self) -> None:
+        if self.ivf is None or self.ivf.is_trained or len(self._entries) < self.ivf_train_size:
+            return
+        slots = self._live_slots()
+        self.ivf.train(self._stored(slots))
+        self.ivf.save(self._centroids_path)
+        self._rebuild_ivf()
+        logger.info("ivf_index_trained", collection=self.name, vectors=len(slots))
+
+    def _maybe_fit_pca(self) -> bool:
+        """Fit PCA once enough vectors exist and re-encode the store; returns True if it did."""
+        if self.pca is None or self.pca.is_fitted or len(self._entries) < self.pca_train_size:
+            return False
+        self.compact()
+        live = len(self._entries)
+        full = self._stored(slice(0, live))
+        self.pca.fit(full)
+        self.pca.save(self._pca_path)
+        codes, scales = self._encode(full)
+        capacity = max(INITIAL_CAPACITY, 2 * live)
+        self._replace_file("_vectors", self._vectors_path, codes, capacity)
+        if scales is not None:
+            self._replace_file("_scales", self._scales_path, scales, capacity)
+        if self.ivf is not None:
+            # Centroids were trained in the old space
+            self.ivf = IVFIndex(self._ivf_nlist, self.ivf.nprobe)
+            self._centroids_path.unlink(missing_ok=True)
+            self._maybe_train_ivf()
+        logger.info("pca_reencoded", collection=self.name, vectors=live, dim=self.pca.dim)
+        return True
+
+    def _replace_file(self, attr: str, path: Path, data: np.ndarray, capacity: int) -> None:
+        """Atomically replace a memory-mapped file with `data` padded to `capacity` rows."""
+        tmp_path = path.with_suffix(".tmp.npy")
+        target = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=data.dtype, shape=(capacity,) + data.shape[1:])
+        target[:len(data)] = data
+        target.flush()
+        del target
+        setattr(self, attr, None)
+        os.replace(tmp_path, path)
+        setattr(self, attr, np.lib.format.open_memmap(path, mode="r+"))
+
+    def _ensure_capacity(self, needed: int, dim: int) -> None:
+        if self._vectors is None:
+            capacity = max(INITIAL_CAPACITY, needed)
+            dtype = np.int8 if self.codec is not None else np.float32
+            self._vectors = np.lib.format.open_memmap(
+                self._vectors_path, mode="w+", dtype=dtype, shape=(capacity, dim)
+            )
+            if self.codec is not None:
+                self._scales = np.lib.format.open_memmap(
+                    self._scales_path, mode="w+", dtype=np.float32, shape=(capacity,)
+                )
+            return
+        if self._vectors.shape[1] != dim:
+            raise ValueError(f"Embedding dimension {dim} does not match collection dimension {self._vectors.shape[1]}")
+        if needed <= self._vectors.shape[0]:
+            return
+        capacity = max(needed, 2 * self._vectors.shape[0])
+        used = len(self._slot_ids)
+        self._replace_file("_vectors", self._vectors_path, self._vectors[:used], capacity)
+        if self._scales is not None:
+            self._replace_file("_scales", self._scales_path, self._scales[:used], capacity)
+        print(f"[DEBUG] FlatCollection '{self.name}' grown to capacity {capacity}")
+
+    @staticmethod
+    def _normalize(embeddings: Sequence[Sequence[float]]) -> np.ndarray:
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim == 1:
+            matrix = matrix[None, :]
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    # ---------------------------------------------------------------- write API
+
+    def upsert(
+        self,
+        ids: List[str],
+        embeddings: Sequence[Sequence[float]],
+        documents: Optional[List[str]] = None,
+        metadatas: Optional[List[Optional[Dict[str, Any]]]] = None,
+    ) -> None:
+        """Insert or replace entries; replaced entries get a fresh slot."""
+        if not ids:
+            return
+        vectors = self._normalize(embeddings)
+        documents = documents or [""] * len(ids)
+        metadatas = metadatas or [None] * len(ids)
+        with self._lock:
+            codes, scales = self._encode(vectors)
+            start = len(self._slot_ids)
+            self._ensure_capacity(start + len(ids), codes.shape[1])
+            self._vectors[start:start + len(ids)] = codes
+            self._vectors.flush()
+            if scales is not None:
+                self._scales[start:start + len(ids)] = scales
+                self._scales.flush()
+            with open(self._log_path, "a", encoding="utf-8") as f:
+                for offset, (doc_id, document, metadata) in enumerate(zip(ids, documents, metadatas)):
+                    slot = start + offset
+                    self._apply_put(doc_id, slot, document, metadata or {})
+                    f.write(json.dumps({
+                        "op": "put", "id": doc_id, "slot": slot,
+                        "document": document, "metadata": metadata or {},
+                    }) + "\n")
+            self._log_records += len(ids)
+            if not self._maybe_fit_pca():
+                self._update_ivf(start, len(ids))
+                self._maybe_compact()
+
+    add = upsert
+    
+    def update(
+        self,
+        ids: List[str],
+        documents: Optional[List[str]] = None,
+        metadatas: Optional[List[Optional[Dict[str, Any]]]] = None,
+    ) -> None:
+        """Replace documents and/or metadata of existing entries in place."""
+        with self._lock:
+            with open(self._log_path, "a", encoding="utf-8") as f:
+                for i, doc_id in enumerate(ids):
+                    if doc_id not in self._entries:
+                        continue
+                    # Only the changed fields are logged
+                    record: Dict[str, Any] = {"op": "update", "id": doc_id}
+                    if documents is not None:
+                        record["document"] = documents[i]
+                    if metadatas is not None:
+                        record["metadata"] = metadatas[i] or {}
+                    self._apply_update(doc_id, record.get("document"), record.get("metadata"))
+                    f.write(json.dumps(record) + "\n")
+                    self._log_records += 1
+            self._maybe_compact()
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None) -> None:
+        """Delete entries by id and/or metadata filter."""
+        with self._lock:
+            targets = list(ids or [])
+            if where:
+                targets.extend(
+                    doc_id for doc_id, entry in self._entries.items()
+                    if _matches(entry["metadata"], where)
+                )
+            targets = [doc_id for doc_id in dict.fromkeys(targets) if doc_id in self._entries]
+            if not targets:
+                return
+            with open(self._log_path, "a", encoding="utf-8") as f:
+                for doc_id in targets:
+                    self._apply_delete(doc_id)
+                    f.write(json.dumps({"op": "delete", "id": doc_id}) + "\n")
+            self._log_records += len(targets)
+            self._maybe_compact()
+
+    def _maybe_compact(self) -> None:
+        slots = len(self._slot_ids)
+        if slots and (slots - len(self._entries)) / slots > COMPACTION_THRESHOLD:
+            self.compact()
+        elif self._log_records > max(LOG_COMPACTION_MIN, LOG_COMPACTION_RATIO * len(self._entries)):
+            self.compact()
+
+    def compact(self) -> None:
+        """Rewrite vectors and sidecar without dead slots."""
+        with self._lock:
+            live = [(doc_id, entry) for doc_id, entry in self._entries.items()]
+            live.sort(key=lambda item: item[1]["slot"])
+            print(f"[DEBUG] Compacting FlatCollection '{self.name}' - Slots: {len(self._slot_ids)} -> {len(live)}")
+
+            if self._vectors is not None:
+                kept = np.array([entry["slot"] for _, entry in live], dtype=np.int64)
+                capacity = max(INITIAL_CAPACITY, 2 * len(live))
+                self._replace_file("_vectors", self._vectors_path, self._vectors[kept], capacity)
+                if self._scales is not None:
+                    self._replace_file("_scales", self._scales_path, self._scales[kept], capacity)
+
+            tmp_log = self._log_path.with_suffix(".compact")
+            with open(tmp_log, "w", encoding="utf-8") as f:
+                for slot, (doc_id, entry) in enumerate(live):
+                    f.write(json.dumps({
+                        "op": "put", "id": doc_id, "slot": slot,
+                        "document": entry["document"], "metadata": entry["metadata"],
+                    }) + "\n")
+            os.replace(tmp_log, self._log_path)
+            self._log_records = len(live)
+
+            self._entries = {}
+            self._slot_ids = []
+            self._alive = np.zeros(len(live), dtype=bool)
+            for slot, (doc_id, entry) in enumerate(live):
+                self._apply_put(doc_id, slot, entry["document"], entry["metadata"])
+            if self.ivf is not None and self.ivf.is_trained:
+                self._rebuild_ivf()
+
+    # ----------------------------------------------------------------- read API
+
+    def count(self) -> int:
+        return len(self._entries)
+
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        include: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        """Fetch entries by id or filter, in insertion order."""
+        include = include if include is not None else ["documents", "metadatas"]
+        with self._lock:
+            if ids is not None:
+                selected = [doc_id for doc_id in ids if doc_id in self._entries]
+            else:
+                selected = [doc_id for doc_id in self._slot_ids if doc_id is not None]
+            if where:
+                selected = [doc_id for doc_id in selected if _matches(self._entries[doc_id]["metadata"], where)]
+            selected = selected[offset:offset + limit if limit is not None else None]
+            result: Dict[str, Any] = {"ids": selected}
+            result["documents"] = [self._entries[d]["document"] for d in selected] if "documents" in include else None
+            result["metadatas"] = [self._entries[d]["metadata"] for d in selected] if "metadatas" in include else None
+            if "embeddings" in include and self._vectors is not None:
+                result["embeddings"] = self._stored(
+                    np.array([self._entries[d]["slot"] for d in selected], dtype=np.int64)
+                )
+            else:
+                result["embeddings"] = None
+        return result
+
+    def query(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        n_results: int = 10,
+        where: Optional[Dict[str, Any]] = None,
+        include: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        """Top-k search; returns Chroma-shaped nested result lists."""
+        include = include if include is not None else ["documents", "metadatas", "distances"]
+        queries = self._normalize(query_embeddings)
+        result: Dict[str, Any] = {"ids": [], "documents": [], "metadatas": [], "distances": [], "embeddings": []}
+        with self._lock:
+            slots = len(self._slot_ids)
+            if self._vectors is None or not self._entries:
+                for key in result:
+                    result[key] = [[] for _ in queries]
+                return result
+
+            mask = self._alive[:slots].copy()
+            if where:
+                for doc_id, entry in self._entries.items():
+                    if not _matches(entry["metadata"], where):
+                        mask[entry["slot"]] = False
+            candidates = np.flatnonzero(mask)
+
+            # Small (e.g. heavily filtered) candidate sets are cheaper to scan exactly
+            use_ivf = self.ivf is not None and self.ivf.is_trained and len(candidates) >= self.ivf_train_size
+            rerank = self.rerank if self.exact_embedder is not None else 0
+            if self.exact_embedder is not None and self.pca is not None and self.pca.is_fitted:
+                # Distances in the reduced, centred space are not comparable to
+                # the dedup and retrieval thresholds; always return exact ones
+                rerank = max(rerank, n_results)
+            fetch = max(n_results, rerank)
+
+            for query in queries:
+                projected = self._project_query(query)
+                pool = candidates
+                if use_ivf:
+                    probed = self.ivf.candidates(projected)
+                    probed = probed[mask[probed]]
+                    if len(probed) >= n_results:
+                        pool = probed
+                if not len(pool):
+                    hits = np.zeros(0, dtype=np.int64)
+                    scores = np.zeros(0, dtype=np.float32)
+                else:
+                    # Avoid a gather copy when every slot is a candidate
+                    # (IVF pools are in cell order, so they always gather)
+                    if pool is candidates and len(pool) == slots:
+                        pool_scores = self._scores(projected, slice(0, slots))
+                    else:
+                        pool_scores = self._scores(projected, pool)
+                    k = min(fetch, len(pool))
+                    top = np.argpartition(-pool_scores, k - 1)[:k]
+                    top = top[np.argsort(-pool_scores[top])]
+                    hits, scores = pool[top], pool_scores[top]
+                    if rerank and len(hits):
+                        hits, scores = self._rerank(query, hits)
+                    hits, scores = hits[:n_results], scores[:n_results]
+
+                ids = [self._slot_ids[slot] for slot in hits]
+                result["ids"].append(ids)
+                result["distances"].append([float(2.0 - 2.0 * score) for score in scores])
+                result["documents"].append([self._entries[d]["document"] for d in ids])
+                result["metadatas"].append([self._entries[d]["metadata"] for d in ids])
+                result["embeddings"].append(self._stored(hits) if "embeddings" in include else None)
+        return result
+
+    def _rerank(self, query: np.ndarray, hits: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Re-score candidates exactly by re-embedding their documents (cache hits in practice)."""
+        documents = [self._entries[self._slot_ids[slot]]["document"] for slot in hits]
+        exact = self._normalize(self.exact_embedder(documents)) @ query
+        order = np.argsort(-exact)
+        return hits[order], exact[order]
+
+class FlatVectorClient:
+    """Minimal client exposing `FlatCollection`s under a directory, like a Chroma client."""
+
+    def __init__(self, path: Path, **collection_options: Any):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.collection_options = collection_options
+        self._collections: Dict[str, FlatCollection] = {}
+        self._lock = threading.Lock()
+        print(f"[DEBUG] FlatVectorClient created - Path: {self.path}")
+
+    def get_or_create_collection(
+        self,
+        name: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        embedding_function: Any = None,
+    ) -> FlatCollection:
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = FlatCollection(self.path / name, name, metadata, **self.collection_options)
+            return self._collections[name]
+
+    def list_collections(self) -> List[str]:
+        return sorted(p.name for p in self.path.iterdir() if (p / "entries.jsonl").exists() or (p / "vectors.npy").exists())
+
+    def delete_collection(self, name: str) -> None:
+        with self._lock:
+            self._collections.pop(name, None)
+            shutil.rmtree(self.path / name, ignore_errors=True)
@@ -0,0 +1,120 @@
+import threading
+from typing import Any, Dict, Optional
+import structlog
+
+from config.settings import settings
+from .long_term import LongTermMemory
+from .vector_store import VectorStore
+
+logger = structlog.get_logger()
+
+# Upper bound on the retry backoff for a failing outbox batch
+MAX_RETRY_DELAY_SECONDS = 300
+
+class VectorIndexer:
+    """
+    Background indexer that drains the SQLite vector outbox into the vector store.
+
+    Recording a command only writes SQLite (history row plus outbox row in
+    one transaction); this thread embeds and upserts outbox entries in
+    batches. Failed batches are retried with exponential backoff, and
+    since the outbox is durable, indexing resumes after a restart.
+    """
+
+    def __init__(
+        self,
+        long_term: LongTermMemory,
+        vector_store: VectorStore,
+        batch_size: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+    ):
+        self.long_term = long_term
+        self.vector_store = vector_store
+        self.batch_size = batch_size or settings.memory.vector_batch_size
+        self.poll_interval = poll_interval if poll_interval is not None else settings.memory.indexer_poll_seconds
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Entries indexed since start; changes whenever search results may change
+        self.indexed_total = 0
+        print(f"[DEBUG] VectorIndexer initialized - Batch size: {self.batch_size}, Poll: {self.poll_interval}s")
+
+    def start(self) -> None:
+        """Start the background indexing thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="vector-indexer", daemon=True)
+        self._thread.start()
+        print(f"[DEBUG] VectorIndexer thread started")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the indexing thread; undrained entries stay in the outbox."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        print(f"[DEBUG] VectorIndexer thread stopped")
+
+    def wake(self) -> None:
+        """Signal that new outbox entries are available."""
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                indexed = self.drain_once()
+            except Exception as e:
+                logger.error("vector_indexer_failed", error=str(e))
+                print(f"[DEBUG ERROR] Vector indexer pass failed: {str(e)}")
+                indexed = 0
+            if not indexed:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def drain_once(self) -> int:
+        """Index one batch from the outbox; returns entries indexed."""
+        entries = self.long_term.fetch_outbox(self.batch_size)
+        if not entries:
+            return 0
+
+        indexed = 0
+        for kind in ("commands", "tasks"):
+            batch = [entry for entry in entries if entry["kind"] == kind]
+            if not batch:
+                continue
+            outbox_ids = [entry["id"] for entry in batch]
+            try:
+                self.vector_store.add_many(
+                    kind,
+                    documents=[entry["document"] for entry in batch],
+                    metadatas=[entry["metadata"] for entry in batch],
+                    row_ids=[entry["row_id"] for entry in batch],
+                )
+            except Exception as e:
+                attempts = max(entry["attempts"] for entry in batch) + 1
+                retry_after = min(2 ** attempts, MAX_RETRY_DELAY_SECONDS)
+                self.long_term.fail_outbox(outbox_ids, str(e), retry_after)
+                logger.error("vector_index_batch_failed", kind=kind, count=len(batch), retry_after=retry_after, error=str(e))
+                print(f"[DEBUG ERROR] Failed to index {len(batch)} {kind}, retrying in {retry_after}s: {str(e)}")
+                continue
+            self.long_term.complete_outbox(outbox_ids)
+            indexed += len(batch)
+            self.indexed_total += len(batch)
+
+        print(f"[DEBUG] VectorIndexer indexed {indexed}/{len(entries)} outbox entries")
+        return indexed
+
+    def drain(self) -> int:
+        """Synchronously index everything currently due; returns entries indexed."""
+        total = 0
+        while True:
+            indexed = self.drain_once()
+            if not indexed:
+                return total
+            total += indexed
+
+    def lag(self) -> Dict[str, Any]:
+        """Indexing lag: pending entries, failing entries and oldest entry age."""
+        return self.long_term.outbox_stats()
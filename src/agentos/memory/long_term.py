@@ -1,14 +1,61 @@
 import sqlite3
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Tuple
 import json
+import threading
+import time
 import structlog
 
 from config.settings import settings
+from .blob_store import BlobStore
+
+if TYPE_CHECKING:
+    from .preferences import PreferenceCache
 
 logger = structlog.get_logger()
 
+# Characters of output kept inline on each history row; the full output
+# lives in the blob store and is fetched on demand.
+OUTPUT_PREVIEW_CHARS = 500
+
+# History tables subject to retention
+RETENTION_TABLES = ("command_history", "task_history")
+
+# External-content FTS5 indexes over the history tables: table -> (fts table, columns)
+FTS_TABLES = {
+    "command_history": ("command_fts", ("command", "output")),
+    "task_history": ("task_fts", ("task_description", "steps", "outcome")),
+}
+
+# Words too common to say anything about relevance; left out of full-text queries
+STOPWORDS = frozenset("""
+    a about above after again all am an and any are as at be because been before being
+    below between both but by can could did do does doing down during each few for from
+    further had has have having he her here hers him his how i if in into is it its itself
+    just me more most my no nor not now of off on once only or other our ours out over own
+    please same she should so some such than that the their theirs them then there these
+    they this those through to too under until up very was we were what when where which
+    while who whom why will with would you your yours
+""".split())
+# Shorter terms (after stripping punctuation) are left out too
+MIN_TERM_CHARS = 2
+
+# Rollup key and latency of a command_history row (`{row}` is the row alias)
+COMMAND_TOOL_SQL = (
+    "COALESCE(CASE WHEN json_valid({row}.metadata) THEN json_extract({row}.metadata, '$.tool') END, 'other')"
+)
+COMMAND_DURATION_SQL = (
+    "COALESCE(CASE WHEN json_valid({row}.metadata) "
+    "THEN CAST(json_extract({row}.metadata, '$.duration_ms') AS INTEGER) END, 0)"
+)
+
+def to_sqlite_timestamp(moment: datetime) -> str:
+    """Format a datetime the way SQLite's CURRENT_TIMESTAMP does (UTC)."""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment.strftime("%Y-%m-%d %H:%M:%S")
+
 class LongTermMemory:
     """
     Persistent memory across sessions.
@@ -18,18 +65,53 @@ class LongTermMemory:
     - Task outcomes
     - User preferences
     - Learned patterns
+    
+    Each thread gets its own connection, opened on first use and reused
+    after that, since SQLite connections cannot be shared across threads.
+    The database runs in WAL mode so readers never wait on the writer.
+    
+    Once a `PreferenceCache` is attached as `preference_cache`, the
+    preference accessors go through it instead of SQLite.
     """
     
     def __init__(self, db_path: Optional[Path] = None):
         self.db_path = db_path or settings.memory.db_path
+        self._local = threading.local()
+        self.preference_cache: Optional["PreferenceCache"] = None
         print(f"[DEBUG] LongTermMemory initializing - DB Path: {self.db_path}")
         self._init_database()
+        self.blobs = BlobStore(self.db_path, connect=self._connect)
         print(f"[DEBUG] LongTermMemory initialized successfully")
     
+    def _connect(self) -> sqlite3.Connection:
+        """This thread's connection; closed when the thread exits."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30.0)
+            self._local.conn = conn
+            print(f"[DEBUG] Opened SQLite connection for thread {threading.current_thread().name}")
+        return conn
+    
+    def close(self) -> None:
+        """Close the calling thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+    
     def _init_database(self) -> None:
         """Initialize SQLite database schema."""
         print(f"[DEBUG] Initializing database schema at {self.db_path}")
         with sqlite3.connect(self.db_path) as conn:
+            # Incremental auto-vacuum lets retention shrink the file without
+            # a full VACUUM; existing databases are converted once.
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                conn.execute("VACUUM")
+                print(f"[DEBUG] Enabled incremental auto-vacuum")
+            # Persistent: concurrent readers no longer block on writes
+            conn.execute("PRAGMA journal_mode = WAL")
+            
             cursor = conn.cursor()
             
             # Command history table
@@ -40,9 +122,14 @@ class LongTermMemory:
                     output TEXT,
                     success BOOLEAN,
                     timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    metadata TEXT
+                    metadata TEXT,
+                    output_hash TEXT,
+                    namespace TEXT
                 )
             """)
+            self._ensure_column(cursor, "command_history", "output_hash", "TEXT")
+            self._ensure_column(cursor, "command_history", "namespace", "TEXT")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_command_history_namespace ON command_history (namespace, id)")
             print(f"[DEBUG] Created command_history table")
             
             # Task history table
@@ -53,9 +140,12 @@ class LongTermMemory:
                     steps TEXT,
                     outcome TEXT,
                     duration_seconds INTEGER,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    namespace TEXT
                 )
             """)
+            self._ensure_column(cursor, "task_history", "namespace", "TEXT")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_task_history_namespace ON task_history (namespace, id)")
             print(f"[DEBUG] Created task_history table")
             
             # User preferences
@@ -68,6 +158,23 @@ class LongTermMemory:
             """)
             print(f"[DEBUG] Created preferences table")
             
+            # Change counters, bumped by triggers so every process's writes
+            # are visible to caches in other processes
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS change_counters (
+                    name TEXT PRIMARY KEY,
+                    counter INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            cursor.execute("INSERT OR IGNORE INTO change_counters (name, counter) VALUES ('preferences', 0)")
+            for event in ("INSERT", "UPDATE", "DELETE"):
+                cursor.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS preferences_changed_{event.lower()} AFTER {event} ON preferences BEGIN
+                        UPDATE change_counters SET counter = counter + 1 WHERE name = 'preferences';
+                    END
+                """)
+            print(f"[DEBUG] Created change_counters table")
+            
             # Learning patterns
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS learned_patterns (
@@ -81,46 +188,252 @@ class LongTermMemory:
             """)
             print(f"[DEBUG] Created learned_patterns table")
             
+            # Pending vector index writes, drained by the background indexer
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS vector_outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    kind TEXT NOT NULL,
+                    row_id INTEGER NOT NULL,
+                    document TEXT NOT NULL,
+                    metadata TEXT,
+                    attempts INTEGER DEFAULT 0,
+                    last_error TEXT,
+                    next_attempt_at REAL DEFAULT 0,
+                    created_at REAL NOT NULL
+                )
+            """)
+            print(f"[DEBUG] Created vector_outbox table")
+            
+            self.fts_enabled = self._init_fts(cursor)
+            self._init_command_stats(cursor)
+            
             conn.commit()
             print(f"[DEBUG] Database schema initialization completed")
     
+    @staticmethod
+    def _init_fts(cursor: sqlite3.Cursor) -> bool:
+        """
+        Create FTS5 indexes kept in sync with the history tables by triggers.
+        
+        Indexes created for an existing database are backfilled once.
+        Returns False when this SQLite build lacks FTS5.
+        """
+        for table, (fts, columns) in FTS_TABLES.items():
+            exists = cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts,)
+            ).fetchone()
+            if exists:
+                continue
+            cols = ", ".join(columns)
+            new_cols = ", ".join(f"new.{c}" for c in columns)
+            old_cols = ", ".join(f"old.{c}" for c in columns)
+            try:
+                cursor.execute(f"CREATE VIRTUAL TABLE {fts} USING fts5({cols}, content='{table}', content_rowid='id')")
+            except sqlite3.OperationalError as e:
+                logger.warning("fts5_unavailable", error=str(e))
+                print(f"[DEBUG] FTS5 unavailable, lexical search disabled: {str(e)}")
+                return False
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+                    INSERT INTO {fts} (rowid, {cols}) VALUES (new.id, {new_cols});
+                END
+            """)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+                    INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_cols});
+                END
+            """)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN
+                    INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_cols});
+                    INSERT INTO {fts} (rowid, {cols}) VALUES (new.id, {new_cols});
+                END
+            """)
+            cursor.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+            print(f"[DEBUG] Created and backfilled {fts} full-text index")
+        return True
+    
+    @staticmethod
+    def _init_command_stats(cursor: sqlite3.Cursor) -> None:
+        """
+        Create the per-day, per-tool command rollup, kept current by a trigger.
+        
+        Rows are only ever added to, so the stats outlive retention purges.
+        A rollup created for an existing database is backfilled once.
+        """
+        exists = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'command_stats_daily'"
+        ).fetchone()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS command_stats_daily (
+                day TEXT NOT NULL,
+                tool TEXT NOT NULL,
+                count INTEGER NOT NULL DEFAULT 0,
+                success_count INTEGER NOT NULL DEFAULT 0,
+                duration_ms_sum INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, tool)
+            ) WITHOUT ROWID
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS command_stats_ai AFTER INSERT ON command_history BEGIN
+                INSERT INTO command_stats_daily (day, tool, count, success_count, duration_ms_sum)
+                VALUES (date(new.timestamp), {COMMAND_TOOL_SQL.format(row="new")}, 1, new.success = 1,
+                        {COMMAND_DURATION_SQL.format(row="new")})
+                ON CONFLICT (day, tool) DO UPDATE SET
+                    count = count + 1,
+                    success_count = success_count + excluded.success_count,
+                    duration_ms_sum = duration_ms_sum + excluded.duration_ms_sum;
+            END
+        """)
+        if not exists:
+            LongTermMemory._backfill_command_stats(cursor)
+        print(f"[DEBUG] Created command_stats_daily rollup")
+    
+    @staticmethod
+    def _backfill_command_stats(cursor: sqlite3.Cursor) -> int:
+        cursor.execute("DELETE FROM command_stats_daily")
+        cursor.execute(f"""
+            INSERT INTO command_stats_daily (day, tool, count, success_count, duration_ms_sum)
+            SELECT date(h.timestamp), {COMMAND_TOOL_SQL.format(row="h")}, COUNT(*),
+                   SUM(h.success = 1), SUM({COMMAND_DURATION_SQL.format(row="h")})
+            FROM command_history h
+            GROUP BY 1, 2
+        """)
+        return cursor.rowcount
+    
+    def rebuild_command_stats(self) -> int:
+        """
+        Recompute the command rollup from the rows still in command_history.
+        
+        Stats for days already purged by retention are lost; returns the
+        number of (day, tool) rows written.
+        """
+        with self._connect() as conn:
+            written = self._backfill_command_stats(conn.cursor())
+            conn.commit()
+        print(f"[DEBUG] Rebuilt command stats - Rows: {written}")
+        return written
+    
+    def command_stats(self, days: int = 7, by: str = "tool") -> List[Dict[str, Any]]:
+        """
+        Command counts, success rate and mean latency over the last `days` days.
+        
+        `by` is "tool" (most failures first) or "day" (oldest first). Reads
+        only the rollup, so cost grows with days × tools, not with history.
+        """
+        if by not in ("tool", "day"):
+            raise ValueError(f"Unknown stats grouping: {by}")
+        since = (datetime.now(timezone.utc) - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+        order = "count - success_count DESC, count DESC" if by == "tool" else "day"
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT {by}, SUM(count) AS count, SUM(success_count) AS success_count,
+                       SUM(duration_ms_sum) AS duration_ms_sum
+                FROM command_stats_daily WHERE day >= ?
+                GROUP BY {by} ORDER BY {order}
+                """,
+                (since,)
+            ).fetchall()
+        stats = [
+            {
+                by: key,
+                "count": count,
+                "success_count": successes,
+                "failure_count": count - successes,
+                "success_rate": successes / count if count else 0.0,
+                "avg_duration_ms": duration / count if count else 0.0,
+            }
+            for key, count, successes, duration in rows
+        ]
+        print(f"[DEBUG] Command stats by {by} - Days: {days}, Groups: {len(stats)}")
+        return stats
+    
+    @staticmethod
+    def _ensure_column(cursor: sqlite3.Cursor, table: str, column: str, decl: str) -> None:
+        """Add a column to an existing table created by an older schema."""
+        columns = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+        if column not in columns:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+            print(f"[DEBUG] Migrated {table} - Added column: {column}")
+    
     def add_command(
         self,
         command: str,
         output: str,
         success: bool,
         metadata: Optional[Dict[str, Any]] = None,
-    ) -> None:
-        """Record command execution."""
+        index_document: Optional[str] = None,
+        namespace: Optional[str] = None,
+    ) -> int:
+        """
+        Record command execution and return the history row id.
+        
+        The row keeps a short output preview; the full output is stored
+        compressed and deduplicated in the blob store. When `index_document`
+        is given, a vector outbox row is written in the same transaction.
+        The row and its vector entry are tagged with `namespace`.
+        """
         print(f"[DEBUG] Recording command - Command: {command[:50]}, Success: {success}")
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
+            output_hash = self.blobs.put(output, conn=conn)
             cursor = conn.cursor()
             cursor.execute(
                 """
-                INSERT INTO command_history (command, output, success, metadata)
-                VALUES (?, ?, ?, ?)
+                INSERT INTO command_history (command, output, success, metadata, output_hash, namespace)
+                VALUES (?, ?, ?, ?, ?, ?)
                 """,
-                (command, output, success, json.dumps(metadata or {}))
+                (command, output[:OUTPUT_PREVIEW_CHARS], success, json.dumps(metadata or {}), output_hash, namespace)
             )
+            command_id = cursor.lastrowid
+            if index_document is not None:
+                index_metadata = {**(metadata or {}), "success": success}
+                if namespace:
+                    index_metadata["namespace"] = namespace
+                self._enqueue_outbox(cursor, "commands", command_id, index_document, index_metadata)
             conn.commit()
-            print(f"[DEBUG] Command recorded successfully")
+            print(f"[DEBUG] Command recorded successfully - Row id: {command_id}")
+            return command_id
+    
+    def get_command_output(self, command_id: int) -> Optional[str]:
+        """Fetch the full output of a recorded command."""
+        print(f"[DEBUG] Retrieving full output - Command id: {command_id}")
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT output, output_hash FROM command_history WHERE id = ?",
+                (command_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        preview, output_hash = row
+        if output_hash is None:
+            # Rows written before the blob store only have the preview
+            return preview
+        return self.blobs.get(output_hash)
     
     def get_command_history(
         self,
         limit: int = 100,
         success_only: bool = False,
+        namespace: Optional[str] = None,
     ) -> List[Dict[str, Any]]:
-        """Retrieve command history."""
-        print(f"[DEBUG] Retrieving command history - Limit: {limit}, Success only: {success_only}")
-        with sqlite3.connect(self.db_path) as conn:
+        """Retrieve command history, optionally of one namespace only."""
+        print(f"[DEBUG] Retrieving command history - Limit: {limit}, Success only: {success_only}, Namespace: {namespace}")
+        with self._connect() as conn:
             cursor = conn.cursor()
             
-            query = "SELECT * FROM command_history"
+            conditions, params = [], []
             if success_only:
-                query += " WHERE success = 1"
+                conditions.append("success = 1")
+            if namespace is not None:
+                conditions.append("namespace = ?")
+                params.append(namespace)
+            query = "SELECT * FROM command_history"
+            if conditions:
+                query += " WHERE " + " AND ".join(conditions)
             query += " ORDER BY timestamp DESC LIMIT ?"
             
-            cursor.execute(query, (limit,))
+            cursor.execute(query, (*params, limit))
             
             columns = [desc[0] for desc in cursor.description]
             results = [dict(zip(columns, row)) for row in cursor.fetchall()]
@@ -133,27 +446,178 @@ class LongTermMemory:
         steps: List[str],
         outcome: str,
         duration_seconds: int,
-    ) -> None:
-        """Record completed task."""
+        index_document: Optional[str] = None,
+        namespace: Optional[str] = None,
+    ) -> int:
+        """Record completed task and return the history row id."""
         print(f"[DEBUG] Recording task - Description: {description[:50]}, Steps: {len(steps)}, Duration: {duration_seconds}s")
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 """
-                INSERT INTO task_history (task_description, steps, outcome, duration_seconds)
-                VALUES (?, ?, ?, ?)
+                INSERT INTO task_history (task_description, steps, outcome, duration_seconds, namespace)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (description, json.dumps(steps), outcome, duration_seconds, namespace)
+            )
+            task_id = cursor.lastrowid
+            if index_document is not None:
+                self._enqueue_outbox(
+                    cursor, "tasks", task_id, index_document, {"namespace": namespace} if namespace else None
+                )
+            conn.commit()
+            print(f"[DEBUG] Task recorded successfully - Row id: {task_id}")
+            return task_id
+    
+    @staticmethod
+    def _enqueue_outbox(
+        cursor: sqlite3.Cursor,
+        kind: str,
+        row_id: int,
+        document: str,
+        metadata: Optional[Dict[str, Any]],
+    ) -> None:
+        cursor.execute(
+            """
+            INSERT INTO vector_outbox (kind, row_id, document, metadata, created_at)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (kind, row_id, document, json.dumps(metadata or {}), time.time())
+        )
+    
+    def fetch_outbox(self, limit: int = 64) -> List[Dict[str, Any]]:
+        """Return pending outbox entries that are due for (re)processing."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                """
+                SELECT id, kind, row_id, document, metadata, attempts
+                FROM vector_outbox WHERE next_attempt_at <= ?
+                ORDER BY id LIMIT ?
+                """,
+                (time.time(), limit)
+            )
+            columns = [desc[0] for desc in cursor.description]
+            entries = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        for entry in entries:
+            entry["metadata"] = json.loads(entry["metadata"] or "{}")
+        return entries
+    
+    def complete_outbox(self, outbox_ids: List[int]) -> None:
+        """Remove outbox entries that were indexed successfully."""
+        if not outbox_ids:
+            return
+        placeholders = ",".join("?" * len(outbox_ids))
+        with self._connect() as conn:
+            conn.execute(f"DELETE FROM vector_outbox WHERE id IN ({placeholders})", outbox_ids)
+            conn.commit()
+    
+    def fail_outbox(self, outbox_ids: List[int], error: str, retry_after: float) -> None:
+        """Record a failed indexing attempt and schedule a retry."""
+        if not outbox_ids:
+            return
+        placeholders = ",".join("?" * len(outbox_ids))
+        with self._connect() as conn:
+            conn.execute(
+                f"""
+                UPDATE vector_outbox
+                SET attempts = attempts + 1, last_error = ?, next_attempt_at = ?
+                WHERE id IN ({placeholders})
                 """,
-                (description, json.dumps(steps), outcome, duration_seconds)
+                (error[:500], time.time() + retry_after, *outbox_ids)
             )
             conn.commit()
-            print(f"[DEBUG] Task recorded successfully")
+    
+    def outbox_stats(self) -> Dict[str, Any]:
+        """Return pending count, failing count and age of the oldest entry."""
+        with self._connect() as conn:
+            pending, failing, oldest = conn.execute(
+                """
+                SELECT COUNT(*), COALESCE(SUM(attempts > 0), 0), MIN(created_at)
+                FROM vector_outbox
+                """
+            ).fetchone()
+        return {
+            "pending": pending,
+            "failing": failing,
+            "oldest_age_seconds": time.time() - oldest if oldest is not None else 0.0,
+        }
+    
+    def existing_row_ids(self, table: str, row_ids: List[int]) -> set:
+        """Return which of the given row ids still exist in a history table."""
+        if table not in RETENTION_TABLES:
+            raise ValueError(f"Unknown history table: {table}")
+        found = set()
+        with self._connect() as conn:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(row_ids), 500):
+                chunk = row_ids[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT id FROM {table} WHERE id IN ({placeholders})", chunk
+                ).fetchall()
+                found.update(row[0] for row in rows)
+        return found
+    
+    @staticmethod
+    def _fts_query(text: str) -> str:
+        """
+        Turn free text into an FTS5 OR-query of quoted terms, so punctuation
+        is literal. Stopwords and very short terms are dropped; they would
+        match nearly every row.
+        """
+        terms = dict.fromkeys(
+            term.replace('"', '""') for term in text.split()
+            if len(term.strip("?!,.;:'\"()[]")) >= MIN_TERM_CHARS
+            and term.strip("?!,.;:'\"()[]").lower() not in STOPWORDS
+        )
+        return " OR ".join(f'"{term}"' for term in terms)
+    
+    def search_text(
+        self,
+        table: str,
+        text: str,
+        limit: int = 20,
+        namespace: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        BM25-ranked full-text search over a history table.
+        
+        Returns the matching rows, best first, each with its `bm25` score
+        (lower is better), restricted to `namespace` when given. Returns an
+        empty list without FTS5.
+        """
+        if table not in FTS_TABLES:
+            raise ValueError(f"Unknown history table: {table}")
+        match = self._fts_query(text)
+        if not self.fts_enabled or not match:
+            return []
+        fts = FTS_TABLES[table][0]
+        namespace_filter = " AND t.namespace = ?" if namespace is not None else ""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"""
+                SELECT t.*, bm25({fts}) AS bm25 FROM {fts}
+                JOIN {table} t ON t.id = {fts}.rowid
+                WHERE {fts} MATCH ?{namespace_filter} ORDER BY bm25 LIMIT ?
+                """,
+                (match, *((namespace,) if namespace is not None else ()), limit)
+            )
+            columns = [desc[0] for desc in cursor.description]
+            results = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        print(f"[DEBUG] Full-text search on {table} - Terms: {match[:80]}, Hits: {len(results)}")
+        return results
     
     def get_similar_tasks(self, description: str, limit: int = 5) -> List[Dict[str, Any]]:
-        """Find similar past tasks (simple keyword matching)."""
+        """Find similar past tasks (BM25 full-text search, keyword overlap without FTS5)."""
         print(f"[DEBUG] Searching for similar tasks - Description: {description[:50]}, Limit: {limit}")
+        if self.fts_enabled:
+            results = self.search_text("task_history", description, limit)
+            for task in results:
+                task.pop("bm25", None)
+            return results
         keywords = set(description.lower().split())
         
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT * FROM task_history ORDER BY timestamp DESC LIMIT 100")
             
@@ -174,9 +638,12 @@ class LongTermMemory:
             return results
     
     def set_preference(self, key: str, value: Any) -> None:
-        """Store user preference."""
+        """Store user preference (written through in the background when cached)."""
+        if self.preference_cache is not None:
+            self.preference_cache.set(key, value)
+            return
         print(f"[DEBUG] Setting preference - Key: {key}, Value type: {type(value).__name__}")
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 """
@@ -189,9 +656,11 @@ class LongTermMemory:
             print(f"[DEBUG] Preference saved successfully")
     
     def get_preference(self, key: str, default: Any = None) -> Any:
-        """Retrieve user preference."""
+        """Retrieve user preference (from memory when cached)."""
+        if self.preference_cache is not None:
+            return self.preference_cache.get(key, default)
         print(f"[DEBUG] Retrieving preference - Key: {key}")
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT value FROM preferences WHERE key = ?", (key,))
             result = cursor.fetchone()
@@ -203,20 +672,227 @@ class LongTermMemory:
             print(f"[DEBUG] Preference not found - Key: {key}, Using default")
             return default
     
-    def cleanup_old_data(self, days: int = 30) -> None:
-        """Remove data older than specified days."""
-        cutoff = datetime.now() - timedelta(days=days)
+    def count_index_rows(self, table: str, after_id: int = 0) -> int:
+        """Rows of a history table that belong in the vector index, past `after_id`."""
+        if table not in RETENTION_TABLES:
+            raise ValueError(f"Not a history table: {table}")
+        success_filter = " AND success = 1" if table == "command_history" else ""
+        with self._connect() as conn:
+            return conn.execute(
+                f"SELECT COUNT(*) FROM {table} WHERE id > ?{success_filter}", (after_id,)
+            ).fetchone()[0]
+    
+    def iter_index_rows(self, table: str, after_id: int = 0, batch_size: int = 1000) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Stream the rows of a history table that belong in the vector index.
         
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "DELETE FROM command_history WHERE timestamp < ?",
-                (cutoff.isoformat(),)
-            )
-            cursor.execute(
-                "DELETE FROM task_history WHERE timestamp < ?",
-                (cutoff.isoformat(),)
+        Only successful commands are indexed, matching the live path. Pages
+        are fetched by id (keyset pagination), so each page costs the same
+        however far into the table it is.
+        """
+        if table not in RETENTION_TABLES:
+            raise ValueError(f"Not a history table: {table}")
+        success_filter = " AND success = 1" if table == "command_history" else ""
+        while True:
+            with self._connect() as conn:
+                cursor = conn.execute(
+                    f"SELECT * FROM {table} WHERE id > ?{success_filter} ORDER BY id LIMIT ?",
+                    (after_id, batch_size)
+                )
+                columns = [desc[0] for desc in cursor.description]
+                rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            if not rows:
+                return
+            yield rows
+            after_id = rows[-1]["id"]
+    
+    def get_request_traces(self, limit: int = 5000) -> List[Dict[str, Any]]:
+        """The most recent `limit` tool calls recorded with a request id, oldest first."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                """
+                SELECT id, command, success, metadata FROM command_history
+                WHERE json_valid(metadata) AND json_extract(metadata, '$.request_id') IS NOT NULL
+                ORDER BY id DESC LIMIT ?
+                """,
+                (limit,)
+            ).fetchall()
+        rows.reverse()
+        return [
+            {"id": row_id, "command": command, "success": bool(success), "metadata": json.loads(metadata)}
+            for row_id, command, success, metadata in rows
+        ]
+    
+    def get_patterns(self, pattern_type: str) -> List[Dict[str, Any]]:
+        """Learned patterns of one type, highest confidence first."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                """
+                SELECT id, pattern_data, confidence, usage_count FROM learned_patterns
+                WHERE pattern_type = ? ORDER BY confidence DESC, id
+                """,
+                (pattern_type,)
+            ).fetchall()
+        return [
+            {"id": row_id, "data": json.loads(data), "confidence": confidence, "usage_count": usage_count}
+            for row_id, data, confidence, usage_count in rows
+        ]
+    
+    def replace_patterns(self, pattern_type: str, patterns: List[Dict[str, Any]]) -> None:
+        """
+        Make `patterns` (each with `data` holding a unique `key`, and `confidence`)
+        the full set of one type. Patterns kept across calls keep their usage count.
+        """
+        with self._connect() as conn:
+            existing = {
+                json.loads(data)["key"]: row_id
+                for row_id, data in conn.execute(
+                    "SELECT id, pattern_data FROM learned_patterns WHERE pattern_type = ?", (pattern_type,)
+                )
+            }
+            for pattern in patterns:
+                data = json.dumps(pattern["data"])
+                row_id = existing.pop(pattern["data"]["key"], None)
+                if row_id is None:
+                    conn.execute(
+                        "INSERT INTO learned_patterns (pattern_type, pattern_data, confidence) VALUES (?, ?, ?)",
+                        (pattern_type, data, pattern["confidence"])
+                    )
+                else:
+                    conn.execute(
+                        "UPDATE learned_patterns SET pattern_data = ?, confidence = ? WHERE id = ?",
+                        (data, pattern["confidence"], row_id)
+                    )
+            if existing:
+                placeholders = ",".join("?" * len(existing))
+                conn.execute(f"DELETE FROM learned_patterns WHERE id IN ({placeholders})", list(existing.values()))
+            conn.commit()
+        print(f"[DEBUG] Stored {len(patterns)} {pattern_type} patterns - Removed: {len(existing)}")
+    
+    def record_pattern_use(self, pattern_id: int) -> None:
+        with self._connect() as conn:
+            conn.execute("UPDATE learned_patterns SET usage_count = usage_count + 1 WHERE id = ?", (pattern_id,))
+            conn.commit()
+    
+    def preferences_version(self) -> int:
+        """Change counter of the preferences table (bumped by any process's writes)."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT counter FROM change_counters WHERE name = 'preferences'").fetchone()
+        return row[0] if row else 0
+    
+    def load_preferences(self) -> Tuple[int, Dict[str, Any]]:
+        """All preferences and the change counter they correspond to, read atomically."""
+        with self._connect() as conn:
+            conn.execute("BEGIN")
+            try:
+                version = conn.execute(
+                    "SELECT counter FROM change_counters WHERE name = 'preferences'"
+                ).fetchone()[0]
+                rows = conn.execute("SELECT key, value FROM preferences").fetchall()
+            finally:
+                conn.rollback()
+        print(f"[DEBUG] Loaded {len(rows)} preferences - Version: {version}")
+        return version, {key: json.loads(value) for key, value in rows}
+    
+    def set_preferences(self, values: Dict[str, Any]) -> Tuple[int, int]:
+        """
+        Store many preferences in one transaction.
+        
+        Returns the change counter just before and just after the write, so
+        a cache can tell whether anyone else wrote in the meantime.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            before = conn.execute(
+                "SELECT counter FROM change_counters WHERE name = 'preferences'"
+            ).fetchone()[0]
+            conn.executemany(
+                """
+                INSERT OR REPLACE INTO preferences (key, value, updated_at)
+                VALUES (?, ?, CURRENT_TIMESTAMP)
+                """,
+                [(key, json.dumps(value)) for key, value in values.items()]
             )
+            after = conn.execute(
+                "SELECT counter FROM change_counters WHERE name = 'preferences'"
+            ).fetchone()[0]
             conn.commit()
-            
-        logger.info("old_data_cleaned", cutoff_date=cutoff.isoformat())
+        print(f"[DEBUG] Saved {len(values)} preferences - Version: {before} -> {after}")
+        return before, after
+    
+    def purge_expired(
+        self,
+        table: str,
+        cutoff: datetime,
+        batch_size: int = 500,
+        archive: Optional[Callable[[str, List[Dict[str, Any]]], None]] = None,
+    ) -> int:
+        """
+        Delete rows older than `cutoff` from a history table in small batches.
+        
+        Each batch is handed to `archive` (if given) before it is deleted and
+        committed separately, so the database is never locked for long.
+        """
+        if table not in RETENTION_TABLES:
+            raise ValueError(f"Table not subject to retention: {table}")
+        
+        cutoff_str = to_sqlite_timestamp(cutoff)
+        print(f"[DEBUG] Purging {table} - Cutoff: {cutoff_str}, Batch size: {batch_size}")
+        removed = 0
+        with self._connect() as conn:
+            while True:
+                cursor = conn.execute(
+                    f"SELECT * FROM {table} WHERE timestamp <= ? ORDER BY id LIMIT ?",
+                    (cutoff_str, batch_size)
+                )
+                columns = [desc[0] for desc in cursor.description]
+                rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+                if not rows:
+                    break
+                
+                if archive is not None:
+                    archive(table, rows)
+                
+                ids = [row["id"] for row in rows]
+                placeholders = ",".join("?" * len(ids))
+                conn.execute(f"DELETE FROM {table} WHERE id IN ({placeholders})", ids)
+                conn.commit()
+                removed += len(ids)
+                print(f"[DEBUG] Purged batch from {table} - Rows: {len(ids)}, Total: {removed}")
+        return removed
+    
+    def disk_size(self) -> int:
+        """Bytes on disk: the database file plus its write-ahead log."""
+        wal_path = Path(f"{self.db_path}-wal")
+        return Path(self.db_path).stat().st_size + (wal_path.stat().st_size if wal_path.exists() else 0)
+    
+    def incremental_vacuum(self) -> int:
+        """
+        Release free pages back to the filesystem; returns bytes reclaimed.
+        
+        In WAL mode the freed pages only leave the database at a checkpoint,
+        so the log is checkpointed and truncated afterwards.
+        """
+        size_before = self.disk_size()
+        with self._connect() as conn:
+            # Each step frees one page and execute()/fetchall() stop after the
+            # first; executescript steps the pragma to completion
+            conn.executescript("PRAGMA incremental_vacuum;")
+            busy, _, _ = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        if busy:
+            logger.warning("wal_checkpoint_busy")
+        reclaimed = size_before - self.disk_size()
+        print(f"[DEBUG] Incremental vacuum completed - Bytes reclaimed: {reclaimed}")
+        return reclaimed
+    
+    def cleanup_old_data(self, days: int = 30, batch_size: int = 500) -> int:
+        """Remove data older than specified days; returns rows removed."""
+        cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+        
+        removed = sum(
+            self.purge_expired(table, cutoff, batch_size) for table in RETENTION_TABLES
+        )
+        self.blobs.prune_unreferenced()
+        
+        logger.info("old_data_cleaned", cutoff_date=cutoff.isoformat(), rows=removed)
+        return removed
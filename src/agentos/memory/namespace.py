@@ -0,0 +1,40 @@
+import hashlib
+import re
+from pathlib import Path
+from typing import Optional
+
+from config.settings import settings
+
+# Namespaces appear in vector collection names, so they stay within
+# [A-Za-z0-9-] and always contain a non-digit (month keys are all digits)
+NAMESPACE_NAME = re.compile(r"^(?=.*[A-Za-z-])[A-Za-z0-9-]{1,48}$")
+
+def project_root(path: Optional[Path] = None) -> Path:
+    """The enclosing git work tree of `path` (default: cwd), else `path` itself."""
+    start = Path(path or Path.cwd()).resolve()
+    for directory in (start, *start.parents):
+        # `.git` is a file in worktrees and submodules
+        if (directory / ".git").exists():
+            return directory
+    return start
+
+def _slug(value: str) -> str:
+    slug = re.sub(r"[^A-Za-z0-9-]+", "-", value).strip("-")[:39]
+    return slug if NAMESPACE_NAME.match(slug) else f"ns-{slug}".rstrip("-")
+
+def namespace_for(path: Optional[Path] = None) -> str:
+    """Namespace of a directory: its project's name plus a hash of the project path."""
+    root = project_root(path)
+    digest = hashlib.sha1(str(root).encode("utf-8")).hexdigest()[:8]
+    return f"{_slug(root.name or 'root')}-{digest}"
+
+def resolve_namespace(namespace: Optional[str] = None, path: Optional[Path] = None) -> str:
+    """
+    The memory namespace to use: `namespace` if given, else the
+    `AGENTOS_NAMESPACE` setting, else the one derived from `path` (cwd).
+    Explicit names are reduced to characters valid in collection names.
+    """
+    explicit = namespace or settings.memory.namespace
+    if explicit:
+        return _slug(explicit)
+    return namespace_for(path)
@@ -0,0 +1,215 @@
+import json
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+import structlog
+
+from config.settings import settings
+from .long_term import LongTermMemory
+
+logger = structlog.get_logger()
+
+PATTERN_TYPE = "macro"
+
+# Tools with no side effects; only macros made of these run without the LLM
+READ_ONLY_TOOLS = frozenset({
+    "read_file",
+    "list_directory",
+    "search_files",
+    "get_system_info",
+    "get_cpu_info",
+    "get_memory_info",
+    "get_disk_info",
+    "list_processes",
+})
+
+def request_tokens(request: str) -> List[str]:
+    """Whitespace tokens with surrounding sentence punctuation removed."""
+    return [token for token in (raw.strip("?!,;:\"'") for raw in request.split()) if token]
+
+class PatternMiner:
+    """
+    Mines command history into parameterized request -> tool-call macros.
+
+    Tool calls are recorded with the request that caused them (`request`
+    and `request_id` metadata). The miner groups them per request and
+    replaces every argument that appears verbatim in the request with a
+    slot, so "show me notes.txt" -> read_file({"path": "notes.txt"})
+    becomes "show me {0}" -> read_file({"path": {0}}). A macro's
+    confidence is the share of requests with its template that ran exactly
+    its calls, all successfully; macros with at least `min_support` such
+    requests are stored in `learned_patterns`.
+
+    `match` returns the best macro for a request at or above
+    `min_confidence`, with slots filled in, and only for macros made of
+    read-only tools. Mining runs in a background thread every
+    `interval_seconds`.
+    """
+
+    def __init__(
+        self,
+        long_term: LongTermMemory,
+        min_support: Optional[int] = None,
+        min_confidence: Optional[float] = None,
+        interval_seconds: Optional[int] = None,
+        history_rows: Optional[int] = None,
+    ):
+        self.long_term = long_term
+        self.min_support = min_support or settings.memory.macro_min_support
+        self.min_confidence = min_confidence if min_confidence is not None else settings.memory.macro_min_confidence
+        self.interval_seconds = interval_seconds or settings.memory.pattern_mine_interval_seconds
+        self.history_rows = history_rows or settings.memory.pattern_mine_rows
+        self._macros: List[Tuple[re.Pattern, Dict[str, Any]]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._load()
+        print(f"[DEBUG] PatternMiner initialized - Macros: {len(self._macros)}, Min confidence: {self.min_confidence}")
+
+    def start(self) -> None:
+        """Start the background mining thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="pattern-miner", daemon=True)
+        self._thread.start()
+        print(f"[DEBUG] PatternMiner thread started")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Signal the background thread to stop and wait for it."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        print(f"[DEBUG] PatternMiner thread stopped")
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.mine()
+            except Exception as e:
+                logger.error("pattern_mining_failed", error=str(e))
+                print(f"[DEBUG ERROR] Pattern mining failed: {str(e)}")
+            self._stop.wait(self.interval_seconds)
+
+    @staticmethod
+    def _parameterize(request: str, calls: List[Tuple[str, Dict[str, Any]]]) -> Tuple[str, List[Dict[str, Any]]]:
+        """Replace arguments found verbatim in the request with numbered slots."""
+        tokens = request_tokens(request)
+        lowered = [token.lower() for token in tokens]
+        template = list(lowered)
+        slots: Dict[str, int] = {}
+        templated_calls = []
+        for tool, arguments in calls:
+            templated = {}
+            for name, value in arguments.items():
+                if isinstance(value, str) and value.lower() in lowered:
+                    slot = slots.setdefault(value.lower(), len(slots))
+                    template[lowered.index(value.lower())] = f"{{{slot}}}"
+                    templated[name] = {"$slot": slot}
+                else:
+                    templated[name] = value
+            templated_calls.append({"tool": tool, "arguments": templated})
+        return " ".join(template), templated_calls
+
+    def mine(self) -> int:
+        """Mine recent history into macros; returns the number stored."""
+        requests: Dict[str, Dict[str, Any]] = {}
+        for row in self.long_term.get_request_traces(self.history_rows):
+            metadata = row["metadata"]
+            tool = metadata.get("tool")
+            if not tool or not row["command"].startswith(f"{tool}("):
+                continue
+            try:
+                arguments = json.loads(row["command"][len(tool) + 1:-1])
+            except json.JSONDecodeError:
+                continue
+            trace = requests.setdefault(
+                metadata["request_id"], {"request": metadata.get("request", ""), "calls": [], "success": True}
+            )
+            trace["calls"].append((tool, arguments))
+            trace["success"] = trace["success"] and row["success"]
+
+        template_totals: Counter = Counter()
+        successes: Dict[str, Counter] = defaultdict(Counter)
+        shapes: Dict[str, List[Dict[str, Any]]] = {}
+        for trace in requests.values():
+            if not trace["request"]:
+                continue
+            template, calls = self._parameterize(trace["request"], trace["calls"])
+            template_totals[template] += 1
+            if trace["success"]:
+                shape = json.dumps(calls, sort_keys=True)
+                successes[template][shape] += 1
+                shapes[shape] = calls
+
+        patterns = []
+        for template, counts in successes.items():
+            shape, support = counts.most_common(1)[0]
+            if support < self.min_support:
+                continue
+            calls = shapes[shape]
+            patterns.append({
+                "data": {
+                    "key": f"{template}\n{shape}",
+                    "request": template,
+                    "calls": calls,
+                    "support": support,
+                    "read_only": all(call["tool"] in READ_ONLY_TOOLS for call in calls),
+                },
+                "confidence": support / template_totals[template],
+            })
+
+        self.long_term.replace_patterns(PATTERN_TYPE, patterns)
+        self._load()
+        logger.info("patterns_mined", requests=len(requests), macros=len(patterns))
+        print(f"[DEBUG] Mined {len(patterns)} macros from {len(requests)} requests")
+        return len(patterns)
+
+    def _load(self) -> None:
+        macros = []
+        for pattern in self.long_term.get_patterns(PATTERN_TYPE):
+            regex = r"\s+".join(
+                r"(\S+)" if re.fullmatch(r"\{\d+\}", token) else re.escape(token)
+                for token in pattern["data"]["request"].split()
+            )
+            macros.append((re.compile(f"^{regex}$", re.IGNORECASE), pattern))
+        self._macros = macros
+
+    def macros(self) -> List[Dict[str, Any]]:
+        """Stored macros, highest confidence first."""
+        return [pattern for _, pattern in self._macros]
+
+    def match(self, request: str) -> Optional[Dict[str, Any]]:
+        """
+        The best runnable macro for a request, or None.
+
+        Returns the pattern `id`, its `confidence` and the concrete `calls`
+        as (tool, arguments) pairs with slots filled from the request.
+        """
+        text = " ".join(request_tokens(request))
+        for regex, pattern in self._macros:
+            if pattern["confidence"] < self.min_confidence:
+                break
+            if not pattern["data"]["read_only"]:
+                continue
+            found = regex.match(text)
+            if found is None:
+                continue
+            # Slot numbers follow the order they appear in the template
+            order = [int(token[1:-1]) for token in pattern["data"]["request"].split() if re.fullmatch(r"\{\d+\}", token)]
+            values = dict(zip(order, found.groups()))
+            calls = [
+                (call["tool"], {
+                    name: values[value["$slot"]] if isinstance(value, dict) and "$slot" in value else value
+                    for name, value in call["arguments"].items()
+                })
+                for call in pattern["data"]["calls"]
+            ]
+            print(f"[DEBUG] Macro matched - Request: {request[:50]}, Confidence: {pattern['confidence']:.2f}")
+            return {"id": pattern["id"], "confidence": pattern["confidence"], "calls": calls}
+        return None
+
+    def record_use(self, pattern_id: int) -> None:
+        """Count a fast-path execution of a macro."""
+        self.long_term.record_pattern_use(pattern_id)
@@ -0,0 +1,128 @@
+import copy
+import threading
+import time
+from typing import Any, Dict, Optional
+import structlog
+
+from config.settings import settings
+from .long_term import LongTermMemory
+
+logger = structlog.get_logger()
+
+class PreferenceCache:
+    """
+    In-memory read-through cache of user preferences.
+
+    All preferences are loaded into a dict once; reads are served from it.
+    `set` updates the dict immediately and queues the value; a background
+    thread writes queued values in one transaction every `flush_seconds`,
+    or sooner once `batch_size` are pending.
+
+    Writes from other processes (the daemon, a second CLI) are noticed
+    through the `preferences` change counter, which triggers bump on every
+    write. Reads check it at most every `check_seconds` and reload when it
+    moved; `refresh` checks immediately. Values not yet flushed win over
+    reloaded ones.
+    """
+
+    def __init__(
+        self,
+        long_term: LongTermMemory,
+        flush_seconds: Optional[float] = None,
+        batch_size: Optional[int] = None,
+        check_seconds: Optional[float] = None,
+    ):
+        self.long_term = long_term
+        self.flush_seconds = flush_seconds if flush_seconds is not None else settings.memory.preference_flush_seconds
+        self.batch_size = batch_size or settings.memory.preference_batch_size
+        self.check_seconds = check_seconds if check_seconds is not None else settings.memory.preference_check_seconds
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Any] = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._version, self._values = long_term.load_preferences()
+        self._checked_at = time.monotonic()
+        print(f"[DEBUG] PreferenceCache initialized - Preferences: {len(self._values)}, Flush: {self.flush_seconds}s")
+
+    def start(self) -> None:
+        """Start the background write-through thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="preference-writer", daemon=True)
+        self._thread.start()
+        print(f"[DEBUG] PreferenceCache thread started")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the thread and write anything still pending."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+        print(f"[DEBUG] PreferenceCache thread stopped")
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return a preference from memory (a copy, so callers cannot mutate the cache)."""
+        if time.monotonic() - self._checked_at >= self.check_seconds:
+            self.refresh()
+        if key not in self._values:
+            return default
+        return copy.deepcopy(self._values[key])
+
+    def set(self, key: str, value: Any) -> None:
+        """Update a preference now; it is written to SQLite in the background."""
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._values[key] = value
+            self._pending[key] = value
+            due = len(self._pending) >= self.batch_size
+        if due:
+            self._wake.set()
+
+    def all(self) -> Dict[str, Any]:
+        """All preferences."""
+        return copy.deepcopy(self._values)
+
+    def refresh(self) -> bool:
+        """Reload if another process changed preferences; returns True if reloaded."""
+        self._checked_at = time.monotonic()
+        if self.long_term.preferences_version() == self._version:
+            return False
+        version, values = self.long_term.load_preferences()
+        with self._lock:
+            values.update(self._pending)
+            self._version, self._values = version, values
+        logger.info("preferences_reloaded", version=version, count=len(values))
+        print(f"[DEBUG] Preferences changed externally, reloaded - Version: {version}")
+        return True
+
+    def flush(self) -> int:
+        """Write pending preferences in one transaction; returns how many were written."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        try:
+            before, after = self.long_term.set_preferences(pending)
+        except Exception as e:
+            # Keep them queued, behind anything set since
+            with self._lock:
+                self._pending = {**pending, **self._pending}
+            logger.error("preference_flush_failed", count=len(pending), error=str(e))
+            print(f"[DEBUG ERROR] Failed to write {len(pending)} preferences: {str(e)}")
+            return 0
+        if before == self._version:
+            # Only our own write moved the counter
+            self._version = after
+        else:
+            self.refresh()
+        return len(pending)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            self.flush()
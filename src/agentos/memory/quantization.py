@@ -0,0 +1,156 @@
+"""
+Compressed embedding storage for the flat vector backend.
+
+`Int8Codec` stores each vector as int8 codes with a per-vector float32
+scale; queries stay float32 and are scored asymmetrically against the
+codes. `PCAProjector` optionally reduces dimensionality first.
+`measure_compression` reports the memory saving and recall@k loss;
+run this file directly to measure it on synthetic history:
+
+    python src/agentos/memory/quantization.py --n 50000 --pca-dim 128 --rerank 50
+"""
+
+import argparse
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+import numpy as np
+
+# Codes are widened to float32 this many rows at a time when scoring, so
+# the temporary stays ~24 MB at 384 dims however large the corpus is
+SCORE_BLOCK_ROWS = 16_384
+
+class Int8Codec:
+    """Symmetric per-vector int8 quantization: x ≈ codes * scale."""
+
+    dtype = np.int8
+
+    @staticmethod
+    def encode(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    @staticmethod
+    def decode(codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+        return codes.astype(np.float32) * np.asarray(scales, dtype=np.float32)[:, None]
+
+    @staticmethod
+    def scores(query: np.ndarray, codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+        """Asymmetric inner products: float query against the int8 corpus, in row blocks."""
+        query = np.asarray(query, dtype=np.float32)
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_BLOCK_ROWS):
+            block = slice(start, start + SCORE_BLOCK_ROWS)
+            scores[block] = codes[block].astype(np.float32) @ query
+        return scores * scales
+
+class PCAProjector:
+    """Linear projection onto the top principal components, re-normalised."""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.mean: Optional[np.ndarray] = None
+        self.components: Optional[np.ndarray] = None
+
+    @property
+    def is_fitted(self) -> bool:
+        return self.components is not None
+
+    def fit(self, vectors: np.ndarray) -> None:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self.mean = vectors.mean(axis=0)
+        # Right singular vectors of the centred data are the components
+        _, _, vt = np.linalg.svd(vectors - self.mean, full_matrices=False)
+        self.components = vt[: self.dim].astype(np.float32)
+        print(f"[DEBUG] PCAProjector fitted - {vectors.shape[1]} -> {len(self.components)} dims on {len(vectors)} vectors")
+
+    def transform(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        projected = (vectors - self.mean) @ self.components.T
+        norms = np.linalg.norm(projected, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return projected / norms
+
+    def save(self, path: Path) -> None:
+        if self.is_fitted:
+            np.savez(Path(path), mean=self.mean, components=self.components)
+
+    def load(self, path: Path) -> bool:
+        path = Path(path)
+        if not path.exists():
+            return False
+        data = np.load(path)
+        self.mean = data["mean"]
+        self.components = data["components"]
+        self.dim = len(self.components)
+        return True
+
+def measure_compression(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    k: int = 10,
+    pca_dim: Optional[int] = None,
+    rerank: int = 0,
+) -> Dict[str, float]:
+    """
+    Compare int8 (optionally PCA-reduced) storage against float32 exact search.
+
+    Returns bytes per vector for both, the compression ratio and recall@k
+    of the compressed search, with the top `rerank` candidates re-scored
+    exactly when `rerank` is non-zero.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = np.asarray(queries, dtype=np.float32)
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+    stored, projected_queries = vectors, queries
+    if pca_dim:
+        projector = PCAProjector(pca_dim)
+        projector.fit(vectors)
+        stored, projected_queries = projector.transform(vectors), projector.transform(queries)
+    codes, scales = Int8Codec.encode(stored)
+
+    hits = []
+    for query, projected in zip(queries, projected_queries):
+        exact = set(np.argsort(-(vectors @ query))[:k])
+        approx_scores = Int8Codec.scores(projected, codes, scales)
+        fetch = max(k, rerank)
+        top = np.argpartition(-approx_scores, fetch - 1)[:fetch]
+        if rerank:
+            top = top[np.argsort(-(vectors[top] @ query))]
+        else:
+            top = top[np.argsort(-approx_scores[top])]
+        hits.append(len(exact & set(top[:k])) / k)
+
+    float_bytes = vectors.shape[1] * 4
+    quantized_bytes = codes.shape[1] + 4
+    return {
+        "float32_bytes_per_vector": float(float_bytes),
+        "quantized_bytes_per_vector": float(quantized_bytes),
+        "compression_ratio": float_bytes / quantized_bytes,
+        f"recall@{k}": float(np.mean(hits)),
+    }
+
+if __name__ == "__main__":
+    # Run directly, so the sibling module is importable by name
+    from ann_index import synthetic_history
+
+    parser = argparse.ArgumentParser(description="int8/PCA compression and recall@k measurement")
+    parser.add_argument("--n", type=int, default=50_000, help="Synthetic history size")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--pca-dim", type=int, default=None)
+    parser.add_argument("--rerank", type=int, default=0)
+    args = parser.parse_args()
+
+    report = measure_compression(
+        synthetic_history(args.n, args.dim),
+        synthetic_history(args.queries, args.dim, seed=1),
+        k=args.k, pca_dim=args.pca_dim, rerank=args.rerank,
+    )
+    for key, value in report.items():
+        print(f"{key:>28}: {value:.3f}")
@@ -0,0 +1,224 @@
+"""
+Bulk rebuild of the vector store from SQLite history.
+
+Use when the vector directory is lost or corrupted, or after changing
+the vector backend or partitioning:
+
+    agentos-reindex --reset --workers 4
+"""
+
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import structlog
+
+from config.settings import settings
+from .embedding_cache import EmbeddingCache
+from .long_term import LongTermMemory
+from .vector_store import VectorStore
+from .retrieval import HybridRetriever, KIND_TABLES
+
+logger = structlog.get_logger()
+
+CHECKPOINT_FORMAT = 1
+
+# Embedding function of each pool worker, set once by _init_worker
+_worker_embedder: Optional[Callable[[List[str]], Sequence[Sequence[float]]]] = None
+
+def _init_worker(embedding_function: Callable[[List[str]], Sequence[Sequence[float]]]) -> None:
+    # Loaded once per process rather than shipped with every batch
+    global _worker_embedder
+    _worker_embedder = embedding_function
+
+def _embed_batch(documents: List[str]) -> np.ndarray:
+    return np.asarray(_worker_embedder(documents), dtype=np.float32)
+
+@dataclass
+class ReindexReport:
+    """Outcome of a re-index run."""
+    rows: Dict[str, int] = field(default_factory=dict)
+    inserted: Dict[str, int] = field(default_factory=dict)
+    seconds: float = 0.0
+    resumed: bool = False
+
+    @property
+    def rows_per_second(self) -> float:
+        return sum(self.rows.values()) / self.seconds if self.seconds else 0.0
+
+class Reindexer:
+    """
+    Rebuilds the vector store from `command_history` and `task_history`.
+
+    Rows are streamed in id order and shaped into the same documents and
+    metadata the live indexer writes, with each row's own timestamp (so
+    entries land in the month partition of their row).
+    Batches of `batch_size` are embedded across a process pool of
+    `workers` processes (in-process when 0), with up to two batches per
+    worker in flight. They are bulk-loaded in order with precomputed
+    embeddings. Embeddings go through the store's embedding cache: cached
+    documents are not re-embedded and new ones are written back, so the
+    re-ranker and exact re-scoring find them warm afterwards.
+
+    After each loaded batch, the last row id per collection is written to
+    a JSON checkpoint, so an interrupted run resumes where it stopped. The
+    checkpoint is removed on completion, and ignored if it was written for
+    a different embedding model.
+    """
+
+    def __init__(
+        self,
+        long_term: LongTermMemory,
+        vector_store: VectorStore,
+        workers: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        checkpoint_path: Optional[Path] = None,
+    ):
+        self.long_term = long_term
+        self.vector_store = vector_store
+        self.workers = workers if workers is not None else settings.memory.reindex_workers
+        self.batch_size = batch_size or settings.memory.reindex_batch_size
+        self.checkpoint_path = Path(checkpoint_path or vector_store.path.parent / "reindex_checkpoint.json")
+        self.model_name = vector_store.embedder.model_name
+        print(f"[DEBUG] Reindexer initialized - Workers: {self.workers}, Batch size: {self.batch_size}, Checkpoint: {self.checkpoint_path}")
+
+    def _load_checkpoint(self) -> Optional[Dict[str, Any]]:
+        if not self.checkpoint_path.exists():
+            return None
+        try:
+            checkpoint = json.loads(self.checkpoint_path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning("reindex_checkpoint_unreadable", error=str(e))
+            return None
+        if checkpoint.get("format") != CHECKPOINT_FORMAT or checkpoint.get("model") != self.model_name:
+            print(f"[DEBUG] Ignoring reindex checkpoint for model {checkpoint.get('model')}")
+            return None
+        return checkpoint
+
+    def _save_checkpoint(self, checkpoint: Dict[str, Any]) -> None:
+        tmp_path = self.checkpoint_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(checkpoint), encoding="utf-8")
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _documents(self, kind: str, rows: List[Dict[str, Any]]) -> Tuple[List[str], List[Dict[str, Any]], List[int]]:
+        hits = HybridRetriever.row_hits(kind, rows)
+        return (
+            [hit["document"] for hit in hits],
+            [hit["metadata"] for hit in hits],
+            [hit["metadata"]["row_id"] for hit in hits],
+        )
+
+    def _embed(self, documents: List[str], pool: Optional[ProcessPoolExecutor]) -> Any:
+        """Embed through the cache; with a pool, returns a callable that finishes the batch."""
+        embedder = self.vector_store.embedder
+        if pool is None:
+            return np.asarray(embedder(documents), dtype=np.float32)
+        hashes = [EmbeddingCache.text_hash(document) for document in documents]
+        found = embedder.cache.get_many(embedder.model_name, hashes)
+        missing = {}
+        for document, text_hash in zip(documents, hashes):
+            if text_hash not in found:
+                missing[text_hash] = document
+        future = pool.submit(_embed_batch, list(missing.values())) if missing else None
+
+        def finish() -> np.ndarray:
+            if future is not None:
+                computed = dict(zip(missing, future.result()))
+                embedder.cache.put_many(embedder.model_name, computed)
+                found.update(computed)
+            return np.asarray([found[text_hash] for text_hash in hashes], dtype=np.float32)
+        return finish
+
+    def run(
+        self,
+        kinds: Sequence[str] = ("commands", "tasks"),
+        reset: bool = False,
+        restart: bool = False,
+        progress: Optional[Callable[[str, int, int, float], None]] = None,
+    ) -> ReindexReport:
+        """
+        Re-index the given collections; returns counts and timing.
+
+        `reset` drops the collections first. A resumed run never resets
+        again. `restart` discards any checkpoint. `progress` is called
+        after every batch as (kind, rows done, rows total, rows/second).
+        """
+        checkpoint = None if restart else self._load_checkpoint()
+        report = ReindexReport(resumed=checkpoint is not None)
+        if checkpoint is None:
+            if reset:
+                self.vector_store.reset()
+            checkpoint = {"format": CHECKPOINT_FORMAT, "model": self.model_name, "last_ids": {}}
+            self._save_checkpoint(checkpoint)
+        else:
+            print(f"[DEBUG] Resuming reindex from checkpoint - Last ids: {checkpoint['last_ids']}")
+
+        started = time.perf_counter()
+        pool = (
+            ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(self.vector_store.embedding_function,),
+            )
+            if self.workers > 0 else None
+        )
+        try:
+            for kind in kinds:
+                report.rows[kind], report.inserted[kind] = self._reindex_kind(kind, checkpoint, pool, progress)
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+        report.seconds = time.perf_counter() - started
+
+        self.checkpoint_path.unlink(missing_ok=True)
+        logger.info("reindex_completed", rows=report.rows, inserted=report.inserted, seconds=round(report.seconds, 2))
+        print(f"[DEBUG] Reindex completed - Rows: {sum(report.rows.values())}, {report.rows_per_second:.0f} rows/s")
+        return report
+
+    def _reindex_kind(
+        self,
+        kind: str,
+        checkpoint: Dict[str, Any],
+        pool: Optional[ProcessPoolExecutor],
+        progress: Optional[Callable[[str, int, int, float], None]],
+    ) -> Tuple[int, int]:
+        table = KIND_TABLES[kind]
+        after_id = checkpoint["last_ids"].get(kind, 0)
+        total = self.long_term.count_index_rows(table, after_id)
+        done = inserted = 0
+        started = time.perf_counter()
+        in_flight: Deque[Tuple[List[str], List[Dict[str, Any]], List[int], Any]] = deque()
+        # Bound memory: at most two batches per worker waiting to load
+        max_in_flight = 2 * self.workers if pool is not None else 0
+
+        def load_oldest() -> None:
+            nonlocal done, inserted
+            documents, metadatas, row_ids, embedded = in_flight.popleft()
+            embeddings = embedded() if callable(embedded) else embedded
+            inserted += self.vector_store.add_many(
+                kind, documents, metadatas=metadatas, row_ids=row_ids, embeddings=embeddings
+            )
+            done += len(row_ids)
+            checkpoint["last_ids"][kind] = row_ids[-1]
+            self._save_checkpoint(checkpoint)
+            if progress is not None:
+                progress(kind, done, total, done / max(time.perf_counter() - started, 1e-9))
+
+        for rows in self.long_term.iter_index_rows(table, after_id, self.batch_size):
+            documents, metadatas, row_ids = self._documents(kind, rows)
+            if not row_ids:
+                # Every row in the batch was malformed
+                continue
+            embedded = self._embed(documents, pool)
+            in_flight.append((documents, metadatas, row_ids, embedded))
+            while len(in_flight) > max_in_flight:
+                load_oldest()
+        while in_flight:
+            load_oldest()
+        print(f"[DEBUG] Reindexed {kind} - Rows: {done}, New entries: {inserted}")
+        return done, inserted
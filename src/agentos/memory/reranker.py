@@ -0,0 +1,111 @@
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+import numpy as np
+import structlog
+
+from config.settings import settings
+
+logger = structlog.get_logger()
+
+SECONDS_PER_DAY = 86400.0
+
+class MemoryReranker:
+    """
+    Re-ranks retrieved memories by relevance, recency, outcome and diversity.
+
+    Relevance is the candidate's cosine similarity to the query. When
+    candidates carry a fusion score, it is blended in with `fusion_weight`.
+    Relevance is then scaled by an exponential recency decay with a
+    `half_life_days` half-life, mixed in with `recency_weight`, and by
+    `failure_weight` for failed commands. Maximal marginal relevance
+    then picks items one at a time, trading relevance against similarity
+    to items already picked (`mmr_lambda`). Everything is vectorized over
+    the candidate set.
+    """
+
+    def __init__(
+        self,
+        embedder: Callable[[List[str]], Sequence[Sequence[float]]],
+        half_life_days: Optional[float] = None,
+        recency_weight: Optional[float] = None,
+        failure_weight: Optional[float] = None,
+        mmr_lambda: Optional[float] = None,
+        fusion_weight: float = 0.5,
+    ):
+        self.embedder = embedder
+        self.half_life_days = half_life_days or settings.memory.recency_half_life_days
+        self.recency_weight = recency_weight if recency_weight is not None else settings.memory.recency_weight
+        self.failure_weight = failure_weight if failure_weight is not None else settings.memory.failure_weight
+        self.mmr_lambda = mmr_lambda if mmr_lambda is not None else settings.memory.mmr_lambda
+        self.fusion_weight = fusion_weight
+
+    @staticmethod
+    def _unit(matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def relevance(
+        self,
+        query_embedding: Sequence[float],
+        embeddings: np.ndarray,
+        candidates: List[Dict[str, Any]],
+        now: Optional[float] = None,
+    ) -> np.ndarray:
+        """Recency- and outcome-weighted relevance of each candidate."""
+        now = now if now is not None else time.time()
+        query = self._unit(np.asarray(query_embedding, dtype=np.float32))
+        relevance = embeddings @ query
+
+        fusion = np.array([candidate.get("score", 0.0) for candidate in candidates], dtype=np.float32)
+        if fusion.max(initial=0.0) > 0:
+            relevance = (1 - self.fusion_weight) * relevance + self.fusion_weight * fusion / fusion.max()
+
+        metadatas = [candidate.get("metadata") or {} for candidate in candidates]
+        timestamps = np.array([meta.get("last_seen", meta.get("timestamp", now)) for meta in metadatas], dtype=np.float64)
+        age_days = np.maximum(now - timestamps, 0.0) / SECONDS_PER_DAY
+        decay = np.power(0.5, age_days / self.half_life_days)
+        relevance = relevance * ((1 - self.recency_weight) + self.recency_weight * decay)
+
+        failed = np.array([meta.get("success") is False for meta in metadatas])
+        return np.where(failed, relevance * self.failure_weight, relevance).astype(np.float32)
+
+    def mmr(self, relevance: np.ndarray, embeddings: np.ndarray, limit: int) -> List[int]:
+        """Maximal marginal relevance selection; returns candidate indices in order."""
+        count = min(limit, len(relevance))
+        selected: List[int] = []
+        # Highest similarity of each candidate to anything selected so far
+        redundancy = np.full(len(relevance), -np.inf, dtype=np.float32)
+        available = np.ones(len(relevance), dtype=bool)
+        for _ in range(count):
+            penalty = np.where(np.isfinite(redundancy), redundancy, 0.0)
+            scores = self.mmr_lambda * relevance - (1 - self.mmr_lambda) * penalty
+            scores[~available] = -np.inf
+            best = int(np.argmax(scores))
+            selected.append(best)
+            available[best] = False
+            redundancy = np.maximum(redundancy, embeddings @ embeddings[best])
+        return selected
+
+    def rerank(
+        self,
+        query_embedding: Optional[Sequence[float]],
+        candidates: List[Dict[str, Any]],
+        limit: int,
+    ) -> List[Dict[str, Any]]:
+        """Return the best `limit` candidates, each annotated with its `relevance`."""
+        if not candidates or query_embedding is None:
+            return candidates[:limit]
+        try:
+            embeddings = self._unit(np.asarray(
+                self.embedder([candidate["document"] for candidate in candidates]), dtype=np.float32
+            ))
+        except Exception as e:
+            logger.error("rerank_embedding_failed", error=str(e))
+            print(f"[DEBUG ERROR] Re-ranking skipped, could not embed candidates: {str(e)}")
+            return candidates[:limit]
+
+        relevance = self.relevance(query_embedding, embeddings, candidates)
+        order = self.mmr(relevance, embeddings, limit)
+        print(f"[DEBUG] Re-ranked {len(candidates)} candidates -> {len(order)}")
+        return [{**candidates[i], "relevance": float(relevance[i])} for i in order]
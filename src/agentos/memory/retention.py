@@ -0,0 +1,144 @@
+import gzip
+import json
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, TYPE_CHECKING
+import structlog
+
+from config.settings import settings
+from .long_term import LongTermMemory, RETENTION_TABLES
+
+if TYPE_CHECKING:
+    from .vector_store import VectorStore
+
+logger = structlog.get_logger()
+
+@dataclass
+class RetentionReport:
+    """Outcome of a single retention pass."""
+    cutoff: datetime
+    rows_deleted: Dict[str, int] = field(default_factory=dict)
+    rows_archived: int = 0
+    archive_bytes: int = 0
+    blobs_pruned: int = 0
+    vectors_deleted: Dict[str, int] = field(default_factory=dict)
+    bytes_reclaimed: int = 0
+
+    @property
+    def total_deleted(self) -> int:
+        return sum(self.rows_deleted.values())
+
+class RetentionJob:
+    """
+    Background retention for the long-term memory database.
+
+    Every `interval_seconds` it archives rows older than the retention
+    window to gzip-compressed JSONL segments, deletes them in small
+    batches, prunes unreferenced output blobs, deletes the vectors of the
+    purged rows and runs an incremental vacuum so the database file
+    actually shrinks. A full vector orphan scan is left to `agentos-gc`.
+    """
+
+    def __init__(
+        self,
+        long_term: LongTermMemory,
+        vector_store: Optional["VectorStore"] = None,
+        retention_days: Optional[int] = None,
+        interval_seconds: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        archive_dir: Optional[Path] = None,
+    ):
+        self.long_term = long_term
+        self.vector_store = vector_store
+        self.retention_days = retention_days if retention_days is not None else settings.memory.long_term_retention_days
+        self.interval_seconds = interval_seconds or settings.memory.retention_interval_seconds
+        self.batch_size = batch_size or settings.memory.retention_batch_size
+        self.archive_dir = Path(archive_dir or settings.memory.archive_path)
+        self.last_report: Optional[RetentionReport] = None
+        self.passes = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        print(f"[DEBUG] RetentionJob initialized - Retention: {self.retention_days}d, Interval: {self.interval_seconds}s")
+
+    def start(self) -> None:
+        """Start the background retention thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="memory-retention", daemon=True)
+        self._thread.start()
+        print(f"[DEBUG] RetentionJob thread started")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Signal the background thread to stop and wait for it."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        print(f"[DEBUG] RetentionJob thread stopped")
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error("retention_failed", error=str(e))
+                print(f"[DEBUG ERROR] Retention pass failed: {str(e)}")
+            self._stop.wait(self.interval_seconds)
+
+    def run_once(self) -> RetentionReport:
+        """Run a single archive, delete and vacuum pass."""
+        cutoff = datetime.now(timezone.utc) - timedelta(days=self.retention_days)
+        report = RetentionReport(cutoff=cutoff)
+        segment_stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        purged: Dict[str, List[int]] = {table: [] for table in RETENTION_TABLES}
+
+        def archive(table: str, rows: List[Dict[str, Any]]) -> None:
+            report.archive_bytes += self._archive_rows(table, rows, segment_stamp)
+            report.rows_archived += len(rows)
+            purged[table].extend(row["id"] for row in rows)
+
+        for table in RETENTION_TABLES:
+            report.rows_deleted[table] = self.long_term.purge_expired(
+                table, cutoff, self.batch_size, archive=archive
+            )
+
+        if report.total_deleted:
+            report.blobs_pruned = self.long_term.blobs.prune_unreferenced()
+        if self.vector_store is not None:
+            report.vectors_deleted = self.vector_store.delete_rows(
+                purged, cutoff=cutoff, batch_size=self.batch_size
+            )
+        report.bytes_reclaimed = self.long_term.incremental_vacuum()
+
+        self.last_report = report
+        self.passes += 1
+        logger.info(
+            "retention_completed",
+            rows_deleted=report.total_deleted,
+            rows_archived=report.rows_archived,
+            vectors_deleted=sum(report.vectors_deleted.values()),
+            bytes_reclaimed=report.bytes_reclaimed,
+        )
+        print(f"[DEBUG] Retention pass completed - Rows: {report.total_deleted}, Bytes reclaimed: {report.bytes_reclaimed}")
+        return report
+
+    def _archive_rows(self, table: str, rows: List[Dict[str, Any]], segment_stamp: str) -> int:
+        """Append rows to this pass's archive segment; returns compressed bytes written."""
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        segment = self.archive_dir / f"{table}-{segment_stamp}.jsonl.gz"
+        size_before = segment.stat().st_size if segment.exists() else 0
+
+        with gzip.open(segment, "at", encoding="utf-8") as f:
+            for row in rows:
+                record = dict(row)
+                # Archive the full output rather than the inline preview
+                if record.get("output_hash"):
+                    full_output = self.long_term.blobs.get(record["output_hash"])
+                    if full_output is not None:
+                        record["output"] = full_output
+                f.write(json.dumps(record, default=str) + "\n")
+
+        return segment.stat().st_size - size_before
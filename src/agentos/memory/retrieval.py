@@ -0,0 +1,222 @@
+import json
+from concurrent.futures import Executor, ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+import numpy as np
+import structlog
+
+from config.settings import settings
+from .long_term import LongTermMemory
+from .vector_store import VectorStore
+from .reranker import MemoryReranker
+
+logger = structlog.get_logger()
+
+# History table backing each vector collection
+KIND_TABLES = {"commands": "command_history", "tasks": "task_history"}
+
+class HybridRetriever:
+    """
+    Hybrid lexical + semantic retrieval over command and task history.
+
+    For each collection, a BM25 full-text search (exact tokens such as
+    filenames, flags and error codes) and a vector search run in parallel.
+    Vector hits further than `max_distance` are dropped. The two rankings
+    are then fused with reciprocal-rank fusion, score = Σ 1 / (rrf_k + rank),
+    and deduplicated by history row. Lexical hits must be corroborated
+    against the vectors already stored for their documents (no model
+    call): those further than `max_distance` from the query, or with no
+    stored vector at all (failed commands are never indexed), are dropped,
+    so a shared common word alone never makes a row relevant. Malformed
+    history rows are skipped. With a `reranker`, the whole fused
+    candidate set is re-ranked before cutting. At most `limit` items are
+    returned, and fewer when few candidates are relevant.
+
+    With a `namespace`, both legs search that namespace's memory first;
+    with `fallback`, other namespaces fill in behind it when it has too
+    few candidates.
+    """
+
+    def __init__(
+        self,
+        long_term: LongTermMemory,
+        vector_store: VectorStore,
+        executor: Optional[Executor] = None,
+        candidates: Optional[int] = None,
+        max_distance: Optional[float] = None,
+        rrf_k: Optional[int] = None,
+        reranker: Optional[MemoryReranker] = None,
+        namespace: Optional[str] = None,
+        fallback: Optional[bool] = None,
+    ):
+        self.long_term = long_term
+        self.vector_store = vector_store
+        self._executor = executor or ThreadPoolExecutor(max_workers=4, thread_name_prefix="memory-retrieval")
+        self.candidates = candidates or settings.memory.retrieval_candidates
+        self.max_distance = max_distance if max_distance is not None else settings.memory.retrieval_max_distance
+        self.rrf_k = rrf_k or settings.memory.rrf_k
+        self.reranker = reranker
+        self.namespace = namespace
+        self.fallback = fallback if fallback is not None else settings.memory.namespace_fallback
+        print(f"[DEBUG] HybridRetriever initialized - Candidates: {self.candidates}, Max distance: {self.max_distance}, RRF k: {self.rrf_k}, Namespace: {namespace}")
+
+    def retrieve(
+        self,
+        query: str,
+        limits: Dict[str, int],
+        query_embedding: Optional[List[float]] = None,
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Search several collections at once, e.g. `{"commands": 3, "tasks": 2}`.
+
+        The query is embedded once; every lexical and vector leg runs
+        concurrently. If embedding fails, results are lexical only.
+        """
+        if query_embedding is None:
+            try:
+                query_embedding = self.vector_store.embed_query(query)
+            except Exception as e:
+                logger.error("query_embedding_failed", error=str(e))
+                print(f"[DEBUG ERROR] Failed to embed query, using lexical search only: {str(e)}")
+
+        legs = {}
+        for kind in limits:
+            legs[kind] = (
+                self._executor.submit(self._vector_leg, kind, query, query_embedding)
+                if query_embedding is not None else None,
+                self._executor.submit(self._lexical_leg, kind, query, query_embedding),
+            )
+
+        results = {}
+        for kind, limit in limits.items():
+            vector_future, lexical_future = legs[kind]
+            vector_hits = vector_future.result() if vector_future is not None else []
+            if self.reranker is None:
+                results[kind] = self.fuse(vector_hits, lexical_future.result(), limit)
+            else:
+                fused = self.fuse(vector_hits, lexical_future.result(), self.candidates)
+                results[kind] = self.reranker.rerank(query_embedding, fused, limit)
+            print(f"[DEBUG] Hybrid {kind} - Vector: {len(vector_hits)}, Fused: {len(results[kind])}")
+        return results
+
+    def search(
+        self,
+        kind: str,
+        query: str,
+        limit: int = 5,
+        query_embedding: Optional[List[float]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Hybrid search over a single collection."""
+        return self.retrieve(query, {kind: limit}, query_embedding)[kind]
+
+    def _vector_leg(self, kind: str, query: str, query_embedding: List[float]) -> List[Dict[str, Any]]:
+        if kind == "commands":
+            hits = self.vector_store.search_similar_commands(
+                query, self.candidates, query_embedding, self.max_distance, self.namespace, self.fallback
+            )
+        else:
+            hits = self.vector_store.search_similar_tasks(
+                query, self.candidates, query_embedding, self.max_distance, self.namespace, self.fallback
+            )
+        return [hit for hit in hits if hit["distance"] <= self.max_distance]
+
+    def _lexical_leg(
+        self,
+        kind: str,
+        query: str,
+        query_embedding: Optional[List[float]] = None,
+    ) -> List[Dict[str, Any]]:
+        try:
+            rows = self.long_term.search_text(KIND_TABLES[kind], query, self.candidates, self.namespace)
+            if self.namespace is not None and self.fallback and len(rows) < self.candidates:
+                seen = {row["id"] for row in rows}
+                rows += [
+                    row for row in self.long_term.search_text(KIND_TABLES[kind], query, self.candidates)
+                    if row["id"] not in seen
+                ][:self.candidates - len(rows)]
+        except Exception as e:
+            logger.error("lexical_search_failed", kind=kind, error=str(e))
+            print(f"[DEBUG ERROR] Full-text search failed: {str(e)}")
+            return []
+        hits = self.row_hits(kind, rows)
+        if query_embedding is None or not hits:
+            return hits
+        return self._corroborate(kind, hits, query_embedding)
+
+    def _corroborate(self, kind: str, hits: List[Dict[str, Any]], query_embedding: List[float]) -> List[Dict[str, Any]]:
+        """Give lexical hits their stored-vector distance (2 - 2cos); drop those beyond `max_distance` or without one."""
+        query = np.asarray(query_embedding, dtype=np.float32)
+        try:
+            stored = self.vector_store.stored_embeddings(kind, [hit["document"] for hit in hits], len(query))
+        except Exception as e:
+            logger.error("lexical_corroboration_failed", error=str(e))
+            print(f"[DEBUG ERROR] Failed to look up lexical hit vectors, keeping them unfiltered: {str(e)}")
+            return hits
+        kept = []
+        for hit in hits:
+            vector = stored.get(hit["document"])
+            if vector is None:
+                continue
+            vector = np.asarray(vector, dtype=np.float32)
+            norm = float(np.linalg.norm(vector) * np.linalg.norm(query)) or 1.0
+            distance = 2.0 - 2.0 * float(vector @ query) / norm
+            if distance <= self.max_distance:
+                kept.append({**hit, "distance": distance})
+        print(f"[DEBUG] Lexical hits corroborated - Kept: {len(kept)}/{len(hits)}")
+        return kept
+
+    @classmethod
+    def row_hits(cls, kind: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Shape history rows like vector search hits, skipping malformed ones."""
+        hits = []
+        for row in rows:
+            try:
+                hits.append(cls._row_hit(kind, row))
+            except (ValueError, TypeError) as e:
+                # Bad timestamp or metadata JSON (JSONDecodeError is a ValueError)
+                logger.warning("history_row_malformed", kind=kind, row_id=row.get("id"), error=str(e))
+        return hits
+
+    @staticmethod
+    def _row_hit(kind: str, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Shape a history row like a vector search hit."""
+        timestamp = datetime.strptime(row["timestamp"], "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc).timestamp()
+        if kind == "commands":
+            document = VectorStore.command_document(row["command"], row["output"] or "")
+            metadata = {**json.loads(row["metadata"] or "{}"), "success": bool(row["success"])}
+        else:
+            document = VectorStore.task_document(row["task_description"], json.loads(row["steps"] or "[]"), row["outcome"] or "")
+            metadata = {}
+        metadata.update(row_id=row["id"], timestamp=timestamp)
+        if row.get("namespace"):
+            metadata["namespace"] = row["namespace"]
+        return {
+            "id": VectorStore.entry_id(VectorStore.ID_PREFIXES[kind], document, row["id"]),
+            "document": document,
+            "metadata": metadata,
+            "distance": None,
+        }
+
+    def fuse(
+        self,
+        vector_hits: List[Dict[str, Any]],
+        lexical_hits: List[Dict[str, Any]],
+        limit: int,
+    ) -> List[Dict[str, Any]]:
+        """Reciprocal-rank fusion of two rankings, deduplicated by history row."""
+        fused: Dict[Any, Dict[str, Any]] = {}
+        for source, hits in (("vector", vector_hits), ("lexical", lexical_hits)):
+            for rank, hit in enumerate(hits, 1):
+                metadata = hit.get("metadata") or {}
+                key = metadata.get("row_id", hit["id"])
+                entry = fused.get(key)
+                if entry is None:
+                    entry = fused[key] = {**hit, "score": 0.0, "sources": []}
+                elif entry["distance"] is None:
+                    entry["distance"] = hit["distance"]
+                if source not in entry["sources"]:
+                    # Only the best rank per source counts for a row
+                    entry["score"] += 1.0 / (self.rrf_k + rank)
+                    entry["sources"].append(source)
+        ranked = sorted(fused.values(), key=lambda entry: entry["score"], reverse=True)
+        return ranked[:limit]
@@ -0,0 +1,227 @@
+import queue
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+import structlog
+
+from config.settings import settings
+from .short_term import MemoryItem
+
+logger = structlog.get_logger()
+
+@dataclass
+class Rollup:
+    """Compact summary of a run of evicted short-term items."""
+    start: float
+    end: float
+    item_count: int
+    commands: Counter = field(default_factory=Counter)
+    failed: int = 0
+    tasks: List[str] = field(default_factory=list)
+    other: int = 0
+    # Set when a custom summarizer produced the text
+    text: Optional[str] = None
+
+    @classmethod
+    def from_items(cls, items: List[MemoryItem]) -> "Rollup":
+        rollup = cls(start=items[0].created_at, end=items[-1].created_at, item_count=len(items))
+        for item in items:
+            first_line = item.content.split("\n", 1)[0]
+            if item.item_type == "command":
+                command = first_line.removeprefix("Command: ")
+                rollup.commands[command.split("(", 1)[0]] += 1
+                if item.metadata.get("success") is False:
+                    rollup.failed += 1
+            elif item.item_type == "task":
+                rollup.tasks.append(first_line.removeprefix("Task: "))
+            else:
+                rollup.other += 1
+        return rollup
+
+    def merge(self, newer: "Rollup") -> "Rollup":
+        return Rollup(
+            start=self.start,
+            end=newer.end,
+            item_count=self.item_count + newer.item_count,
+            commands=self.commands + newer.commands,
+            failed=self.failed + newer.failed,
+            tasks=self.tasks + newer.tasks,
+            other=self.other + newer.other,
+        )
+
+    def render(self, max_chars: int = 300) -> str:
+        """Extractive one-line summary: time span, top commands, failures, tasks."""
+        if self.text is not None:
+            return self.text[:max_chars]
+        start, end = datetime.fromtimestamp(self.start), datetime.fromtimestamp(self.end)
+        parts = [f"{start:%H:%M}-{end:%H:%M}"]
+        if self.commands:
+            top = ", ".join(
+                f"{name} x{count}" if count > 1 else name
+                for name, count in self.commands.most_common(5)
+            )
+            parts.append(f"{sum(self.commands.values())} commands ({self.failed} failed): {top}")
+        if self.tasks:
+            parts.append(f"tasks: {'; '.join(self.tasks[-3:])}")
+        if self.other:
+            parts.append(f"{self.other} other items")
+        return " | ".join(parts)[:max_chars]
+
+class RollupSummarizer:
+    """
+    Summarizes items evicted from short-term memory off the request path.
+
+    `submit` (the short-term `on_evict` hook) only enqueues. A background
+    thread groups evicted items into batches of `batch_size`, flushing a
+    partial batch after `flush_seconds`, and turns each batch into a
+    `Rollup`. At most `max_rollups` rollups are kept; when the tier is
+    full the two oldest are merged, so the rollup section of the context
+    stays at a fixed size however long the session runs.
+
+    Summaries are extractive by default. `summarize_fn` can plug in a
+    cheap model: it receives item contents (or two rollup texts when
+    merging) and returns the summary text.
+
+    `_pending` and `_rollups` are guarded by one lock. `clear` bumps a
+    generation; queued items and batches being summarized carry the
+    generation they started in, and are dropped if a clear came since,
+    so one session's rollups never leak into the next.
+    """
+
+    def __init__(
+        self,
+        batch_size: Optional[int] = None,
+        max_rollups: Optional[int] = None,
+        flush_seconds: Optional[float] = None,
+        max_chars: Optional[int] = None,
+        summarize_fn: Optional[Callable[[List[str]], str]] = None,
+    ):
+        self.batch_size = batch_size or settings.memory.rollup_batch_size
+        self.max_rollups = max_rollups or settings.memory.rollup_max_entries
+        self.flush_seconds = flush_seconds if flush_seconds is not None else settings.memory.rollup_flush_seconds
+        self.max_chars = max_chars or settings.memory.rollup_max_chars
+        self.summarize_fn = summarize_fn
+        self._queue: "queue.Queue[Tuple[int, MemoryItem]]" = queue.Queue()
+        self._pending: List[MemoryItem] = []
+        self._first_pending_at: Optional[float] = None
+        self._rollups: deque = deque()
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Bumped whenever the rendered rollups change
+        self.version = 0
+        print(f"[DEBUG] RollupSummarizer initialized - Batch: {self.batch_size}, Max rollups: {self.max_rollups}")
+
+    def start(self) -> None:
+        """Start the background summarization thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="memory-rollup", daemon=True)
+        self._thread.start()
+        print(f"[DEBUG] RollupSummarizer thread started")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the thread, summarizing whatever is still pending."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+        print(f"[DEBUG] RollupSummarizer thread stopped")
+
+    def submit(self, items: List[MemoryItem]) -> None:
+        """Queue evicted items; never blocks the caller."""
+        generation = self._generation
+        for item in items:
+            self._queue.put((generation, item))
+
+    def _accept(self, generation: int, item: MemoryItem) -> None:
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._pending.append(item)
+            if self._first_pending_at is None:
+                self._first_pending_at = time.monotonic()
+
+    def _take_batch(self, force: bool = False) -> Optional[Tuple[int, List[MemoryItem]]]:
+        """The next batch and its generation, once full or due (or anything, with `force`)."""
+        with self._lock:
+            if not self._pending:
+                return None
+            due = self._first_pending_at is not None and time.monotonic() - self._first_pending_at >= self.flush_seconds
+            if len(self._pending) < self.batch_size and not due and not force:
+                return None
+            batch = self._pending[:self.batch_size]
+            del self._pending[:self.batch_size]
+            self._first_pending_at = time.monotonic() if self._pending else None
+            return self._generation, batch
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self._accept(*self._queue.get(timeout=0.5))
+            except queue.Empty:
+                pass
+            taken = self._take_batch()
+            if taken is not None:
+                try:
+                    self._summarize(taken[1], taken[0])
+                except Exception as e:
+                    logger.error("rollup_failed", error=str(e))
+                    print(f"[DEBUG ERROR] Rollup summarization failed: {str(e)}")
+
+    def flush(self) -> None:
+        """Synchronously summarize everything queued or pending."""
+        while True:
+            try:
+                self._accept(*self._queue.get_nowait())
+            except queue.Empty:
+                break
+        while True:
+            taken = self._take_batch(force=True)
+            if taken is None:
+                break
+            self._summarize(taken[1], taken[0])
+
+    def _summarize(self, items: List[MemoryItem], generation: int) -> None:
+        rollup = Rollup.from_items(items)
+        if self.summarize_fn is not None:
+            rollup.text = self.summarize_fn([item.content for item in items])
+        with self._lock:
+            if generation != self._generation:
+                # Cleared while this batch was being summarized
+                print(f"[DEBUG] Dropped rollup of {len(items)} items from a cleared session")
+                return
+            self._rollups.append(rollup)
+            if len(self._rollups) > self.max_rollups:
+                oldest, newer = self._rollups.popleft(), self._rollups.popleft()
+                merged = oldest.merge(newer)
+                if self.summarize_fn is not None:
+                    merged.text = self.summarize_fn([oldest.render(self.max_chars), newer.render(self.max_chars)])
+                self._rollups.appendleft(merged)
+            self.version += 1
+        print(f"[DEBUG] Rolled up {len(items)} evicted items - Rollups: {len(self._rollups)}")
+
+    def rollups(self) -> List[str]:
+        """Rendered rollups, oldest first."""
+        with self._lock:
+            return [rollup.render(self.max_chars) for rollup in self._rollups]
+
+    def clear(self) -> None:
+        """Drop pending items and rollups (new session), including any being summarized."""
+        with self._lock:
+            self._generation += 1
+            self._pending.clear()
+            self._first_pending_at = None
+            self._rollups.clear()
+            self.version += 1
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
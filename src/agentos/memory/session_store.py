@@ -0,0 +1,263 @@
+import json
+import os
+import re
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import structlog
+
+from config.settings import settings
+from .short_term import MemoryItem, ShortTermMemory
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = structlog.get_logger()
+
+SESSION_NAME = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+CHECKPOINT_FORMAT = 2
+
+def _try_lock(handle) -> bool:
+    """Take a non-blocking exclusive lock on an open file; False if someone holds it."""
+    try:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+def _unlock(handle) -> None:
+    if fcntl is not None:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+    else:
+        handle.seek(0)
+        msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+def _encode(value: Any) -> Any:
+    """JSON-safe copy of a task context (datetimes tagged for decoding)."""
+    if isinstance(value, datetime):
+        return {"$datetime": value.isoformat()}
+    if isinstance(value, dict):
+        return {key: _encode(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(item) for item in value]
+    return value
+
+def _decode(value: Any) -> Any:
+    if isinstance(value, dict):
+        if set(value) == {"$datetime"}:
+            return datetime.fromisoformat(value["$datetime"])
+        return {key: _decode(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_decode(item) for item in value]
+    return value
+
+class SessionStore:
+    """
+    Persists named short-term memory sessions across restarts.
+
+    Each session directory holds an append-only `log.jsonl` of mutations
+    (item added, task context set or cleared, session cleared) and a JSON
+    `checkpoint.json` of the live items and task context. Every
+    `checkpoint_every` log records, a checkpoint is written atomically and
+    the log is truncated. Records carry sequence numbers, and replay skips
+    those already in the checkpoint, so a crash between the two steps is
+    harmless. Restoring loads one checkpoint and replays a short log tail.
+
+    A session is used by one process at a time: `open` takes an exclusive
+    lock on the session's `.lock` file, held until `close`. If another
+    process (say the GUI next to the CLI) holds it, this one opens a
+    per-pid session `<name>-<pid>` instead of overwriting the other's.
+    """
+
+    def __init__(self, root: Optional[Path] = None, checkpoint_every: Optional[int] = None):
+        self.root = Path(root or settings.memory.sessions_path)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.checkpoint_every = checkpoint_every or settings.memory.session_checkpoint_every
+        self.name: Optional[str] = None
+        self.short_term: Optional[ShortTermMemory] = None
+        self._log = None
+        self._lock_file = None
+        self._seq = 0
+        self._since_checkpoint = 0
+        self._lock = threading.Lock()
+        print(f"[DEBUG] SessionStore initialized - Root: {self.root}, Checkpoint every: {self.checkpoint_every}")
+
+    def list_sessions(self) -> List[str]:
+        return sorted(
+            path.name for path in self.root.iterdir()
+            if path.is_dir() and ((path / "log.jsonl").exists() or (path / "checkpoint.json").exists())
+        )
+
+    def _session_dir(self, name: str) -> Path:
+        if not SESSION_NAME.match(name):
+            raise ValueError(f"Invalid session name: {name!r}")
+        return self.root / name
+
+    def _acquire(self, name: str) -> str:
+        """Lock session `name`, or else a per-pid fallback; returns the name locked."""
+        fallback = f"{name[:52]}-{os.getpid()}"
+        for candidate in (name, fallback):
+            session_dir = self._session_dir(candidate)
+            session_dir.mkdir(parents=True, exist_ok=True)
+            handle = open(session_dir / ".lock", "a+")
+            if _try_lock(handle):
+                self._lock_file = handle
+                if candidate != name:
+                    logger.warning("session_in_use", session=name, fallback=candidate)
+                    print(f"[DEBUG] Session '{name}' is in use by another process, using '{candidate}'")
+                return candidate
+            handle.close()
+        raise RuntimeError(f"Session {name!r} and its fallback {fallback!r} are both in use")
+
+    def _release(self) -> None:
+        if self._lock_file is not None:
+            _unlock(self._lock_file)
+            self._lock_file.close()
+            self._lock_file = None
+
+    def open(self, name: str, short_term: ShortTermMemory) -> int:
+        """
+        Restore session `name` into `short_term` and start journaling it.
+
+        Any previously open session is checkpointed and detached first, and
+        `short_term` is cleared. If another process holds `name`, a per-pid
+        session is opened instead (see `name`). Returns the number of items
+        restored.
+        """
+        self._session_dir(name)
+        self.close()
+        name = self._acquire(name)
+        session_dir = self._session_dir(name)
+        checkpoint_path = session_dir / "checkpoint.json"
+        log_path = session_dir / "log.jsonl"
+
+        short_term.journal = None
+        short_term.clear()
+        self._seq = 0
+        if checkpoint_path.exists():
+            with open(checkpoint_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            self._seq = state["seq"]
+            short_term.restore(
+                [MemoryItem(*fields) for fields in state["items"]],
+                _decode(state["task_context"]),
+                datetime.fromtimestamp(state["session_start"]),
+            )
+        replayed = 0
+        if log_path.exists():
+            with open(log_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn final write from a crash
+                        logger.warning("session_log_corrupt_record", session=name)
+                        break
+                    if record["seq"] <= self._seq:
+                        continue
+                    self._replay(short_term, record)
+                    self._seq = record["seq"]
+                    replayed += 1
+
+        self.name = name
+        self.short_term = short_term
+        self._since_checkpoint = replayed
+        self._log = open(log_path, "a", encoding="utf-8")
+        short_term.journal = self.append
+        if not checkpoint_path.exists() and not replayed:
+            self.append("start", short_term._session_start.timestamp())
+        restored = len(short_term)
+        logger.info("session_restored", session=name, items=restored, replayed=replayed)
+        print(f"[DEBUG] Session '{name}' restored - Items: {restored}, Log records replayed: {replayed}")
+        return restored
+
+    @staticmethod
+    def _replay(short_term: ShortTermMemory, record: Dict[str, Any]) -> None:
+        op = record["op"]
+        if op == "add":
+            short_term.restore([MemoryItem(
+                record["content"], record["created_at"], record["metadata"], record["item_type"]
+            )], short_term.get_task_context())
+        elif op == "task":
+            short_term.restore([], _decode(record["context"]))
+        elif op == "clear_task":
+            short_term.restore([], {})
+        elif op == "clear":
+            short_term.clear()
+        elif op == "start":
+            short_term.restore([], short_term.get_task_context(), datetime.fromtimestamp(record["at"]))
+
+    def append(self, op: str, payload: Any) -> None:
+        """Journal one short-term mutation (the `ShortTermMemory.journal` hook)."""
+        with self._lock:
+            if self._log is None:
+                return
+            self._seq += 1
+            record: Dict[str, Any] = {"seq": self._seq, "op": op}
+            if op == "add":
+                record.update(
+                    content=payload.content,
+                    created_at=payload.created_at,
+                    metadata=payload.metadata,
+                    item_type=payload.item_type,
+                )
+            elif op == "task":
+                record["context"] = _encode(payload)
+            elif op == "start":
+                record["at"] = payload
+            self._log.write(json.dumps(record, default=str) + "\n")
+            self._log.flush()
+            self._since_checkpoint += 1
+            due = self._since_checkpoint >= self.checkpoint_every
+        if due:
+            self.checkpoint()
+
+    def checkpoint(self) -> None:
+        """Write a compacted checkpoint of the open session and truncate its log."""
+        with self._lock:
+            if self._log is None or self.short_term is None:
+                return
+            session_dir = self._session_dir(self.name)
+            state = {
+                "format": CHECKPOINT_FORMAT,
+                "seq": self._seq,
+                "session_start": self.short_term._session_start.timestamp(),
+                "items": [
+                    [item.content, item.created_at, item.metadata, item.item_type]
+                    for item in self.short_term.items()
+                ],
+                "task_context": _encode(self.short_term.get_task_context()),
+            }
+            tmp_path = session_dir / "checkpoint.json.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f, default=str)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, session_dir / "checkpoint.json")
+            self._log.close()
+            self._log = open(session_dir / "log.jsonl", "w", encoding="utf-8")
+            self._since_checkpoint = 0
+        print(f"[DEBUG] Session '{self.name}' checkpointed - Items: {len(state['items'])}, Seq: {state['seq']}")
+
+    def close(self) -> None:
+        """Checkpoint and detach the open session, if any."""
+        if self._log is None:
+            return
+        self.checkpoint()
+        with self._lock:
+            self._log.close()
+            self._log = None
+            self._release()
+        if self.short_term is not None:
+            self.short_term.journal = None
+        print(f"[DEBUG] Session '{self.name}' closed")
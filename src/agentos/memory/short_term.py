@@ -1,20 +1,72 @@
 from collections import deque
-from dataclasses import dataclass, field
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from itertools import islice
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+import heapq
 import json
+import re
+import time
 
-@dataclass
+from config.settings import settings
+
+# Multipliers for byte-budget capacity strings such as "64kb"
+BYTE_UNITS = {"b": 1, "bytes": 1, "kb": 1024, "mb": 1024 ** 2}
+
+@dataclass(slots=True, init=False)
 class MemoryItem:
-    """Single memory item."""
+    """Single memory item (slotted; the creation time is kept as an epoch float)."""
     content: str
-    timestamp: datetime = field(default_factory=datetime.now)
-    metadata: Dict[str, Any] = field(default_factory=dict)
-    item_type: str = "general"  # command, result, conversation, etc.
+    created_at: float
+    metadata: Dict[str, Any]
+    item_type: str  # command, result, conversation, etc.
+    
+    def __init__(
+        self,
+        content: str,
+        created_at: Optional[Union[float, datetime]] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        item_type: str = "general",
+        timestamp: Optional[datetime] = None,
+    ):
+        # `timestamp` (a datetime) is the keyword older callers pass
+        if timestamp is not None:
+            created_at = timestamp
+        if isinstance(created_at, datetime):
+            created_at = created_at.timestamp()
+        self.content = content
+        self.created_at = time.time() if created_at is None else float(created_at)
+        self.metadata = {} if metadata is None else metadata
+        self.item_type = item_type
+    
+    @property
+    def timestamp(self) -> datetime:
+        return datetime.fromtimestamp(self.created_at)
+
+def parse_capacity(capacity: Union[int, str]) -> Tuple[int, str]:
+    """
+    Parse a capacity setting into (amount, unit).
     
-    def __post_init__(self):
-        """Debug logging after initialization."""
-        print(f"[DEBUG] MemoryItem created - Type: {self.item_type}, Content length: {len(self.content)}, Timestamp: {self.timestamp}")
+    Accepts an item count (`50`, `"50"`), a token budget (`"4000 tokens"`)
+    or a byte budget (`"64kb"`, `"1mb"`, `"2048 bytes"`).
+    """
+    if isinstance(capacity, int):
+        return capacity, "items"
+    match = re.fullmatch(r"\s*(\d+)\s*([a-zA-Z]*)\s*", capacity)
+    if not match:
+        raise ValueError(f"Invalid short-term capacity: {capacity!r}")
+    amount, unit = int(match.group(1)), match.group(2).lower()
+    if unit in ("", "items"):
+        return amount, "items"
+    if unit in ("tokens", "token", "tok"):
+        return amount, "tokens"
+    if unit in BYTE_UNITS:
+        return amount * BYTE_UNITS[unit], "bytes"
+    raise ValueError(f"Unknown short-term capacity unit: {unit!r}")
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token)."""
+    return max(1, (len(text) + 3) // 4)
 
 class ShortTermMemory:
     """
@@ -24,14 +76,77 @@ class ShortTermMemory:
     - Recent commands and results
     - Current conversation context
     - Active task state
+    
+    Besides the main deque, each `item_type` has its own deque holding the
+    same items, so filtered reads touch only the k items returned.
+    
+    Reads are lock-free. `iter_recent`/`get_recent` walk the tail of the
+    deque, O(k) with no copy, under a version check: mutators make
+    `_version` odd while they run and even again when done, and a read
+    that saw an odd or changed version is retried (falling back to a
+    snapshot if the writer keeps it busy). `snapshot` is an immutable
+    tuple of all live items, re-copied only after a mutation. Mutations
+    are not synchronized and must come from one thread at a time;
+    `ContextManager` routes them all through its single writer thread.
+    
+    `capacity` is an item count or a token/byte budget (see
+    `parse_capacity`). With a budget, a running size total is kept and
+    items are evicted until the total fits: oldest first, or with
+    `eviction="score"` lowest `score_fn` first (ties oldest first) via a
+    heap. Score-evicted items are tombstoned and skipped on reads; the
+    deques are compacted once tombstones outnumber live items, keeping
+    eviction amortized O(1).
+    
+    `on_evict`, if given, receives the items evicted by each `add`; it
+    runs on the caller's thread, so it should only hand them off.
+    `journal`, if set, is called as `journal(op, payload)` for every
+    mutation so a `SessionStore` can persist the session.
     """
     
-    def __init__(self, capacity: int = 50):
-        self.capacity = capacity
-        self._memory: deque = deque(maxlen=capacity)
+    def __init__(
+        self,
+        capacity: Optional[Union[int, str]] = None,
+        eviction: Optional[str] = None,
+        score_fn: Optional[Callable[[MemoryItem], float]] = None,
+        on_evict: Optional[Callable[[List[MemoryItem]], None]] = None,
+    ):
+        self.capacity, self.unit = parse_capacity(
+            capacity if capacity is not None else settings.memory.short_term_capacity
+        )
+        self.eviction = eviction or settings.memory.short_term_eviction
+        if self.eviction not in ("oldest", "score"):
+            raise ValueError(f"Unknown eviction policy: {self.eviction}")
+        self.score_fn = score_fn or (lambda item: float(item.metadata.get("score", 1.0)))
+        self.on_evict = on_evict
+        self.journal: Optional[Callable[[str, Any], None]] = None
+        self._memory: deque = deque(maxlen=self.capacity if self.unit == "items" else None)
+        self._by_type: Dict[str, deque] = {}
+        self._size = 0
+        self._count = 0
+        self._heap: List[Tuple[float, int, MemoryItem]] = []
+        self._seq = 0
+        self._dead: set = set()
+        # Odd while a mutation runs, bumped to even after; snapshots are cached per version
+        self._version = 0
+        self._snapshots: Dict[Optional[str], Tuple[int, Tuple[MemoryItem, ...]]] = {}
         self._session_start = datetime.now()
         self._task_context: Dict[str, Any] = {}
-        print(f"[DEBUG] ShortTermMemory initialized - Capacity: {capacity}, Session Start: {self._session_start}")
+        print(f"[DEBUG] ShortTermMemory initialized - Capacity: {self.capacity} {self.unit}, Eviction: {self.eviction}, Session Start: {self._session_start}")
+    
+    def item_cost(self, item: MemoryItem) -> int:
+        if self.unit == "tokens":
+            return estimate_tokens(item.content)
+        if self.unit == "bytes":
+            return len(item.content.encode("utf-8"))
+        return 1
+    
+    @property
+    def size(self) -> int:
+        """Current total in capacity units (items, tokens or bytes)."""
+        return self._size
+    
+    def __len__(self) -> int:
+        return self._count
     
     def add(
         self,
@@ -45,18 +160,118 @@ class ShortTermMemory:
             item_type=item_type,
             metadata=metadata or {},
         )
+        self._insert(item)
+        if self.journal is not None:
+            self.journal("add", item)
+        print(f"[DEBUG] Item added to ShortTermMemory - Type: {item_type}, Current size: {self._size}/{self.capacity} {self.unit}")
+    
+    def _insert(self, item: MemoryItem) -> None:
+        self._version += 1
+        evicted: List[MemoryItem] = []
+        if self.unit == "items" and len(self._memory) == self.capacity:
+            # The evicted item is the oldest of its type as well
+            evicted.append(self._memory[0])
+            self._by_type[evicted[0].item_type].popleft()
+            self._size -= 1
+            self._count -= 1
         self._memory.append(item)
-        print(f"[DEBUG] Item added to ShortTermMemory - Type: {item_type}, Current size: {len(self._memory)}/{self.capacity}")
+        self._by_type.setdefault(item.item_type, deque()).append(item)
+        self._size += self.item_cost(item)
+        self._count += 1
+        if self.unit != "items":
+            if self.eviction == "score":
+                heapq.heappush(self._heap, (self.score_fn(item), self._seq, item))
+                self._seq += 1
+            evicted = self._evict_to_budget()
+        self._version += 1
+        if evicted and self.on_evict is not None:
+            self.on_evict(evicted)
+    
+    def _evict_to_budget(self) -> List[MemoryItem]:
+        # Always keep the newest item, even if it alone exceeds the budget
+        newest = self._memory[-1]
+        held = []
+        evicted = []
+        while self._size > self.capacity and self._count > 1:
+            if self.eviction == "oldest":
+                item = self._memory.popleft()
+                self._by_type[item.item_type].popleft()
+            else:
+                entry = heapq.heappop(self._heap)
+                item = entry[2]
+                if item is newest:
+                    held.append(entry)
+                    continue
+                self._dead.add(id(item))
+            self._size -= self.item_cost(item)
+            self._count -= 1
+            evicted.append(item)
+        for entry in held:
+            heapq.heappush(self._heap, entry)
+        if len(self._dead) > max(32, self._count):
+            self._compact()
+        # Hand over in chronological order
+        evicted.sort(key=lambda item: item.created_at)
+        return evicted
+    
+    def _compact(self) -> None:
+        """Drop tombstoned items from the deques."""
+        dead = self._dead
+        self._memory = deque(item for item in self._memory if id(item) not in dead)
+        for item_type, items in list(self._by_type.items()):
+            self._by_type[item_type] = deque(item for item in items if id(item) not in dead)
+        self._dead = set()
+    
+    def snapshot(self, item_type: Optional[str] = None) -> Tuple[MemoryItem, ...]:
+        """Immutable view of the live items (oldest first); safe to read from any thread."""
+        version = self._version
+        cached = self._snapshots.get(item_type)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        # Read the tombstones before the deques: _compact swaps the deques first
+        dead = self._dead
+        source = self._by_type.get(item_type, ()) if item_type else self._memory
+        # A single C-level copy, so a concurrent append cannot interleave
+        items = tuple(source)
+        if dead:
+            items = tuple(item for item in items if id(item) not in dead)
+        # Tagged with the version read up front, so a copy racing a mutation
+        # is refreshed next time; one taken mid-mutation is never reused
+        if version % 2 == 0:
+            self._snapshots[item_type] = (version, items)
+        return items
+    
+    def iter_recent(self, n: int = 10, item_type: Optional[str] = None) -> Iterator[MemoryItem]:
+        """Iterate over the n most recent items, newest first, without copying the deque."""
+        n = max(n, 0)
+        for _ in range(3):
+            version = self._version
+            if version % 2:
+                continue
+            # Read the tombstones before the deques: _compact swaps the deques first
+            dead = self._dead
+            source = self._by_type.get(item_type, ()) if item_type else self._memory
+            recent: List[MemoryItem] = []
+            try:
+                # Deque indexing near the right end is O(1)
+                for index in range(1, len(source) + 1):
+                    if len(recent) == n:
+                        break
+                    item = source[-index]
+                    if id(item) not in dead:
+                        recent.append(item)
+            except IndexError:
+                # Shrunk under us; the version check below retries
+                pass
+            if self._version == version:
+                return iter(recent)
+        return islice(reversed(self.snapshot(item_type)), n)
     
     def get_recent(self, n: int = 10, item_type: Optional[str] = None) -> List[MemoryItem]:
-        """Get n most recent items, optionally filtered by type."""
-        items = list(self._memory)
-        
-        if item_type:
-            items = [item for item in items if item.item_type == item_type]
-        
-        result = items[-n:]
-        print(f"[DEBUG] Retrieved {len(result)} recent items - Filter type: {item_type}, Total available: {len(items)}")
+        """Get n most recent items (oldest first), optionally filtered by type."""
+        result = list(self.iter_recent(n, item_type))
+        result.reverse()
+        print(f"[DEBUG] Retrieved {len(result)} recent items - Filter type: {item_type}")
         return result
     
     def get_context_summary(self) -> str:
@@ -85,11 +300,15 @@ class ShortTermMemory:
             "started": datetime.now(),
             **context,
         }
+        if self.journal is not None:
+            self.journal("task", self._task_context)
         print(f"[DEBUG] Task context set - Task: {task_name}, Context keys: {list(context.keys())}")
     
     def clear_task_context(self) -> None:
         """Clear current task context."""
         self._task_context = {}
+        if self.journal is not None:
+            self.journal("clear_task", None)
         print(f"[DEBUG] Task context cleared")
     
     def get_task_context(self) -> Dict[str, Any]:
@@ -98,7 +317,33 @@ class ShortTermMemory:
     
     def clear(self) -> None:
         """Clear all short-term memory."""
-        print(f"[DEBUG] Clearing all ShortTermMemory - Items before: {len(self._memory)}")
+        print(f"[DEBUG] Clearing all ShortTermMemory - Items before: {self._count}")
+        self._version += 1
         self._memory.clear()
+        self._by_type.clear()
+        self._heap = []
+        self._dead = set()
+        self._size = 0
+        self._count = 0
         self._task_context = {}
-        print(f"[DEBUG] ShortTermMemory cleared - Items after: {len(self._memory)}")
+        self._version += 1
+        if self.journal is not None:
+            self.journal("clear", None)
+        print(f"[DEBUG] ShortTermMemory cleared - Items after: {self._count}")
+    
+    def items(self) -> List[MemoryItem]:
+        """All live items, oldest first."""
+        return list(self.snapshot())
+    
+    def restore(
+        self,
+        items: List[MemoryItem],
+        task_context: Dict[str, Any],
+        session_start: Optional[datetime] = None,
+    ) -> None:
+        """Append restored items (original timestamps kept) without journaling them."""
+        for item in items:
+            self._insert(item)
+        self._task_context = dict(task_context)
+        if session_start is not None:
+            self._session_start = session_start
@@ -1,89 +1,538 @@
-import chromadb
-from chromadb.config import Settings as ChromaSettings
-from typing import List, Dict, Any, Optional
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Sequence, Tuple, TYPE_CHECKING
+import hashlib
+import re
+import threading
+import time
 import structlog
 
 from config.settings import settings
+from .embedding_cache import CachedEmbedder, EmbeddingCache
+from .flat_index import FlatVectorClient
+
+if TYPE_CHECKING:
+    from .long_term import LongTermMemory
 
 logger = structlog.get_logger()
 
+# Partitions are named kind[_namespace][_month], e.g. "commands_2026_10" or
+# "commands_myproj-1a2b3c4d_2026_10"; namespaces always contain a non-digit
+PARTITION_NAME = re.compile(r"^(commands|tasks)(?:_([A-Za-z0-9-]*[A-Za-z-][A-Za-z0-9-]*))?(?:_(\d{4}_\d{2}))?$")
+# How long a listing of partitions is trusted before other processes' new ones are picked up
+PARTITION_REFRESH_SECONDS = 60.0
+
+def partition_key(timestamp: float) -> str:
+    """UTC month partition of a Unix timestamp, e.g. "2026_10"."""
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y_%m")
+
+def partition_name(kind: str, namespace: Optional[str], month: Optional[str]) -> str:
+    return "_".join(part for part in (kind, namespace, month) if part)
+
+def partition_end(key: str) -> float:
+    """Unix timestamp at which a month partition ends."""
+    year, month = (int(part) for part in key.split("_"))
+    return datetime(year + month // 12, month % 12 + 1, 1, tzinfo=timezone.utc).timestamp()
+
 class VectorStore:
     """
     Vector database for semantic memory retrieval.
     
-    Uses ChromaDB for embedding storage and similarity search.
+    Uses ChromaDB (`vector_backend = "chroma"`) or an in-process NumPy flat
+    index (`vector_backend = "flat"`) for embedding storage and similarity
+    search; both expose the same collection API. Entries are
+    keyed by the SQLite history row they came from (`cmd_<row_id>`,
+    `task_<row_id>`) so they can be garbage-collected with retention.
+    
+    Repeats of an already indexed document (same content hash, or within
+    `vector_dedup_distance`) are collapsed into the existing entry: its
+    `occurrences` count and `last_seen` time are updated instead of
+    inserting a new vector. Exact repeats also move its `row_id` to the
+    latest occurrence; near duplicates keep the row their text came from.
+    
+    With `vector_partitioning = "month"`, entries go to one collection per
+    kind and UTC month of their timestamp (`commands_2026_10`), and
+    duplicates collapse within a partition. Searches run newest partition
+    first and stop once `n_results` hits are within `stop_distance`; the
+    unpartitioned `commands` and `tasks` collections, holding entries from
+    before partitioning, are searched last. Retention drops whole expired
+    partitions instead of scanning them.
+    
+    Entries tagged with a `namespace` (see `namespace.py`) get partitions
+    of their own. A search scoped to a namespace ranks its partitions
+    first and, with `fallback`, the rest only if those fall short.
+    
+    Searches may run from any thread. Ingestion and garbage collection
+    read then modify entries, so they hold a write lock.
     """
     
-    def __init__(self):
-        print(f"[DEBUG] VectorStore initializing - Path: {settings.memory.vector_db_path}")
-        self.client = chromadb.PersistentClient(
-            path=str(settings.memory.vector_db_path),
-            settings=ChromaSettings(anonymized_telemetry=False),
-        )
-        print(f"[DEBUG] ChromaDB client created")
-        
-        # Create collections
-        self.commands_collection = self.client.get_or_create_collection(
-            name="commands",
-            metadata={"description": "Command execution history"},
+    ID_PREFIXES = {"commands": "cmd", "tasks": "task"}
+    
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        embedding_function: Optional[Any] = None,
+        backend: Optional[str] = None,
+        partitioning: Optional[str] = None,
+    ):
+        self.path = Path(path or settings.memory.vector_db_path)
+        self.backend = backend or settings.memory.vector_backend
+        self.partitioning = partitioning or settings.memory.vector_partitioning
+        if self.partitioning not in ("month", "none"):
+            raise ValueError(f"Unknown vector partitioning: {self.partitioning}")
+        # Chroma's default is all-MiniLM-L6-v2. Documents and queries are
+        # embedded here, through a persistent cache, and handed to the
+        # backend as precomputed embeddings.
+        if embedding_function is None:
+            from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+            embedding_function = DefaultEmbeddingFunction()
+            model_name = settings.memory.embedding_model
+        else:
+            model_name = type(embedding_function).__name__
+        self.embedding_function = embedding_function
+        cache_path = settings.memory.embedding_cache_path or self.path.parent / "embedding_cache.db"
+        self.embedder = CachedEmbedder(
+            self.embedding_function,
+            EmbeddingCache(cache_path, settings.memory.embedding_cache_max_entries),
+            model_name,
         )
-        print(f"[DEBUG] Commands collection initialized")
+        self._collection_kwargs = {"embedding_function": self.embedding_function}
+        self._query_cache: OrderedDict = OrderedDict()
+        self._query_cache_size = settings.memory.query_cache_size
+        self._query_cache_lock = threading.Lock()
+        self._write_lock = threading.RLock()
+        self.dedup_distance = settings.memory.vector_dedup_distance
+        self.stop_distance = settings.memory.vector_partition_stop_distance
+        self.namespace_fallback = settings.memory.namespace_fallback
+        # kind -> {(namespace, month): collection}, replaced (never mutated) under the lock
+        self._partitions: Dict[str, Dict[Tuple[Optional[str], Optional[str]], Any]] = {"commands": {}, "tasks": {}}
+        self._partitions_lock = threading.Lock()
+        self._partitions_listed_at = 0.0
+        print(f"[DEBUG] VectorStore initializing - Path: {self.path}, Backend: {self.backend}, Partitioning: {self.partitioning}")
+        if self.backend == "flat":
+            self.client = FlatVectorClient(
+                self.path / "flat",
+                index=settings.memory.vector_index,
+                ivf_nlist=settings.memory.ivf_nlist,
+                ivf_nprobe=settings.memory.ivf_nprobe,
+                ivf_train_size=settings.memory.ivf_train_size,
+                quantization=settings.memory.vector_quantization,
+                pca_dim=settings.memory.pca_dim,
+                pca_train_size=settings.memory.pca_train_size,
+                rerank=settings.memory.rerank_candidates,
+                exact_embedder=self.embedder,
+            )
+        elif self.backend == "chroma":
+            import chromadb
+            from chromadb.config import Settings as ChromaSettings
+            self.client = chromadb.PersistentClient(
+                path=str(self.path),
+                settings=ChromaSettings(anonymized_telemetry=False),
+            )
+            print(f"[DEBUG] ChromaDB client created")
+        else:
+            raise ValueError(f"Unknown vector backend: {self.backend}")
         
-        self.tasks_collection = self.client.get_or_create_collection(
-            name="tasks",
-            metadata={"description": "Task completion history"},
-        )
-        print(f"[DEBUG] Tasks collection initialized")
+        self._open_collections()
         print(f"[DEBUG] VectorStore initialized successfully")
     
+    def _open_collections(self) -> None:
+        self.legacy_collections = {
+            "commands": self.client.get_or_create_collection(
+                name="commands",
+                metadata={"description": "Command execution history"},
+                **self._collection_kwargs,
+            ),
+            "tasks": self.client.get_or_create_collection(
+                name="tasks",
+                metadata={"description": "Task completion history"},
+                **self._collection_kwargs,
+            ),
+        }
+        print(f"[DEBUG] Commands and tasks collections initialized")
+        self._refresh_partitions()
+    
+    def _refresh_partitions(self) -> None:
+        """Re-list partitions, including ones created by other processes."""
+        found: Dict[str, Dict[Tuple[Optional[str], Optional[str]], Any]] = {"commands": {}, "tasks": {}}
+        for collection in self.client.list_collections():
+            # Chroma lists collection objects, the flat client lists names
+            match = PARTITION_NAME.match(getattr(collection, "name", collection))
+            if match and (match.group(2) or match.group(3)):
+                kind, namespace, month = match.groups()
+                found[kind][(namespace, month)] = self.client.get_or_create_collection(
+                    name=match.group(0), **self._collection_kwargs
+                )
+        with self._partitions_lock:
+            self._partitions = found
+            self._partitions_listed_at = time.monotonic()
+        print(f"[DEBUG] Vector partitions - Commands: {len(found['commands'])}, Tasks: {len(found['tasks'])}")
+    
+    def partitions(self, kind: str) -> List[Tuple[Optional[str], Optional[str]]]:
+        """(namespace, month) keys of a kind's partitions, newest month first."""
+        if time.monotonic() - self._partitions_listed_at > PARTITION_REFRESH_SECONDS:
+            self._refresh_partitions()
+        with self._partitions_lock:
+            return sorted(self._partitions[kind], key=lambda key: key[1] or "", reverse=True)
+    
+    def _partition(self, kind: str, namespace: Optional[str], month: Optional[str]):
+        """The collection for one namespace and month of a kind, created on first use."""
+        if namespace is None and month is None:
+            return self.legacy_collections[kind]
+        with self._partitions_lock:
+            collection = self._partitions[kind].get((namespace, month))
+        if collection is not None:
+            return collection
+        name = partition_name(kind, namespace, month)
+        collection = self.client.get_or_create_collection(
+            name=name,
+            metadata={"description": f"{kind.capitalize()} history, {name}"},
+            **self._collection_kwargs,
+        )
+        with self._partitions_lock:
+            self._partitions = {**self._partitions, kind: {**self._partitions[kind], (namespace, month): collection}}
+        print(f"[DEBUG] Vector partition created - {name}")
+        return collection
+    
+    def reset(self) -> None:
+        """Drop and recreate all collections (e.g. before re-indexing with a new model)."""
+        with self._write_lock:
+            names = ["commands", "tasks"] + [
+                partition_name(kind, *key) for kind in ("commands", "tasks") for key in self.partitions(kind)
+            ]
+            for name in names:
+                try:
+                    self.client.delete_collection(name)
+                except Exception as e:
+                    logger.warning("vector_collection_delete_failed", collection=name, error=str(e))
+            self._open_collections()
+        with self._query_cache_lock:
+            self._query_cache.clear()
+        logger.info("vector_store_reset")
+        print(f"[DEBUG] VectorStore collections reset")
+    
     def add_command(
         self,
         command: str,
         output: str,
         metadata: Optional[Dict[str, Any]] = None,
+        row_id: Optional[int] = None,
     ) -> None:
-        """Add command to vector store."""
+        """Add command to vector store, linked to its command_history row."""
         print(f"[DEBUG] Adding command to vector store - Command: {command[:50]}")
         try:
-            doc_id = f"cmd_{len(self.commands_collection.get()['ids'])}"
-            print(f"[DEBUG] Generated doc_id: {doc_id}")
-            
-            self.commands_collection.add(
-                documents=[f"{command}\n{output}"],
-                metadatas=[metadata or {}],
-                ids=[doc_id],
+            self.add_many(
+                "commands",
+                documents=[self.command_document(command, output)],
+                metadatas=[metadata],
+                row_ids=[row_id],
             )
             print(f"[DEBUG] Command added successfully to vector store")
         except Exception as e:
             logger.error("vector_add_failed", error=str(e))
             print(f"[DEBUG ERROR] Failed to add command to vector store: {str(e)}")
     
+    def add_many(
+        self,
+        kind: str,
+        documents: List[str],
+        metadatas: Optional[List[Optional[Dict[str, Any]]]] = None,
+        row_ids: Optional[List[Optional[int]]] = None,
+        batch_size: Optional[int] = None,
+        embeddings: Optional[Sequence[Sequence[float]]] = None,
+    ) -> int:
+        """
+        Embed and insert many entries into the `commands` or `tasks` collection.
+        
+        With month partitioning, each entry goes to the partition of its
+        `timestamp` metadata (now, unless given), within the partitions of
+        its `namespace` metadata, if any.
+        Ids come from the history row id when known and from a content hash
+        otherwise, so allocation never scans the collection and re-adding
+        the same entry overwrites instead of colliding. Duplicates of
+        existing entries are collapsed; returns the number of new entries.
+        Precomputed `embeddings` (e.g. from a bulk re-index) skip the embedder.
+        """
+        prefix = self.ID_PREFIXES[kind]
+        metadatas = metadatas or [None] * len(documents)
+        row_ids = row_ids or [None] * len(documents)
+        batch_size = batch_size or settings.memory.vector_batch_size
+        
+        ids = [
+            self.entry_id(prefix, document, row_id)
+            for document, row_id in zip(documents, row_ids)
+        ]
+        entry_metadatas = [
+            self._entry_metadata(metadata, row_id, document)
+            for metadata, row_id, document in zip(metadatas, row_ids, documents)
+        ]
+        
+        groups: Dict[Tuple[Optional[str], Optional[str]], List[int]] = {}
+        for i, metadata in enumerate(entry_metadatas):
+            month = partition_key(metadata["timestamp"]) if self.partitioning == "month" else None
+            groups.setdefault((metadata.get("namespace"), month), []).append(i)
+        
+        inserted = 0
+        with self._write_lock:
+            for (namespace, month), indices in groups.items():
+                collection = self._partition(kind, namespace, month)
+                for start in range(0, len(indices), batch_size):
+                    batch = indices[start:start + batch_size]
+                    inserted += self._ingest(
+                        collection,
+                        [ids[i] for i in batch],
+                        [documents[i] for i in batch],
+                        [entry_metadatas[i] for i in batch],
+                        [embeddings[i] for i in batch] if embeddings is not None else None,
+                    )
+        print(f"[DEBUG] Ingested {len(documents)} entries into {kind} - New: {inserted}, Collapsed: {len(documents) - inserted}")
+        return inserted
+    
+    def _ingest(
+        self,
+        collection: Any,
+        ids: List[str],
+        documents: List[str],
+        metadatas: List[Dict[str, Any]],
+        embeddings: Optional[Sequence[Sequence[float]]] = None,
+    ) -> int:
+        """Insert one batch, folding exact and near duplicates into existing entries."""
+        if embeddings is None:
+            embeddings = self.embedder(documents)
+        hashes = [metadata["doc_hash"] for metadata in metadatas]
+        
+        # Exact duplicates: one metadata lookup for the whole batch
+        existing: Dict[str, tuple] = {}
+        if collection.count():
+            found = collection.get(where={"doc_hash": {"$in": list(dict.fromkeys(hashes))}}, include=["metadatas"])
+            for doc_id, metadata in zip(found["ids"], found["metadatas"]):
+                existing.setdefault(metadata["doc_hash"], (doc_id, metadata))
+        
+        # Near duplicates: nearest existing neighbour of each remaining entry
+        nearest: Dict[int, tuple] = {}
+        pending = [i for i, doc_hash in enumerate(hashes) if doc_hash not in existing]
+        if pending and collection.count() and self.dedup_distance > 0:
+            results = collection.query(
+                query_embeddings=[embeddings[i] for i in pending],
+                n_results=1,
+                include=["metadatas", "distances"],
+            )
+            for i, hit_ids, hit_metas, distances in zip(
+                pending, results["ids"], results["metadatas"], results["distances"]
+            ):
+                if hit_ids and distances[0] <= self.dedup_distance:
+                    nearest[i] = (hit_ids[0], hit_metas[0])
+        
+        new_entries: Dict[str, int] = {}
+        updates: Dict[str, Dict[str, Any]] = {}
+        for i, (doc_id, doc_hash, metadata) in enumerate(zip(ids, hashes, metadatas)):
+            if doc_hash in new_entries:
+                target_id, target = ids[new_entries[doc_hash]], metadatas[new_entries[doc_hash]]
+            elif doc_hash in existing or i in nearest:
+                target_id, target = existing[doc_hash] if doc_hash in existing else nearest[i]
+                target = updates.setdefault(target_id, dict(target))
+            else:
+                new_entries[doc_hash] = i
+                continue
+            if target_id == doc_id or ("row_id" in metadata and target.get("row_id") == metadata["row_id"]):
+                # The same occurrence re-indexed (e.g. an outbox retry)
+                continue
+            target["occurrences"] = target.get("occurrences", 1) + 1
+            target["last_seen"] = metadata["timestamp"]
+            # Only an identical document may point at the new row; a near
+            # duplicate keeps the row its stored text came from
+            if "row_id" in metadata and target.get("doc_hash") == doc_hash:
+                target["row_id"] = metadata["row_id"]
+        
+        keep = sorted(new_entries.values())
+        if keep:
+            collection.upsert(
+                ids=[ids[i] for i in keep],
+                embeddings=[embeddings[i] for i in keep],
+                documents=[documents[i] for i in keep],
+                metadatas=[metadatas[i] for i in keep],
+            )
+        if updates:
+            collection.update(ids=list(updates), metadatas=list(updates.values()))
+        return len(keep)
+    
+    def _collection(self, kind: str):
+        """The collection new untagged `kind` entries go to: this month's partition, or the unpartitioned one."""
+        if kind not in self.legacy_collections:
+            raise ValueError(f"Unknown vector collection: {kind}")
+        if self.partitioning == "month":
+            return self._partition(kind, None, partition_key(time.time()))
+        return self.legacy_collections[kind]
+    
+    @property
+    def commands_collection(self):
+        return self._collection("commands")
+    
+    @property
+    def tasks_collection(self):
+        return self._collection("tasks")
+    
+    def _search_collections(
+        self,
+        kind: str,
+        namespace: Optional[str] = None,
+        fallback: bool = True,
+    ) -> List[List[Tuple[str, Any]]]:
+        """
+        Collections to search for a kind, in tiers: the namespace's own,
+        then (with `fallback`, or without a namespace) all others. Each
+        tier runs newest partition first, unpartitioned last.
+        """
+        keys = self.partitions(kind)
+        with self._partitions_lock:
+            partitions = self._partitions[kind]
+        ordered = [(partition_name(kind, *key), partitions[key], key[0]) for key in keys if key in partitions]
+        ordered.append((kind, self.legacy_collections[kind], None))
+        if namespace is None:
+            return [[(name, collection) for name, collection, _ in ordered]]
+        scoped = [(name, collection) for name, collection, owner in ordered if owner == namespace]
+        rest = [(name, collection) for name, collection, owner in ordered if owner != namespace]
+        return [scoped, rest] if fallback else [scoped]
+    
+    def _search(
+        self,
+        kind: str,
+        query_embedding: List[float],
+        n_results: int,
+        stop_distance: Optional[float] = None,
+        namespace: Optional[str] = None,
+        fallback: Optional[bool] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Top `n_results` across partitions, stopping once that many are
+        within `stop_distance`. Hits from a namespace's own partitions rank
+        ahead of fallback hits.
+        """
+        stop_distance = stop_distance if stop_distance is not None else self.stop_distance
+        fallback = fallback if fallback is not None else self.namespace_fallback
+        ranked: List[Dict[str, Any]] = []
+        searched = 0
+        for tier in self._search_collections(kind, namespace, fallback):
+            hits: List[Dict[str, Any]] = []
+            for name, collection in tier:
+                if sum(1 for hit in ranked + hits if hit["distance"] <= stop_distance) >= n_results:
+                    break
+                if not collection.count():
+                    continue
+                results = collection.query(query_embeddings=[query_embedding], n_results=n_results)
+                searched += 1
+                if results["ids"] and results["ids"][0]:
+                    hits.extend(
+                        {
+                            "id": results["ids"][0][i],
+                            "document": results["documents"][0][i],
+                            "metadata": results["metadatas"][0][i],
+                            "distance": results["distances"][0][i],
+                        }
+                        for i in range(len(results["ids"][0]))
+                    )
+            hits.sort(key=lambda hit: hit["distance"])
+            ranked.extend(hits)
+        print(f"[DEBUG] Searched {searched} {kind} collection(s) - Namespace: {namespace}")
+        return ranked[:n_results]
+    
+    @staticmethod
+    def entry_id(prefix: str, document: str, row_id: Optional[int] = None) -> str:
+        """Stable id: the history row id if known, else a content hash."""
+        if row_id is not None:
+            return f"{prefix}_{row_id}"
+        return f"{prefix}_h{hashlib.sha1(document.encode('utf-8')).hexdigest()[:16]}"
+    
+    @staticmethod
+    def command_document(command: str, output: str) -> str:
+        return f"{command}\n{output}"
+    
+    @staticmethod
+    def task_document(description: str, steps: List[str], outcome: str) -> str:
+        return f"{description}\nSteps: {'; '.join(steps)}\nOutcome: {outcome}"
+    
+    @staticmethod
+    def _entry_metadata(metadata: Optional[Dict[str, Any]], row_id: Optional[int], document: str) -> Dict[str, Any]:
+        """Attach the source row id, insertion time and content hash used by GC and dedup."""
+        entry = dict(metadata or {})
+        if row_id is not None:
+            entry["row_id"] = row_id
+        # A re-index passes the history row's own time
+        entry["timestamp"] = entry.get("timestamp", time.time())
+        entry["last_seen"] = entry["timestamp"]
+        entry["occurrences"] = 1
+        entry["doc_hash"] = hashlib.sha1(document.encode("utf-8")).hexdigest()
+        return entry
+    
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a query, serving repeated queries from an LRU cache."""
+        with self._query_cache_lock:
+            cached = self._query_cache.get(query)
+            if cached is not None:
+                self._query_cache.move_to_end(query)
+                print(f"[DEBUG] Query embedding cache hit - Query: {query[:50]}")
+                return cached
+        
+        embedding = [float(x) for x in self.embedder([query])[0]]
+        
+        with self._query_cache_lock:
+            self._query_cache[query] = embedding
+            if len(self._query_cache) > self._query_cache_size:
+                self._query_cache.popitem(last=False)
+        return embedding
+    
+    def stored_embeddings(self, kind: str, documents: Sequence[str], dim: int) -> Dict[str, List[float]]:
+        """
+        Vectors already held for these documents, without running the model.
+        
+        Index entries are matched by content hash, then the embedding cache
+        fills in the rest. Only `dim`-sized vectors count (a PCA-reduced
+        flat collection stores shorter ones). Documents never indexed, such
+        as failed commands, are missing from the result.
+        """
+        by_hash = {hashlib.sha1(document.encode("utf-8")).hexdigest(): document for document in documents}
+        found: Dict[str, List[float]] = {}
+        for _, collection in self._search_collections(kind)[0]:
+            remaining = [doc_hash for doc_hash, document in by_hash.items() if document not in found]
+            if not remaining:
+                break
+            entries = collection.get(where={"doc_hash": {"$in": remaining}}, include=["metadatas", "embeddings"])
+            if entries.get("embeddings") is None:
+                continue
+            for metadata, vector in zip(entries["metadatas"], entries["embeddings"]):
+                document = by_hash.get((metadata or {}).get("doc_hash"))
+                if document is not None and len(vector) == dim:
+                    found[document] = vector
+        
+        missing = {EmbeddingCache.text_hash(document): document for document in by_hash.values() if document not in found}
+        if missing:
+            cached = self.embedder.cache.get_many(self.embedder.model_name, list(missing))
+            for text_hash, vector in cached.items():
+                if len(vector) == dim:
+                    found[missing[text_hash]] = vector
+        return found
+    
     def search_similar_commands(
         self,
         query: str,
         n_results: int = 5,
+        query_embedding: Optional[List[float]] = None,
+        stop_distance: Optional[float] = None,
+        namespace: Optional[str] = None,
+        fallback: Optional[bool] = None,
     ) -> List[Dict[str, Any]]:
-        """Find semantically similar past commands."""
+        """Find semantically similar past commands, optionally scoped to a namespace."""
         print(f"[DEBUG] Searching for similar commands - Query: {query[:50]}, n_results: {n_results}")
         try:
-            results = self.commands_collection.query(
-                query_texts=[query],
-                n_results=n_results,
+            similar = self._search(
+                "commands", query_embedding or self.embed_query(query), n_results, stop_distance, namespace, fallback
             )
             
-            if not results["ids"] or not results["ids"][0]:
+            if not similar:
                 print(f"[DEBUG] No similar commands found")
                 return []
             
-            similar = [
-                {
-                    "id": results["ids"][0][i],
-                    "document": results["documents"][0][i],
-                    "metadata": results["metadatas"][0][i],
-                    "distance": results["distances"][0][i],
-                }
-                for i in range(len(results["ids"][0]))
-            ]
             print(f"[DEBUG] Found {len(similar)} similar commands")
             return similar
         except Exception as e:
@@ -97,19 +546,16 @@ class VectorStore:
         steps: List[str],
         outcome: str,
         metadata: Optional[Dict[str, Any]] = None,
+        row_id: Optional[int] = None,
     ) -> None:
-        """Add task to vector store."""
+        """Add task to vector store, linked to its task_history row."""
         print(f"[DEBUG] Adding task to vector store - Description: {description[:50]}, Steps: {len(steps)}")
         try:
-            doc_id = f"task_{len(self.tasks_collection.get()['ids'])}"
-            print(f"[DEBUG] Generated doc_id: {doc_id}")
-            
-            task_doc = f"{description}\nSteps: {'; '.join(steps)}\nOutcome: {outcome}"
-            
-            self.tasks_collection.add(
-                documents=[task_doc],
-                metadatas=[metadata or {}],
-                ids=[doc_id],
+            self.add_many(
+                "tasks",
+                documents=[self.task_document(description, steps, outcome)],
+                metadatas=[metadata],
+                row_ids=[row_id],
             )
             print(f"[DEBUG] Task added successfully to vector store")
         except Exception as e:
@@ -120,31 +566,140 @@ class VectorStore:
         self,
         query: str,
         n_results: int = 3,
+        query_embedding: Optional[List[float]] = None,
+        stop_distance: Optional[float] = None,
+        namespace: Optional[str] = None,
+        fallback: Optional[bool] = None,
     ) -> List[Dict[str, Any]]:
-        """Find semantically similar past tasks."""
+        """Find semantically similar past tasks, optionally scoped to a namespace."""
         print(f"[DEBUG] Searching for similar tasks - Query: {query[:50]}, n_results: {n_results}")
         try:
-            results = self.tasks_collection.query(
-                query_texts=[query],
-                n_results=n_results,
+            similar = self._search(
+                "tasks", query_embedding or self.embed_query(query), n_results, stop_distance, namespace, fallback
             )
             
-            if not results["ids"] or not results["ids"][0]:
+            if not similar:
                 print(f"[DEBUG] No similar tasks found")
                 return []
             
-            similar = [
-                {
-                    "id": results["ids"][0][i],
-                    "document": results["documents"][0][i],
-                    "metadata": results["metadatas"][0][i],
-                    "distance": results["distances"][0][i],
-                }
-                for i in range(len(results["ids"][0]))
-            ]
             print(f"[DEBUG] Found {len(similar)} similar tasks")
             return similar
         except Exception as e:
             logger.error("vector_search_tasks_failed", error=str(e))
             print(f"[DEBUG ERROR] Failed to search similar tasks: {str(e)}")
             return []
+    
+    def delete_rows(
+        self,
+        row_ids: Dict[str, List[int]],
+        cutoff: Optional[datetime] = None,
+        batch_size: int = 500,
+    ) -> Dict[str, int]:
+        """
+        Delete the vectors linked to history rows that were just removed.
+        
+        `row_ids` maps a history table to the ids retention deleted, so the
+        cost follows the rows purged rather than the size of the index.
+        Month partitions that ended before `cutoff` are dropped whole. For
+        a full orphan scan, see `garbage_collect`.
+        """
+        removed = self._drop_expired_partitions(cutoff)
+        for name, table in (("commands", "command_history"), ("tasks", "task_history")):
+            purged = list(row_ids.get(table) or [])
+            if not purged:
+                continue
+            for collection_name, collection in self._search_collections(name)[0]:
+                # Under the write lock: ingestion may re-link a duplicate to a newer row
+                with self._write_lock:
+                    stale = []
+                    for start in range(0, len(purged), batch_size):
+                        chunk = purged[start:start + batch_size]
+                        stale.extend(collection.get(where={"row_id": {"$in": chunk}}, include=["metadatas"])["ids"])
+                    for start in range(0, len(stale), batch_size):
+                        collection.delete(ids=stale[start:start + batch_size])
+                removed[name] += len(stale)
+                if stale:
+                    print(f"[DEBUG] Vector delete on {collection_name} - Removed: {len(stale)}")
+        logger.info("vector_rows_deleted", **removed)
+        return removed
+    
+    def _drop_expired_partitions(self, cutoff: Optional[datetime]) -> Dict[str, int]:
+        """Drop month partitions that ended before `cutoff`; returns entries removed per kind."""
+        cutoff_ts = cutoff.replace(tzinfo=cutoff.tzinfo or timezone.utc).timestamp() if cutoff else None
+        removed = {}
+        for name in ("commands", "tasks"):
+            removed[name] = 0
+            if cutoff_ts is None:
+                continue
+            for namespace, month in self.partitions(name):
+                if month is not None and partition_end(month) <= cutoff_ts:
+                    removed[name] += self._drop_partition(name, namespace, month)
+        return removed
+    
+    def garbage_collect(
+        self,
+        long_term: "LongTermMemory",
+        cutoff: Optional[datetime] = None,
+        batch_size: int = 500,
+    ) -> Dict[str, int]:
+        """
+        Delete vectors whose history row is gone or that are older than `cutoff`.
+        
+        A maintenance pass over the whole index (`agentos-gc`); retention
+        uses `delete_rows` instead. Month partitions that ended before
+        `cutoff` are dropped whole. In the rest, entries without a `row_id`
+        predate row linkage and cannot be matched to history, so they are
+        treated as orphans. Deletes are issued in batches of `batch_size`.
+        """
+        cutoff_ts = cutoff.replace(tzinfo=cutoff.tzinfo or timezone.utc).timestamp() if cutoff else None
+        removed = self._drop_expired_partitions(cutoff)
+        for name, table in (("commands", "command_history"), ("tasks", "task_history")):
+            for collection_name, collection in self._search_collections(name)[0]:
+                # Scan and delete under the write lock: ingestion may re-link an entry to a new row
+                with self._write_lock:
+                    stale = []
+                    offset = 0
+                    while True:
+                        page = collection.get(include=["metadatas"], limit=batch_size, offset=offset)
+                        ids = page["ids"]
+                        if not ids:
+                            break
+                        offset += len(ids)
+                        
+                        metadatas = page["metadatas"] or [{}] * len(ids)
+                        linked = {}
+                        for doc_id, meta in zip(ids, metadatas):
+                            meta = meta or {}
+                            row_id = meta.get("row_id")
+                            if row_id is None:
+                                stale.append(doc_id)
+                            elif cutoff_ts is not None and meta.get("last_seen", meta.get("timestamp", cutoff_ts)) < cutoff_ts:
+                                stale.append(doc_id)
+                            else:
+                                linked[int(row_id)] = doc_id
+                        
+                        alive = long_term.existing_row_ids(table, list(linked))
+                        stale.extend(doc_id for row_id, doc_id in linked.items() if row_id not in alive)
+                    
+                    for start in range(0, len(stale), batch_size):
+                        collection.delete(ids=stale[start:start + batch_size])
+                removed[name] += len(stale)
+                print(f"[DEBUG] Vector GC on {collection_name} - Removed: {len(stale)}, Scanned: {offset}")
+            
+        logger.info("vector_gc_completed", **removed)
+        return removed
+    
+    def _drop_partition(self, kind: str, namespace: Optional[str], month: str) -> int:
+        """Delete a whole month partition; returns how many entries it held."""
+        name = partition_name(kind, namespace, month)
+        with self._write_lock:
+            count = self._partition(kind, namespace, month).count()
+            self.client.delete_collection(name)
+            with self._partitions_lock:
+                self._partitions = {
+                    **self._partitions,
+                    kind: {key: c for key, c in self._partitions[kind].items() if key != (namespace, month)},
+                }
+        logger.info("vector_partition_dropped", partition=name, entries=count)
+        print(f"[DEBUG] Dropped vector partition {name} - Entries: {count}")
+        return count
@@ -0,0 +1,91 @@
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Optional
+import structlog
+
+logger = structlog.get_logger()
+
+class MemoryWriter:
+    """
+    Single-writer queue for memory mutations.
+
+    `submit` enqueues a callable and returns a `Future`; one daemon thread
+    runs the queued callables in order, so mutations never interleave and
+    readers can use snapshots instead of locks. A mutation that submits
+    another one from the writer thread runs inline rather than
+    deadlocking, and once stopped, submissions run on the caller's thread.
+    """
+
+    def __init__(self, name: str = "memory-writer"):
+        self.name = name
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        # Orders submissions against stop(), so nothing is queued after the final drain
+        self._lock = threading.Lock()
+        print(f"[DEBUG] MemoryWriter initialized - Thread: {self.name}")
+
+    def start(self) -> None:
+        """Start the writer thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        print(f"[DEBUG] MemoryWriter thread started")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Finish queued mutations and stop the thread."""
+        if self._thread is None:
+            return
+        with self._lock:
+            self._stopped.set()
+            self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+        print(f"[DEBUG] MemoryWriter thread stopped")
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        """Queue `fn(*args, **kwargs)` for the writer thread."""
+        future: Future = Future()
+        with self._lock:
+            queued = (
+                self._thread is not None
+                and threading.current_thread() is not self._thread
+                and not self._stopped.is_set()
+            )
+            if queued:
+                self._queue.put((future, fn, args, kwargs))
+        if not queued:
+            self._execute(future, fn, args, kwargs)
+        return future
+
+    def call(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run a mutation on the writer thread and wait for its result."""
+        return self.submit(fn, *args, **kwargs).result()
+
+    @staticmethod
+    def _execute(future: Future, fn: Callable[..., Any], args: tuple, kwargs: dict) -> None:
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            logger.error("memory_write_failed", error=str(e))
+            future.set_exception(e)
+
+    def _run(self) -> None:
+        while True:
+            task = self._queue.get()
+            if task is None:
+                break
+            self._execute(*task)
+        # Drain anything queued while stopping
+        while True:
+            try:
+                task = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if task is not None:
+                self._execute(*task)
@@ -2,6 +2,9 @@ import pytest
 from pathlib import Path
 import tempfile
 import shutil
+import hashlib
+import numpy as np
+from chromadb.api.types import EmbeddingFunction
 
 @pytest.fixture
 def temp_dir():
@@ -27,3 +30,25 @@ def mock_tool_call():
         "name": "test_tool",
         "arguments": {"param": "value"}
     }
+
+
+class HashEmbeddingFunction(EmbeddingFunction):
+    """Deterministic bag-of-words embedding so vector tests run offline."""
+    
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+    
+    def __call__(self, input):
+        vectors = []
+        for text in input:
+            vector = np.zeros(self.dim, dtype=np.float32)
+            for token in text.lower().split():
+                vector[int(hashlib.md5(token.encode()).hexdigest(), 16) % self.dim] += 1.0
+            norm = np.linalg.norm(vector)
+            vectors.append(vector / norm if norm else vector)
+        return vectors
+
+@pytest.fixture
+def hash_embedding():
+    """Offline embedding function for vector store tests."""
+    return HashEmbeddingFunction()
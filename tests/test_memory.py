@@ -5,20 +5,43 @@ Tests cover short-term memory, long-term memory, context manager, and vector sto
 
 import pytest
 import sqlite3
+import time
 import json
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 import tempfile
 import sys
 import os
+import numpy as np
+import threading
 
 # Add src to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
-from agentos.memory.short_term import ShortTermMemory, MemoryItem
-from agentos.memory.long_term import LongTermMemory
+from agentos.memory.short_term import ShortTermMemory, MemoryItem, parse_capacity
+from agentos.memory.long_term import LongTermMemory, RETENTION_TABLES
+from agentos.memory import context_manager as context_manager_module
 from agentos.memory.context_manager import ContextManager
 from agentos.memory.buffer import CircularBuffer
+from agentos.memory.blob_store import BlobStore
+from agentos.memory.retention import RetentionJob
+from agentos.memory.vector_store import VectorStore
+from agentos.memory.namespace import namespace_for, project_root, resolve_namespace
+from agentos.memory.indexer import VectorIndexer
+from agentos.memory.embedding_cache import EmbeddingCache, CachedEmbedder
+from agentos.memory.flat_index import FlatCollection, INITIAL_CAPACITY
+from agentos.memory.ann_index import IVFIndex, recall_at_k, synthetic_history
+from agentos.memory import quantization
+from agentos.memory.quantization import Int8Codec, measure_compression
+from agentos.memory.retrieval import HybridRetriever
+from agentos.memory.reranker import MemoryReranker
+from agentos.memory.rollup import RollupSummarizer
+from agentos.memory.session_store import SessionStore
+from agentos.memory.writer import MemoryWriter
+from agentos.memory.preferences import PreferenceCache
+from agentos.memory.patterns import PatternMiner
+from agentos.memory.reindex import Reindexer
+from config.settings import settings
 
 
 class TestMemoryItem:
@@ -49,6 +72,18 @@ class TestMemoryItem:
         assert item.metadata == metadata
         assert item.metadata["status"] == "success"
         print("[PASSED] MemoryItem with metadata works correctly")
+    
+    def test_memory_item_is_slotted(self):
+        """Test that items carry no per-instance dict."""
+        print("\n[TEST] Testing slotted MemoryItem...")
+        item = MemoryItem(content="ls", item_type="command")
+        
+        assert not hasattr(item, "__dict__")
+        assert item.timestamp.timestamp() == pytest.approx(item.created_at)
+        # The pre-slots keyword still works
+        moment = datetime(2025, 1, 2, 3, 4, 5)
+        assert MemoryItem(content="ls", timestamp=moment).timestamp == moment
+        print("[PASSED] MemoryItem is slotted")
 
 
 class TestShortTermMemory:
@@ -100,6 +135,18 @@ class TestShortTermMemory:
         assert all(item.item_type == "command" for item in commands)
         print("[PASSED] Type filtering works correctly")
     
+    def test_type_index_follows_eviction(self, short_term):
+        """Test that per-type indexes drop items evicted from the main deque."""
+        print("\n[TEST] Testing per-type index eviction...")
+        short_term.add("Task 0", item_type="task")
+        for i in range(12):
+            short_term.add(f"Command {i}", item_type="command")
+        
+        assert short_term.get_recent(10, item_type="task") == []
+        assert [item.content for item in short_term.get_recent(2, item_type="command")] == ["Command 10", "Command 11"]
+        assert next(short_term.iter_recent(1)).content == "Command 11"
+        print("[PASSED] Per-type index consistent with capacity")
+    
     def test_capacity_limit(self, short_term):
         """Test that capacity limit is enforced."""
         print("\n[TEST] Testing capacity limit...")
@@ -162,6 +209,270 @@ class TestShortTermMemory:
         assert "Active Task" in summary
         print("[PASSED] Context summary generated correctly")
 
+    
+    def test_parse_capacity(self):
+        """Test item-count and budget capacity settings."""
+        print("\n[TEST] Testing capacity parsing...")
+        assert parse_capacity(50) == (50, "items")
+        assert parse_capacity("50") == (50, "items")
+        assert parse_capacity("4000 tokens") == (4000, "tokens")
+        assert parse_capacity("64kb") == (64 * 1024, "bytes")
+        with pytest.raises(ValueError):
+            parse_capacity("lots")
+        print("[PASSED] Capacity forms parsed")
+    
+    def test_token_budget_evicts_oldest(self):
+        """Test that a token budget evicts oldest items to fit."""
+        print("\n[TEST] Testing token-budget eviction...")
+        memory = ShortTermMemory(capacity="20 tokens", eviction="oldest")
+        for i in range(5):
+            memory.add(f"{i}" * 20, item_type="command")  # 5 tokens each
+        memory.add("x" * 400, item_type="result")  # alone over budget, still kept
+        
+        assert memory.size == 100
+        assert [item.content[0] for item in memory.get_recent(10)] == ["x"]
+        
+        memory.add("y" * 4)
+        assert len(memory) == 1 and memory.size == 1
+        print("[PASSED] Oldest items evicted to fit the budget")
+    
+    def test_score_eviction_keeps_important_items(self):
+        """Test lowest-score-first eviction with tombstoned reads."""
+        print("\n[TEST] Testing score-based eviction...")
+        memory = ShortTermMemory(capacity="40b", eviction="score")
+        memory.add("important task", item_type="task", metadata={"score": 5})
+        for i in range(100):
+            memory.add(f"cmd {i:03d}", item_type="command")
+        
+        contents = [item.content for item in memory.get_recent(100)]
+        assert contents[0] == "important task"
+        assert contents[-1] == "cmd 099"
+        assert memory.size <= 40
+        assert [item.content for item in memory.get_recent(1, item_type="command")] == ["cmd 099"]
+        print("[PASSED] High-score item survived eviction")
+
+
+
+    def test_snapshot_reads_during_writes(self):
+        """Readers on other threads never see a deque mid-mutation."""
+        print("\n[TEST] Testing snapshot reads during concurrent writes...")
+        memory = ShortTermMemory(capacity="400 tokens", eviction="score")
+        errors = []
+        done = threading.Event()
+        
+        def read():
+            while not done.is_set():
+                try:
+                    items = memory.get_recent(20, item_type="command")
+                    assert all(item.item_type == "command" for item in items)
+                    memory.get_context_summary()
+                except Exception as e:
+                    errors.append(e)
+        
+        readers = [threading.Thread(target=read) for _ in range(4)]
+        for reader in readers:
+            reader.start()
+        for i in range(2000):
+            memory.add(f"item {i} " * 5, item_type="command" if i % 2 else "task", metadata={"score": i % 7})
+        done.set()
+        for reader in readers:
+            reader.join()
+        
+        assert errors == []
+        assert memory.snapshot() == tuple(memory.items())
+        print("[PASSED] Snapshot reads are safe during writes")
+    
+    def test_recent_reads_do_not_copy(self, monkeypatch):
+        """get_recent after a write walks the deque tail instead of copying it."""
+        print("\n[TEST] Testing zero-copy recent reads...")
+        memory = ShortTermMemory(capacity=1000)
+        for i in range(500):
+            memory.add(f"item {i}", item_type="command")
+        monkeypatch.setattr(memory, "snapshot", lambda *args: pytest.fail("recent read copied the deque"))
+        
+        memory.add("newest", item_type="command")
+        assert [item.content for item in memory.get_recent(3, item_type="command")] == ["item 498", "item 499", "newest"]
+        assert len(memory._snapshots) == 0
+        print("[PASSED] Recent reads walk the tail")
+
+class TestRollupSummarizer:
+    """Test background rollups of evicted short-term items."""
+    
+    def test_evicted_items_rolled_up(self):
+        """Test that items evicted from short-term memory become a rollup."""
+        print("\n[TEST] Testing eviction rollups...")
+        summarizer = RollupSummarizer(batch_size=10, max_rollups=3)
+        memory = ShortTermMemory(capacity=3, on_evict=summarizer.submit)
+        for i in range(13):
+            memory.add(f"Command: get_cpu_info({{}})\nOutput: {i}", item_type="command", metadata={"success": i != 0})
+        
+        summarizer.flush()
+        rollups = summarizer.rollups()
+        
+        assert len(rollups) == 1
+        assert "10 commands (1 failed): get_cpu_info x10" in rollups[0]
+        print(f"[PASSED] Rollup: {rollups[0]}")
+    
+    def test_tier_stays_bounded(self):
+        """Test that the oldest rollups are merged once the tier is full."""
+        print("\n[TEST] Testing bounded rollup tier...")
+        summarizer = RollupSummarizer(batch_size=2, max_rollups=2)
+        summarizer.submit([MemoryItem(content=f"Task: task {i}", item_type="task") for i in range(10)])
+        summarizer.flush()
+        
+        assert len(summarizer.rollups()) == 2
+        assert sum(rollup.item_count for rollup in summarizer._rollups) == 10
+        print("[PASSED] Rollup tier bounded")
+    
+    def test_background_thread_summarizes(self):
+        """Test that the worker thread flushes a partial batch after the delay."""
+        print("\n[TEST] Testing background rollup thread...")
+        summarizer = RollupSummarizer(batch_size=10, flush_seconds=0.1, summarize_fn=lambda texts: f"{len(texts)} items")
+        summarizer.start()
+        try:
+            summarizer.submit([MemoryItem(content="note")] * 3)
+            deadline = time.time() + 5
+            while not summarizer.rollups() and time.time() < deadline:
+                time.sleep(0.05)
+        finally:
+            summarizer.stop()
+        
+        assert summarizer.rollups() == ["3 items"]
+        print("[PASSED] Partial batch summarized in the background")
+    
+    def test_clear_drops_in_flight_batch(self):
+        """Test that a batch being summarized during clear() does not land in the new session."""
+        print("\n[TEST] Testing rollup clear during summarization...")
+        started, release = threading.Event(), threading.Event()
+        
+        def slow_summary(texts):
+            started.set()
+            release.wait(5)
+            return f"{len(texts)} items"
+        
+        summarizer = RollupSummarizer(batch_size=2, flush_seconds=60, summarize_fn=slow_summary)
+        summarizer.start()
+        try:
+            summarizer.submit([MemoryItem(content="old session")] * 2)
+            assert started.wait(5)
+            summarizer.clear()
+            release.set()
+            summarizer.submit([MemoryItem(content="new session")])
+        finally:
+            summarizer.stop()
+        
+        assert summarizer.rollups() == ["1 items"]
+        print("[PASSED] In-flight rollup from the cleared session dropped")
+
+
+class TestSessionStore:
+    """Test SessionStore class."""
+    
+    def test_restore_after_reopen(self, temp_dir):
+        """Items, timestamps and task context survive a restart."""
+        print("\n[TEST] Testing session restore after reopen...")
+        store = SessionStore(root=temp_dir, checkpoint_every=1000)
+        memory = ShortTermMemory(capacity=10)
+        store.open("work", memory)
+        memory.add("Command: ls", item_type="command", metadata={"success": True})
+        memory.add("Task: deploy", item_type="task")
+        memory.set_task_context("deploy", {"target": "staging"})
+        created = [item.created_at for item in memory.items()]
+        # No close(): restore must work from the log alone. A dying process
+        # loses its lock, nothing else
+        store._release()
+        
+        restored = ShortTermMemory(capacity=10)
+        assert SessionStore(root=temp_dir).open("work", restored) == 2
+        assert [item.content for item in restored.items()] == ["Command: ls", "Task: deploy"]
+        assert [item.created_at for item in restored.items()] == created
+        assert restored.get_recent(1, item_type="command")[0].metadata == {"success": True}
+        context = restored.get_task_context()
+        assert context["name"] == "deploy" and context["target"] == "staging"
+        assert isinstance(context["started"], datetime)
+        print("[PASSED] Session restored after reopen")
+    
+    def test_checkpoint_and_log_tail(self, temp_dir):
+        """Checkpoints compact the log; later records replay on top."""
+        print("\n[TEST] Testing checkpoint plus log tail replay...")
+        store = SessionStore(root=temp_dir, checkpoint_every=3)
+        memory = ShortTermMemory(capacity=3)
+        store.open("s", memory)
+        for i in range(7):
+            memory.add(f"item {i}")
+        assert (temp_dir / "s" / "checkpoint.json").exists()
+        log_lines = (temp_dir / "s" / "log.jsonl").read_text().splitlines()
+        assert len(log_lines) < 3
+        store._release()
+        
+        restored = ShortTermMemory(capacity=3)
+        SessionStore(root=temp_dir).open("s", restored)
+        assert [item.content for item in restored.items()] == ["item 4", "item 5", "item 6"]
+        print("[PASSED] Checkpoint and log tail replayed")
+    
+    def test_named_sessions_isolated(self, temp_dir):
+        """Switching sessions saves one and restores the other."""
+        print("\n[TEST] Testing named session isolation...")
+        store = SessionStore(root=temp_dir)
+        memory = ShortTermMemory(capacity=10)
+        store.open("a", memory)
+        memory.add("in a")
+        store.open("b", memory)
+        assert len(memory) == 0
+        memory.add("in b")
+        memory.clear_task_context()
+        store.open("a", memory)
+        assert [item.content for item in memory.items()] == ["in a"]
+        assert store.list_sessions() == ["a", "b"]
+        with pytest.raises(ValueError):
+            store.open("../escape", memory)
+        print("[PASSED] Named sessions are isolated")
+    
+    def test_concurrent_open_falls_back(self, temp_dir):
+        """A session held by another store is not overwritten; the second gets its own."""
+        print("\n[TEST] Testing concurrent session use...")
+        first, second = ShortTermMemory(capacity=10), ShortTermMemory(capacity=10)
+        store_a, store_b = SessionStore(root=temp_dir), SessionStore(root=temp_dir)
+        store_a.open("default", first)
+        store_b.open("default", second)
+        assert store_a.name == "default"
+        assert store_b.name == f"default-{os.getpid()}"
+        for i in range(3):
+            first.add(f"A{i}")
+            second.add(f"B{i}")
+        store_a.close()
+        store_b.close()
+        
+        restored = ShortTermMemory(capacity=10)
+        SessionStore(root=temp_dir).open("default", restored)
+        assert [item.content for item in restored.items()] == ["A0", "A1", "A2"]
+        # The checkpoint is plain JSON
+        state = json.loads((temp_dir / "default" / "checkpoint.json").read_text())
+        assert [fields[0] for fields in state["items"]] == ["A0", "A1", "A2"]
+        print("[PASSED] Concurrent session use kept apart")
+
+class TestMemoryWriter:
+    """Test MemoryWriter class."""
+    
+    def test_serializes_mutations(self):
+        """Submissions run one at a time on the writer thread, in order."""
+        print("\n[TEST] Testing single-writer ordering...")
+        writer = MemoryWriter()
+        writer.start()
+        seen = []
+        futures = [writer.submit(lambda i=i: seen.append((i, threading.current_thread().name))) for i in range(50)]
+        for future in futures:
+            future.result(timeout=5)
+        assert [i for i, _ in seen] == list(range(50))
+        assert {name for _, name in seen} == {"memory-writer"}
+        
+        # Nested submissions run inline instead of deadlocking
+        assert writer.call(lambda: writer.call(lambda: "inner")) == "inner"
+        with pytest.raises(ZeroDivisionError):
+            writer.call(lambda: 1 / 0)
+        writer.stop()
+        assert writer.call(lambda: "after stop") == "after stop"
+        print("[PASSED] Mutations serialized on one thread")
 
 class TestLongTermMemory:
     """Test LongTermMemory class."""
@@ -302,6 +613,1070 @@ class TestLongTermMemory:
         history_after = long_term.get_command_history(limit=10)
         assert len(history_after) == 0
         print("[PASSED] Old data cleanup works correctly")
+    
+    def test_full_output_retrieval(self, long_term):
+        """Test that full output is kept while the row stores a preview."""
+        print("\n[TEST] Testing full output retrieval...")
+        output = "line\n" * 1000
+        command_id = long_term.add_command("cat big.txt", output, True)
+        
+        history = long_term.get_command_history(limit=1)
+        assert len(history[0]["output"]) < len(output)
+        assert long_term.get_command_output(command_id) == output
+        print("[PASSED] Full output retrieved from blob store")
+    
+    def test_repeated_output_deduplicated(self, long_term):
+        """Test that identical outputs share one blob."""
+        print("\n[TEST] Testing output deduplication...")
+        for _ in range(5):
+            long_term.add_command("git status", "nothing to commit", True)
+        
+        stats = long_term.blobs.stats()
+        assert stats["blobs"] == 1
+        print("[PASSED] Repeated outputs stored once")
+
+
+    def test_command_stats_rollup(self, long_term):
+        """Per-tool daily stats are maintained on insert and survive purges."""
+        print("\n[TEST] Testing command stats rollup...")
+        long_term.add_command("read_file({})", "ok", True, {"tool": "read_file", "duration_ms": 10})
+        long_term.add_command("read_file({})", "err", False, {"tool": "read_file", "duration_ms": 30})
+        long_term.add_command("get_cpu_info({})", "ok", True, {"tool": "get_cpu_info", "duration_ms": 5})
+        long_term.add_command("echo hi", "hi", True)
+        
+        by_tool = {row["tool"]: row for row in long_term.command_stats(days=1)}
+        assert long_term.command_stats(days=1)[0]["tool"] == "read_file"
+        assert by_tool["read_file"]["count"] == 2
+        assert by_tool["read_file"]["failure_count"] == 1
+        assert by_tool["read_file"]["avg_duration_ms"] == 20
+        assert by_tool["other"]["count"] == 1
+        by_day = long_term.command_stats(days=1, by="day")
+        assert len(by_day) == 1 and by_day[0]["count"] == 4
+        
+        long_term.purge_expired("command_history", datetime.now() + timedelta(days=1))
+        assert long_term.command_stats(days=1, by="day")[0]["count"] == 4
+        with pytest.raises(ValueError):
+            long_term.command_stats(by="week")
+        print("[PASSED] Command stats rollup maintained incrementally")
+    
+    def test_per_thread_connections(self, long_term):
+        """Concurrent writers each use their own connection."""
+        print("\n[TEST] Testing per-thread connections...")
+        connections = set()
+        
+        def write(n):
+            connections.add(id(long_term._connect()))
+            for i in range(20):
+                long_term.add_command(f"cmd {n}-{i}", "ok", True)
+        
+        threads = [threading.Thread(target=write, args=(n,)) for n in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert len(connections) == 6
+        assert len(long_term.get_command_history(limit=500)) == 120
+        assert long_term._connect() is long_term._connect()
+        print("[PASSED] Per-thread connections handled concurrent writes")
+
+class TestPreferenceCache:
+    """Test PreferenceCache class."""
+    
+    def test_reads_from_memory_and_writes_through(self, temp_dir):
+        """Reads never touch SQLite; pending writes land in one batch."""
+        print("\n[TEST] Testing preference cache write-through...")
+        long_term = LongTermMemory(db_path=temp_dir / "prefs.db")
+        long_term.set_preference("theme", "dark")
+        cache = PreferenceCache(long_term, flush_seconds=60, check_seconds=60)
+        assert cache.get("theme") == "dark"
+        
+        cache.set("editor", {"name": "vim"})
+        cache.set("language", "en")
+        assert cache.get("editor") == {"name": "vim"}
+        assert long_term.get_preference("editor") is None
+        
+        assert cache.flush() == 2
+        assert long_term.get_preference("editor") == {"name": "vim"}
+        # Our own batch does not count as an external change
+        assert cache.refresh() is False
+        print("[PASSED] Preferences served from memory and written through")
+    
+    def test_external_change_invalidates(self, temp_dir):
+        """A write by another process is picked up via the change counter."""
+        print("\n[TEST] Testing cross-process preference invalidation...")
+        cache = PreferenceCache(LongTermMemory(db_path=temp_dir / "prefs.db"), flush_seconds=60, check_seconds=0)
+        cache.set("theme", "light")
+        other_process = LongTermMemory(db_path=temp_dir / "prefs.db")
+        other_process.set_preference("shell", "zsh")
+        
+        assert cache.get("shell") == "zsh"
+        # Unflushed local values survive the reload
+        assert cache.get("theme") == "light"
+        cache.flush()
+        assert other_process.get_preference("theme") == "light"
+        print("[PASSED] External preference change reloaded")
+
+    def test_accessors_use_attached_cache(self, temp_dir, monkeypatch):
+        """Once attached, the LongTermMemory accessors never open SQLite."""
+        print("\n[TEST] Testing preference accessors through the cache...")
+        long_term = LongTermMemory(db_path=temp_dir / "prefs.db")
+        long_term.set_preference("theme", "dark")
+        cache = PreferenceCache(long_term, flush_seconds=60, check_seconds=60)
+        long_term.preference_cache = cache
+
+        def no_database():
+            raise AssertionError("preference read touched the database")
+        monkeypatch.setattr(long_term, "_connect", no_database)
+        assert long_term.get_preference("theme") == "dark"
+        long_term.set_preference("editor", "vim")
+        assert long_term.get_preference("editor") == "vim"
+        assert long_term.get_preference("missing", "default") == "default"
+
+        monkeypatch.undo()
+        assert cache.flush() == 1
+        long_term.preference_cache = None
+        assert long_term.get_preference("editor") == "vim"
+        print("[PASSED] Preference accessors served from the cache")
+
+class TestPatternMiner:
+    """Test PatternMiner class."""
+    
+    @staticmethod
+    def record(long_term, request, calls, success=True):
+        request_id = f"req-{request}-{len(long_term.get_request_traces())}"
+        for tool, arguments in calls:
+            long_term.add_command(
+                f"{tool}({json.dumps(arguments)})", "{}", success,
+                {"tool": tool, "request": request, "request_id": request_id},
+            )
+    
+    def test_mines_parameterized_macros(self, temp_dir):
+        """Repeated request shapes become macros with slots filled on match."""
+        print("\n[TEST] Testing macro mining and matching...")
+        long_term = LongTermMemory(db_path=temp_dir / "patterns.db")
+        for name in ("a.txt", "b.txt", "c.txt"):
+            self.record(long_term, f"Show me {name}", [("read_file", {"path": name})])
+        for name in ("x.txt", "y.txt", "z.txt"):
+            self.record(long_term, f"save {name}", [("write_file", {"path": name, "content": "hi"})])
+        self.record(long_term, "what is my cpu usage?", [("get_cpu_info", {})])
+        
+        miner = PatternMiner(long_term, min_support=3, min_confidence=0.9)
+        assert miner.mine() == 2
+        
+        macro = miner.match("show me Notes.md")
+        assert macro is not None and macro["confidence"] == 1.0
+        assert macro["calls"] == [("read_file", {"path": "Notes.md"})]
+        # Mutating macros and unsupported requests never take the fast path
+        assert miner.match("save notes.md") is None
+        assert miner.match("what is my cpu usage") is None
+        
+        miner.record_use(macro["id"])
+        # A conflicting outcome for the same template lowers its confidence to 3/4
+        self.record(long_term, "show me docs", [("list_directory", {"path": "docs"})])
+        miner.mine()
+        kept = next(pattern for pattern in miner.macros() if pattern["id"] == macro["id"])
+        assert kept["usage_count"] == 1 and kept["confidence"] == 0.75
+        assert miner.match("show me e.txt") is None
+        print("[PASSED] Macros mined and matched")
+
+class TestBlobStore:
+    """Test BlobStore class."""
+    
+    @pytest.fixture
+    def blob_store(self, temp_dir):
+        """Create a BlobStore backed by a temporary database."""
+        print("\n[FIXTURE] Creating BlobStore instance...")
+        db_path = temp_dir / "blobs.db"
+        LongTermMemory(db_path=db_path)
+        return BlobStore(db_path=db_path)
+    
+    def test_put_get_roundtrip(self, blob_store):
+        """Test storing and fetching a blob."""
+        print("\n[TEST] Testing blob roundtrip...")
+        content = "total 42\n" * 200
+        digest = blob_store.put(content)
+        
+        assert digest == BlobStore.hash_content(content)
+        assert blob_store.get(digest) == content
+        stats = blob_store.stats()
+        assert stats["compressed_bytes"] < stats["raw_bytes"]
+        print("[PASSED] Blob stored compressed and retrieved intact")
+    
+    def test_prune_unreferenced(self, blob_store):
+        """Test that orphaned blobs are pruned."""
+        print("\n[TEST] Testing prune_unreferenced...")
+        digest = blob_store.put("orphan output")
+        
+        assert blob_store.prune_unreferenced() == 1
+        assert blob_store.get(digest) is None
+        print("[PASSED] Orphaned blobs pruned")
+
+
+class TestRetentionJob:
+    """Test RetentionJob class."""
+    
+    @pytest.fixture
+    def long_term(self, temp_dir):
+        """Create a LongTermMemory instance with temp database."""
+        print("\n[FIXTURE] Creating LongTermMemory for retention...")
+        return LongTermMemory(db_path=temp_dir / "retention.db")
+    
+    def _age_rows(self, long_term, table, days):
+        with sqlite3.connect(long_term.db_path) as conn:
+            conn.execute(
+                f"UPDATE {table} SET timestamp = datetime('now', ?)",
+                (f"-{days} days",)
+            )
+            conn.commit()
+    
+    def test_run_once_archives_and_deletes(self, long_term, temp_dir):
+        """Test that expired rows are archived, deleted and reported."""
+        print("\n[TEST] Testing retention run_once...")
+        for i in range(7):
+            long_term.add_command(f"cmd{i}", f"output{i}" * 500, True)
+        long_term.add_task("Old task", ["step"], "done", 5)
+        self._age_rows(long_term, "command_history", 40)
+        self._age_rows(long_term, "task_history", 40)
+        long_term.add_command("fresh", "output", True)
+        
+        job = RetentionJob(long_term, retention_days=30, batch_size=3, archive_dir=temp_dir / "archive")
+        report = job.run_once()
+        
+        assert report.rows_deleted == {"command_history": 7, "task_history": 1}
+        assert report.rows_archived == 8
+        assert report.blobs_pruned == 7
+        history = long_term.get_command_history(limit=10)
+        assert [row["command"] for row in history] == ["fresh"]
+        
+        import gzip
+        segments = sorted((temp_dir / "archive").glob("command_history-*.jsonl.gz"))
+        assert len(segments) == 1
+        with gzip.open(segments[0], "rt", encoding="utf-8") as f:
+            archived = [json.loads(line) for line in f]
+        assert len(archived) == 7
+        assert archived[0]["output"] == "output0" * 500
+        print("[PASSED] Expired rows archived and removed")
+    
+    def test_run_once_deletes_purged_vectors(self, long_term, temp_dir, hash_embedding):
+        """Test that a pass deletes the vectors of exactly the rows it purged."""
+        print("\n[TEST] Testing retention vector deletes...")
+        vector_store = VectorStore(path=temp_dir / "vectors", embedding_function=hash_embedding, backend="flat")
+        old = long_term.add_command("old", "output", True)
+        self._age_rows(long_term, "command_history", 40)
+        fresh = long_term.add_command("fresh", "output", True)
+        vector_store.add_many("commands", ["old", "fresh"], row_ids=[old, fresh])
+        
+        job = RetentionJob(long_term, vector_store=vector_store, retention_days=30, archive_dir=temp_dir / "archive")
+        report = job.run_once()
+        
+        assert report.vectors_deleted == {"commands": 1, "tasks": 0}
+        assert vector_store.commands_collection.get()["ids"] == [f"cmd_{fresh}"]
+        print("[PASSED] Purged rows' vectors deleted")
+    
+    def test_purge_reclaims_space(self, long_term, temp_dir):
+        """Test that purging many rows frees every page and shrinks the file."""
+        print("\n[TEST] Testing incremental vacuum...")
+        for i in range(300):
+            long_term.add_command(f"cmd{i}", os.urandom(400).hex(), True)
+        self._age_rows(long_term, "command_history", 40)
+        job = RetentionJob(long_term, retention_days=30, batch_size=100, archive_dir=temp_dir / "archive")
+        
+        # Delete without vacuuming first, to see the free pages it leaves
+        for table in RETENTION_TABLES:
+            long_term.purge_expired(table, datetime.now(timezone.utc) - timedelta(days=30))
+        long_term.blobs.prune_unreferenced()
+        with sqlite3.connect(long_term.db_path) as conn:
+            free_before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        assert free_before > 10
+        
+        report = job.run_once()
+        
+        with sqlite3.connect(long_term.db_path) as conn:
+            assert conn.execute("PRAGMA freelist_count").fetchone()[0] == 0
+        assert report.bytes_reclaimed > 0
+        print("[PASSED] Free pages released to the filesystem")
+
+    def test_vacuum_checkpoints_wal(self, long_term, temp_dir):
+        """Test that a retention pass in WAL mode leaves no large log behind."""
+        print("\n[TEST] Testing vacuum with WAL...")
+        with sqlite3.connect(long_term.db_path) as conn:
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        for i in range(300):
+            long_term.add_command(f"cmd{i}", os.urandom(400).hex(), True)
+        self._age_rows(long_term, "command_history", 40)
+        size_before = long_term.disk_size()
+
+        report = RetentionJob(long_term, retention_days=30, batch_size=100, archive_dir=temp_dir / "archive").run_once()
+
+        wal_path = Path(f"{long_term.db_path}-wal")
+        assert not wal_path.exists() or wal_path.stat().st_size == 0
+        assert long_term.disk_size() == size_before - report.bytes_reclaimed
+        print("[PASSED] WAL checkpointed after vacuum")
+
+    def test_recent_rows_kept(self, long_term, temp_dir):
+        """Test that rows inside the retention window survive."""
+        print("\n[TEST] Testing retention keeps recent rows...")
+        long_term.add_command("recent", "output", True)
+        self._age_rows(long_term, "command_history", 5)
+        
+        job = RetentionJob(long_term, retention_days=30, archive_dir=temp_dir / "archive")
+        report = job.run_once()
+        
+        assert report.total_deleted == 0
+        assert len(long_term.get_command_history(limit=10)) == 1
+        print("[PASSED] Recent rows kept")
+
+
+class TestVectorStore:
+    """Test VectorStore class."""
+    
+    @pytest.fixture
+    def long_term(self, temp_dir):
+        """Create a LongTermMemory instance with temp database."""
+        return LongTermMemory(db_path=temp_dir / "vectors.db")
+    
+    @pytest.fixture(params=["chroma", "flat"])
+    def vector_store(self, request, temp_dir, hash_embedding):
+        """Create a VectorStore in a temporary directory for each backend."""
+        print(f"\n[FIXTURE] Creating VectorStore instance ({request.param})...")
+        try:
+            return VectorStore(path=temp_dir / "embeddings", embedding_function=hash_embedding, backend=request.param)
+        except Exception as e:
+            pytest.skip(f"VectorStore initialization failed: {e}")
+    
+    def test_reindex_rebuilds_from_history(self, vector_store, long_term, temp_dir):
+        """A reset re-index rebuilds both collections from SQLite alone."""
+        print("\n[TEST] Testing bulk re-index...")
+        ids = [long_term.add_command(f"read_file({{\"path\": \"f{i}.txt\"}})", f"contents {i}", True) for i in range(7)]
+        long_term.add_command("bad_tool({})", "boom", False)
+        long_term.add_task("deploy app", ["build", "push"], "done", 3)
+        vector_store.add_command("stale entry", "from an old model", row_id=999)
+        
+        progress = []
+        reindexer = Reindexer(long_term, vector_store, workers=0, batch_size=3, checkpoint_path=temp_dir / "ckpt.json")
+        report = reindexer.run(reset=True, progress=lambda *args: progress.append(args))
+        
+        assert report.rows == {"commands": 7, "tasks": 1}
+        assert vector_store.commands_collection.count() == 7
+        assert vector_store.tasks_collection.count() == 1
+        assert [done for kind, done, total, rate in progress if kind == "commands"] == [3, 6, 7]
+        entry = vector_store.commands_collection.get(ids=[f"cmd_{ids[0]}"])["metadatas"][0]
+        assert entry["success"] is True and entry["timestamp"] < time.time()
+        assert not (temp_dir / "ckpt.json").exists()
+        print("[PASSED] Vector store rebuilt from history")
+    
+    def test_reindex_resumes_from_checkpoint(self, vector_store, long_term, temp_dir):
+        """An interrupted run continues after the last loaded row."""
+        print("\n[TEST] Testing re-index resume...")
+        ids = [long_term.add_command(f"echo {i}", f"out {i}", True) for i in range(5)]
+        checkpoint = temp_dir / "ckpt.json"
+        reindexer = Reindexer(long_term, vector_store, workers=0, batch_size=2, checkpoint_path=checkpoint)
+        checkpoint.write_text(json.dumps({
+            "format": 1, "model": reindexer.model_name, "last_ids": {"commands": ids[2]},
+        }))
+        
+        report = reindexer.run(kinds=["commands"], reset=True)
+        assert report.resumed and report.rows == {"commands": 2}
+        assert sorted(vector_store.commands_collection.get()["ids"]) == [f"cmd_{ids[3]}", f"cmd_{ids[4]}"]
+        print("[PASSED] Re-index resumed from checkpoint")
+    
+    @pytest.mark.parametrize("workers", [0, 1])
+    def test_reindex_warms_embedding_cache(self, vector_store, long_term, temp_dir, workers):
+        """Re-indexed documents are written through the embedding cache."""
+        print(f"\n[TEST] Testing re-index cache write-through (workers={workers})...")
+        for i in range(4):
+            long_term.add_command(f"echo {i}", f"out {i}", True)
+        Reindexer(long_term, vector_store, workers=workers, batch_size=3, checkpoint_path=temp_dir / "ckpt.json").run(
+            kinds=["commands"], reset=True
+        )
+        
+        documents = vector_store.commands_collection.get()["documents"]
+        embedder = vector_store.embedder
+        misses = embedder.misses
+        embedder(documents)
+        assert len(documents) == 4 and embedder.misses == misses
+        print("[PASSED] Embedding cache warm after re-index")
+    
+    def test_entries_keyed_by_row_id(self, vector_store, long_term):
+        """Test that vector ids follow the SQLite row id."""
+        print("\n[TEST] Testing row-linked vector ids...")
+        row_id = long_term.add_command("list_directory({})", "a.txt b.txt", True)
+        vector_store.add_command("list_directory({})", "a.txt b.txt", {"tool": "list_directory"}, row_id=row_id)
+        
+        entry = vector_store.commands_collection.get(ids=[f"cmd_{row_id}"])
+        assert entry["metadatas"][0]["row_id"] == row_id
+        print("[PASSED] Vector entry linked to history row")
+    
+    def test_garbage_collect_removes_orphans(self, vector_store, long_term):
+        """Test that vectors whose history rows are gone get deleted."""
+        print("\n[TEST] Testing vector garbage collection...")
+        kept = long_term.add_command("kept", "output", True)
+        dropped = long_term.add_command("dropped", "output", True)
+        vector_store.add_command("kept", "output", row_id=kept)
+        vector_store.add_command("dropped", "output", row_id=dropped)
+        task_id = long_term.add_task("Task", ["step"], "done", 1)
+        vector_store.add_task("Task", ["step"], "done", row_id=task_id)
+        
+        with sqlite3.connect(long_term.db_path) as conn:
+            conn.execute("DELETE FROM command_history WHERE id = ?", (dropped,))
+            conn.commit()
+        
+        removed = vector_store.garbage_collect(long_term, batch_size=1)
+        
+        assert removed == {"commands": 1, "tasks": 0}
+        assert vector_store.commands_collection.get()["ids"] == [f"cmd_{kept}"]
+        print("[PASSED] Orphaned vectors removed")
+    
+    def test_delete_rows_touches_only_purged(self, vector_store, long_term):
+        """Test that retention deletes only the vectors of the rows it purged."""
+        print("\n[TEST] Testing targeted vector deletes...")
+        purged = long_term.add_command("purged", "output", True)
+        orphan = long_term.add_command("orphan", "output", True)
+        kept = long_term.add_command("kept", "output", True)
+        for command, row_id in (("purged", purged), ("orphan", orphan), ("kept", kept)):
+            vector_store.add_command(command, "output", row_id=row_id)
+        with sqlite3.connect(long_term.db_path) as conn:
+            conn.execute("DELETE FROM command_history WHERE id IN (?, ?)", (purged, orphan))
+            conn.commit()
+        
+        removed = vector_store.delete_rows({"command_history": [purged]}, batch_size=1)
+        
+        assert removed == {"commands": 1, "tasks": 0}
+        # Orphans not named by retention are left to the full garbage_collect scan
+        assert sorted(vector_store.commands_collection.get()["ids"]) == sorted([f"cmd_{orphan}", f"cmd_{kept}"])
+        print("[PASSED] Only purged rows' vectors deleted")
+    
+    def test_embed_query_cached(self, vector_store, hash_embedding):
+        """Test that repeated queries reuse the cached embedding."""
+        print("\n[TEST] Testing query embedding cache...")
+        calls = []
+        original = vector_store.embedder
+        vector_store.embedder = lambda texts: calls.append(texts) or original(texts)
+        
+        first = vector_store.embed_query("check cpu usage")
+        second = vector_store.embed_query("check cpu usage")
+        
+        assert first == second
+        assert len(calls) == 1
+        print("[PASSED] Query embedded once")
+    
+    def test_search_with_precomputed_embedding(self, vector_store):
+        """Test that both collections accept one shared query embedding."""
+        print("\n[TEST] Testing shared query embedding...")
+        vector_store.add_command("get_cpu_info({})", "cpu 12%", row_id=1)
+        vector_store.add_task("Check cpu", ["get_cpu_info"], "done", row_id=1)
+        
+        embedding = vector_store.embed_query("cpu")
+        commands = vector_store.search_similar_commands("cpu", 1, query_embedding=embedding)
+        tasks = vector_store.search_similar_tasks("cpu", 1, query_embedding=embedding)
+        
+        assert commands[0]["id"] == "cmd_1"
+        assert tasks[0]["id"] == "task_1"
+        print("[PASSED] Shared embedding used for both searches")
+    
+    def test_add_many_stable_ids(self, vector_store):
+        """Test batched upserts with row-id and content-hash ids."""
+        print("\n[TEST] Testing add_many...")
+        documents = [f"get_cpu_info({i})" for i in range(5)]
+        vector_store.add_many("commands", documents, row_ids=[1, 2, 3, None, None], batch_size=2)
+        # Re-adding the unkeyed entries upserts instead of duplicating
+        vector_store.add_many("commands", documents[3:])
+        
+        ids = set(vector_store.commands_collection.get()["ids"])
+        assert len(ids) == 5
+        assert {"cmd_1", "cmd_2", "cmd_3"} <= ids
+        print("[PASSED] add_many uses stable ids")
+    
+    def test_duplicates_collapse_into_one_entry(self, vector_store):
+        """Test that repeats bump occurrences on the existing entry instead of inserting."""
+        print("\n[TEST] Testing duplicate collapsing...")
+        vector_store.add_command("get_cpu_info({})", "cpu 12%", row_id=1)
+        vector_store.add_many("commands", ["get_cpu_info({})\ncpu 12%"] * 2, row_ids=[2, 3])
+        # An outbox retry of the same row is not another occurrence
+        vector_store.add_command("get_cpu_info({})", "cpu 12%", row_id=3)
+        
+        entries = vector_store.commands_collection.get()
+        assert entries["ids"] == ["cmd_1"]
+        assert entries["metadatas"][0]["occurrences"] == 3
+        assert entries["metadatas"][0]["row_id"] == 3
+        print("[PASSED] Exact duplicates collapsed")
+    
+    def test_near_duplicates_within_threshold(self, vector_store):
+        """Test that similar documents collapse only within the distance threshold."""
+        print("\n[TEST] Testing near-duplicate threshold...")
+        vector_store.dedup_distance = 0.6
+        inserted = vector_store.add_many("commands", ["a b c d e", "a b c d f", "x y"], row_ids=[1, 2, 3], batch_size=1)
+        
+        assert inserted == 2
+        assert sorted(vector_store.commands_collection.get()["ids"]) == ["cmd_1", "cmd_3"]
+        # The entry still shows row 1's text, so it keeps pointing at row 1
+        entry = vector_store.commands_collection.get(ids=["cmd_1"])["metadatas"][0]
+        assert entry["occurrences"] == 2 and entry["row_id"] == 1
+        print("[PASSED] Near duplicate collapsed, distinct entry kept")
+    
+    def test_month_partitions_searched_newest_first(self, vector_store):
+        """Test that entries land in their month and search stops early on good hits."""
+        print("\n[TEST] Testing partitioned search...")
+        old = datetime(2025, 1, 15, tzinfo=timezone.utc).timestamp()
+        vector_store.add_many("commands", ["a b c", "a b x"], metadatas=[{"timestamp": old}, None], row_ids=[1, 2])
+
+        keys = vector_store.partitions("commands")
+        assert len(keys) == 2 and keys[-1] == (None, "2025_01")
+        # Any hit is good enough: only the current month is searched
+        assert [hit["id"] for hit in vector_store.search_similar_commands("a b c", 1, stop_distance=4.0)] == ["cmd_2"]
+        # Nothing is good enough: older months are searched too
+        assert [hit["id"] for hit in vector_store.search_similar_commands("a b c", 1, stop_distance=0.0)] == ["cmd_1"]
+        print("[PASSED] Newest partition searched first")
+
+    def test_garbage_collect_drops_expired_partitions(self, vector_store, long_term, temp_dir, hash_embedding):
+        """Test that retention drops whole months and unpartitioned entries stay searchable."""
+        print("\n[TEST] Testing partition drop...")
+        path = temp_dir / "partitioned"
+        legacy = VectorStore(path=path, embedding_function=hash_embedding, backend=vector_store.backend, partitioning="none")
+        legacy_id = long_term.add_command("legacy entry", "output", True)
+        legacy.add_command("legacy entry", "output", row_id=legacy_id)
+        vector_store = VectorStore(path=path, embedding_function=hash_embedding, backend=vector_store.backend, partitioning="month")
+
+        old = datetime(2025, 1, 15, tzinfo=timezone.utc).timestamp()
+        row_ids = [long_term.add_command(f"old {i}", "output", True) for i in range(3)]
+        vector_store.add_many("commands", [f"old {i}" for i in range(3)], metadatas=[{"timestamp": old}] * 3, row_ids=row_ids)
+
+        removed = vector_store.garbage_collect(long_term, cutoff=datetime(2025, 3, 1, tzinfo=timezone.utc))
+
+        assert removed["commands"] == 3
+        assert (None, "2025_01") not in vector_store.partitions("commands")
+        hits = vector_store.search_similar_commands("legacy entry", 1)
+        assert hits[0]["id"] == f"cmd_{legacy_id}"
+        print("[PASSED] Expired partition dropped, legacy collection kept")
+
+    def test_namespace_scoped_search(self, vector_store):
+        """Test that namespaced entries get their own partitions and rank first."""
+        print("\n[TEST] Testing namespace-scoped vector search...")
+        vector_store.add_many(
+            "commands", ["a b c", "a b x"],
+            metadatas=[{"namespace": "proj-a"}, {"namespace": "proj-b"}], row_ids=[1, 2],
+        )
+
+        assert {namespace for namespace, _ in vector_store.partitions("commands")} == {"proj-a", "proj-b"}
+        scoped = vector_store.search_similar_commands("a b c", 2, namespace="proj-b", fallback=False)
+        assert [hit["id"] for hit in scoped] == ["cmd_2"]
+        # The closer match from proj-a only fills in behind proj-b's own hit
+        with_fallback = vector_store.search_similar_commands("a b c", 2, namespace="proj-b", fallback=True, stop_distance=0.0)
+        assert [hit["id"] for hit in with_fallback] == ["cmd_2", "cmd_1"]
+        print("[PASSED] Namespace searched first, others as fallback")
+
+
+class TestFlatCollection:
+    """Test the NumPy flat vector index."""
+    
+    @pytest.fixture
+    def collection(self, temp_dir):
+        return FlatCollection(temp_dir / "flat", "commands")
+    
+    @staticmethod
+    def _vectors(n, dim=8, seed=0):
+        return np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+    
+    def test_query_matches_exact_search(self, collection):
+        """Test that top-k equals a brute-force cosine ranking."""
+        print("\n[TEST] Testing flat top-k search...")
+        vectors = self._vectors(200)
+        ids = [f"cmd_{i}" for i in range(200)]
+        collection.upsert(ids=ids, embeddings=vectors, documents=ids)
+        
+        query = vectors[17] + 0.01
+        result = collection.query(query_embeddings=[query], n_results=5)
+        
+        normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        expected = np.argsort(-(normed @ (query / np.linalg.norm(query))))[:5]
+        assert result["ids"][0] == [ids[i] for i in expected]
+        assert result["ids"][0][0] == "cmd_17"
+        assert result["distances"][0] == sorted(result["distances"][0])
+        print("[PASSED] Flat search matches exact ranking")
+    
+    def test_delete_and_compaction(self, collection):
+        """Test that deletes hide entries and compaction drops dead slots."""
+        print("\n[TEST] Testing flat delete and compaction...")
+        vectors = self._vectors(10)
+        ids = [f"cmd_{i}" for i in range(10)]
+        collection.upsert(ids=ids, embeddings=vectors, documents=ids)
+        
+        collection.delete(ids=ids[:4])
+        
+        assert collection.count() == 6
+        # More than a quarter of the slots died, so the file was compacted
+        assert len(collection._slot_ids) == 6
+        result = collection.query(query_embeddings=[vectors[0]], n_results=10)
+        assert "cmd_0" not in result["ids"][0]
+        assert len(result["ids"][0]) == 6
+        print("[PASSED] Deleted entries compacted away")
+    
+    def test_updates_log_compactly(self, collection, temp_dir):
+        """Test that metadata updates append small records and the log gets compacted."""
+        print("\n[TEST] Testing flat update log...")
+        collection.upsert(ids=["a"], embeddings=self._vectors(1), documents=["x" * 500], metadatas=[{"n": 0}])
+        for n in range(1, 501):
+            collection.update(ids=["a"], metadatas=[{"n": n}])
+        
+        log_path = temp_dir / "flat" / "entries.jsonl"
+        lines = log_path.read_text(encoding="utf-8").splitlines()
+        assert len(lines) <= 256
+        assert log_path.stat().st_size < 20_000
+        reopened = FlatCollection(temp_dir / "flat", "commands")
+        assert reopened.get(ids=["a"])["metadatas"][0] == {"n": 500}
+        assert reopened.get(ids=["a"])["documents"][0] == "x" * 500
+        print("[PASSED] Update log stays bounded")
+    
+    def test_persistence_and_upsert(self, collection, temp_dir):
+        """Test that entries survive reopening and upserts replace."""
+        print("\n[TEST] Testing flat persistence...")
+        vectors = self._vectors(3)
+        collection.upsert(ids=["a", "b", "c"], embeddings=vectors, documents=["A", "B", "C"], metadatas=[{"n": 1}, {"n": 2}, {"n": 3}])
+        collection.upsert(ids=["b"], embeddings=vectors[:1], documents=["B2"], metadatas=[{"n": 4}])
+        
+        reopened = FlatCollection(temp_dir / "flat", "commands")
+        
+        assert reopened.count() == 3
+        entry = reopened.get(ids=["b"])
+        assert entry["documents"] == ["B2"]
+        assert reopened.get(where={"n": 3})["ids"] == ["c"]
+        print("[PASSED] Flat collection persisted")
+
+
+class TestIVFIndex:
+    """Test the approximate IVF index."""
+    
+    def test_recall_against_exact(self):
+        """Test that probing enough cells recovers the exact neighbours."""
+        print("\n[TEST] Testing IVF recall@10...")
+        corpus = synthetic_history(3000, dim=32, clusters=40)
+        queries = synthetic_history(30, dim=32, clusters=40, seed=1)
+        index = IVFIndex(nlist=16, nprobe=8)
+        index.train(corpus)
+        index.add(range(len(corpus)), corpus)
+        
+        exact, approx = [], []
+        for q in queries:
+            exact.append(np.argsort(-(corpus @ q))[:10])
+            pool = index.candidates(q)
+            approx.append(pool[np.argsort(-(corpus[pool] @ q))[:10]])
+        
+        assert recall_at_k(approx, exact, 10) > 0.9
+        assert recall_at_k(exact, exact, 10) == 1.0
+        print("[PASSED] IVF recall acceptable")
+    
+    def test_flat_collection_builds_ivf_incrementally(self, temp_dir):
+        """Test that the collection trains, persists and reloads the index."""
+        print("\n[TEST] Testing incremental IVF in FlatCollection...")
+        vectors = synthetic_history(600, dim=16, clusters=10)
+        ids = [f"cmd_{i}" for i in range(600)]
+        collection = FlatCollection(temp_dir / "ivf", "commands", index="ivf", ivf_nlist=8, ivf_nprobe=8, ivf_train_size=400)
+        collection.upsert(ids=ids[:300], embeddings=vectors[:300], documents=ids[:300])
+        assert not collection.ivf.is_trained
+        collection.upsert(ids=ids[300:], embeddings=vectors[300:], documents=ids[300:])
+        assert collection.ivf.is_trained
+        
+        reopened = FlatCollection(temp_dir / "ivf", "commands", index="ivf", ivf_nlist=8, ivf_nprobe=8, ivf_train_size=400)
+        result = reopened.query(query_embeddings=[vectors[42]], n_results=3)
+        
+        assert reopened.ivf.is_trained
+        assert result["ids"][0][0] == "cmd_42"
+        print("[PASSED] IVF index built incrementally and reloaded")
+
+
+class TestQuantization:
+    """Test int8/PCA-compressed embedding storage."""
+    
+    def test_measure_compression(self):
+        """Test the built-in measurement of memory saving and recall loss."""
+        print("\n[TEST] Testing int8 compression ratio and recall...")
+        corpus = synthetic_history(2000, dim=128, clusters=40)
+        queries = synthetic_history(20, dim=128, clusters=40, seed=1)
+        report = measure_compression(corpus, queries, k=10)
+        
+        assert report["compression_ratio"] > 3.5
+        assert report["recall@10"] > 0.9
+        print(f"[PASSED] Compression {report['compression_ratio']:.1f}x, recall@10 {report['recall@10']:.3f}")
+    
+    def test_quantized_collection_query(self, temp_dir):
+        """Test that an int8 collection finds the exact neighbour and reloads."""
+        print("\n[TEST] Testing int8 FlatCollection...")
+        vectors = synthetic_history(300, dim=32, clusters=10)
+        ids = [f"cmd_{i}" for i in range(300)]
+        collection = FlatCollection(temp_dir / "int8", "commands", quantization="int8")
+        collection.upsert(ids=ids, embeddings=vectors, documents=ids)
+        
+        reopened = FlatCollection(temp_dir / "int8", "commands")
+        result = reopened.query(query_embeddings=[vectors[7]], n_results=3)
+        
+        assert reopened.codec is not None
+        assert (temp_dir / "int8" / "vectors.npy").stat().st_size < 32 * 4 * INITIAL_CAPACITY
+        assert result["ids"][0][0] == "cmd_7"
+        assert result["distances"][0][0] < 0.01
+        print("[PASSED] int8 collection searched correctly")
+    
+    def test_int8_scores_in_blocks(self, monkeypatch):
+        """Test that block-wise scoring matches scoring the whole corpus at once."""
+        print("\n[TEST] Testing block-wise int8 scoring...")
+        vectors = synthetic_history(1000, dim=32, clusters=10)
+        codes, scales = Int8Codec.encode(vectors)
+        query = vectors[3]
+        expected = (codes.astype(np.float32) @ query) * scales
+        monkeypatch.setattr(quantization, "SCORE_BLOCK_ROWS", 64)
+        
+        assert np.allclose(Int8Codec.scores(query, codes, scales), expected, atol=1e-5)
+        print("[PASSED] Block-wise scores match")
+    
+    def test_pca_reencode_and_rerank(self, temp_dir):
+        """Test that PCA re-encodes the store once trained and re-ranking restores order."""
+        print("\n[TEST] Testing PCA re-encoding with exact re-rank...")
+        vectors = synthetic_history(400, dim=64, clusters=10)
+        ids = [f"cmd_{i}" for i in range(400)]
+        lookup = dict(zip(ids, vectors))
+        collection = FlatCollection(
+            temp_dir / "pca", "commands", quantization="int8", pca_dim=16, pca_train_size=200,
+            rerank=20, exact_embedder=lambda docs: [lookup[d] for d in docs],
+        )
+        collection.upsert(ids=ids[:200], embeddings=vectors[:200], documents=ids[:200])
+        assert collection.pca.is_fitted
+        collection.upsert(ids=ids[200:], embeddings=vectors[200:], documents=ids[200:])
+        
+        result = collection.query(query_embeddings=[vectors[321]], n_results=5)
+        
+        assert collection._vectors.shape[1] == 16
+        assert result["ids"][0][0] == "cmd_321"
+        assert result["distances"][0][0] < 1e-4
+        print("[PASSED] PCA store re-encoded and re-ranked exactly")
+
+    def test_pca_keeps_distance_thresholds(self, temp_dir):
+        """Test that dedup and retrieval cut-offs decide the same with PCA on and off."""
+        print("\n[TEST] Testing PCA distances against thresholds...")
+        vectors = synthetic_history(400, dim=64, clusters=10)
+        ids = [f"cmd_{i}" for i in range(400)]
+        lookup = dict(zip(ids, vectors))
+        exact = FlatCollection(temp_dir / "exact", "commands")
+        reduced = FlatCollection(
+            temp_dir / "pca", "commands", pca_dim=8, pca_train_size=200,
+            exact_embedder=lambda docs: [lookup[d] for d in docs],
+        )
+        for collection in (exact, reduced):
+            collection.upsert(ids=ids, embeddings=vectors, documents=ids)
+        assert reduced.pca.is_fitted
+
+        rng = np.random.default_rng(3)
+        near_duplicate = vectors[42] + rng.normal(scale=0.02, size=64).astype(np.float32)
+        unrelated = rng.normal(size=64).astype(np.float32)
+        for query, n_results, threshold in ((near_duplicate, 1, 0.02), (unrelated, 5, 1.0)):
+            expected = exact.query(query_embeddings=[query], n_results=n_results)["distances"][0]
+            result = reduced.query(query_embeddings=[query], n_results=n_results)
+            got = result["distances"][0]
+            assert [d <= threshold for d in got] == [d <= threshold for d in expected]
+            # Each hit carries its exact full-dimension distance
+            normed = query / np.linalg.norm(query)
+            for doc_id, distance in zip(result["ids"][0], got):
+                full = lookup[doc_id] / np.linalg.norm(lookup[doc_id])
+                assert distance == pytest.approx(2.0 - 2.0 * float(full @ normed), abs=1e-4)
+        print("[PASSED] PCA distances match full-dimension distances")
+
+
+class TestEmbeddingCache:
+    """Test EmbeddingCache and CachedEmbedder."""
+    
+    def test_repeated_texts_skip_model(self, temp_dir, hash_embedding):
+        """Test that cached texts are not re-embedded, even after reopening."""
+        print("\n[TEST] Testing persistent embedding cache...")
+        calls = []
+        
+        def model(texts):
+            calls.append(list(texts))
+            return hash_embedding(texts)
+        
+        embedder = CachedEmbedder(model, EmbeddingCache(temp_dir / "cache.db"), "test-model")
+        first = embedder(["get_cpu_info({})", "list_directory({})", "get_cpu_info({})"])
+        assert calls == [["get_cpu_info({})", "list_directory({})"]]
+        
+        reopened = CachedEmbedder(model, EmbeddingCache(temp_dir / "cache.db"), "test-model")
+        second = reopened(["get_cpu_info({})"])
+        
+        assert len(calls) == 1
+        assert np.allclose(first[0], second[0])
+        print("[PASSED] Repeated texts served from cache")
+    
+    def test_cache_keyed_by_model(self, temp_dir, hash_embedding):
+        """Test that a different model name does not reuse vectors."""
+        print("\n[TEST] Testing model-scoped cache keys...")
+        cache = EmbeddingCache(temp_dir / "cache.db")
+        CachedEmbedder(hash_embedding, cache, "model-a")(["text"])
+        embedder_b = CachedEmbedder(hash_embedding, cache, "model-b")
+        embedder_b(["text"])
+        
+        assert embedder_b.misses == 1
+        print("[PASSED] Cache entries scoped by model")
+    
+    def test_size_bounded_eviction(self, temp_dir, hash_embedding):
+        """Test that the least recently used entries are evicted."""
+        print("\n[TEST] Testing embedding cache eviction...")
+        cache = EmbeddingCache(temp_dir / "cache.db", max_entries=10)
+        embedder = CachedEmbedder(hash_embedding, cache, "model")
+        for i in range(25):
+            embedder([f"command {i}"])
+        
+        assert len(cache) <= 10
+        with sqlite3.connect(cache.path) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] == len(cache)
+        print("[PASSED] Cache size bounded")
+
+    def test_hits_batch_recency_until_put(self, temp_dir, hash_embedding):
+        """Test that hits do not write, and their recency lands with the next put."""
+        print("\n[TEST] Testing batched last_used updates...")
+        cache = EmbeddingCache(temp_dir / "cache.db", max_entries=10)
+        embedder = CachedEmbedder(hash_embedding, cache, "model")
+        for i in range(10):
+            embedder([f"command {i}"])
+        key = EmbeddingCache.text_hash("command 0")
+
+        def last_used():
+            with sqlite3.connect(cache.path) as conn:
+                return conn.execute(
+                    "SELECT last_used FROM embeddings WHERE text_hash = ?", (key,)
+                ).fetchone()
+
+        before = last_used()
+        embedder(["command 0"])
+        assert last_used() == before
+
+        # The put that overflows the cache flushes first, so the oldest
+        # entry survives eviction because it was just read
+        embedder(["command 10"])
+        assert last_used() is not None and last_used()[0] > before[0]
+        assert cache.flush() == 0
+        print("[PASSED] Recency buffered and flushed on put")
+
+
+class TestVectorIndexer:
+    """Test VectorIndexer and the vector outbox."""
+    
+    @pytest.fixture
+    def long_term(self, temp_dir):
+        return LongTermMemory(db_path=temp_dir / "outbox.db")
+    
+    @pytest.fixture
+    def vector_store(self, temp_dir, hash_embedding):
+        try:
+            return VectorStore(path=temp_dir / "embeddings", embedding_function=hash_embedding)
+        except Exception as e:
+            pytest.skip(f"VectorStore initialization failed: {e}")
+    
+    def test_outbox_written_with_history_row(self, long_term):
+        """Test that the outbox row is written in the history transaction."""
+        print("\n[TEST] Testing outbox enqueue...")
+        row_id = long_term.add_command("ls", "a b", True, index_document="ls\na b")
+        long_term.add_command("bad", "error", False)
+        
+        entries = long_term.fetch_outbox()
+        assert [(e["kind"], e["row_id"]) for e in entries] == [("commands", row_id)]
+        assert long_term.outbox_stats()["pending"] == 1
+        print("[PASSED] Outbox row written atomically")
+    
+    def test_drain_indexes_and_clears_outbox(self, long_term, vector_store):
+        """Test that draining moves outbox entries into the vector store."""
+        print("\n[TEST] Testing indexer drain...")
+        for i in range(5):
+            long_term.add_command(f"cmd{i}", "out", True, index_document=f"cmd{i}\nout")
+        long_term.add_task("Task", ["step"], "done", 1, index_document="Task")
+        
+        indexer = VectorIndexer(long_term, vector_store, batch_size=2)
+        assert indexer.drain() == 6
+        
+        assert vector_store.commands_collection.count() == 5
+        assert vector_store.tasks_collection.count() == 1
+        assert indexer.lag()["pending"] == 0
+        print("[PASSED] Outbox drained into vector store")
+    
+    def test_failed_batch_is_retried_later(self, long_term):
+        """Test that a failing vector store leaves entries for retry."""
+        print("\n[TEST] Testing indexer retry...")
+        
+        class FailingStore:
+            def add_many(self, *args, **kwargs):
+                raise RuntimeError("embedding model unavailable")
+        
+        long_term.add_command("cmd", "out", True, index_document="cmd\nout")
+        indexer = VectorIndexer(long_term, FailingStore())
+        
+        assert indexer.drain_once() == 0
+        lag = indexer.lag()
+        assert lag["pending"] == 1
+        assert lag["failing"] == 1
+        # Backoff hides the entry until its retry time
+        assert long_term.fetch_outbox() == []
+        print("[PASSED] Failed batch scheduled for retry")
+
+
+class TestHybridRetriever:
+    """Test BM25 + vector retrieval with reciprocal-rank fusion."""
+    
+    @pytest.fixture
+    def long_term(self, temp_dir):
+        return LongTermMemory(db_path=temp_dir / "hybrid.db")
+    
+    @pytest.fixture
+    def retriever(self, temp_dir, long_term, hash_embedding):
+        try:
+            vector_store = VectorStore(path=temp_dir / "embeddings", embedding_function=hash_embedding, backend="flat")
+        except Exception as e:
+            pytest.skip(f"VectorStore initialization failed: {e}")
+        return HybridRetriever(long_term, vector_store, max_distance=1.5)
+    
+    def _record(self, retriever, command, output):
+        row_id = retriever.long_term.add_command(command, output, True)
+        retriever.vector_store.add_command(command, output, row_id=row_id)
+        return row_id
+    
+    def test_search_text_exact_tokens(self, long_term):
+        """Test that full-text search matches filenames and error codes, and follows deletes."""
+        print("\n[TEST] Testing BM25 full-text search...")
+        kept = long_term.add_command("read_file(config.yaml)", "error E1042: missing key", False)
+        dropped = long_term.add_command("read_file(notes.txt)", "hello", True)
+        
+        hits = long_term.search_text("command_history", "E1042 config.yaml")
+        assert [hit["id"] for hit in hits] == [kept]
+        
+        with sqlite3.connect(long_term.db_path) as conn:
+            conn.execute("DELETE FROM command_history WHERE id = ?", (dropped,))
+            conn.commit()
+        assert long_term.search_text("command_history", "notes.txt") == []
+        print("[PASSED] Exact tokens matched via FTS5")
+    
+    def test_fusion_dedupes_by_row(self, retriever):
+        """Test that a row found by both legs appears once, ranked first."""
+        print("\n[TEST] Testing reciprocal-rank fusion...")
+        both = self._record(retriever, "get_cpu_info({})", "cpu usage 12%")
+        self._record(retriever, "get_memory_info({})", "memory usage 40%")
+        
+        results = retriever.search("commands", "cpu usage", limit=5)
+        row_ids = [hit["metadata"]["row_id"] for hit in results]
+        
+        assert row_ids[0] == both
+        assert len(row_ids) == len(set(row_ids))
+        assert set(results[0]["sources"]) == {"vector", "lexical"}
+        print("[PASSED] Rankings fused and deduplicated")
+    
+    def test_distance_threshold_limits_results(self, retriever):
+        """Test that unrelated vector hits are cut instead of padding n_results."""
+        print("\n[TEST] Testing distance cut-off...")
+        self._record(retriever, "get_cpu_info({})", "cpu usage 12%")
+        self._record(retriever, "list_directory(/tmp)", "a.txt b.txt")
+        retriever.max_distance = 0.5
+        
+        results = retriever.search("commands", "get_cpu_info({}) cpu usage 12%", limit=5)
+        
+        assert len(results) == 1
+        print("[PASSED] Distant matches dropped")
+
+    def test_unrelated_query_returns_nothing(self, retriever, long_term):
+        """Test that stopwords and weak lexical matches do not make rows relevant."""
+        print("\n[TEST] Testing unrelated query...")
+        self._record(retriever, "read_file(notes.txt)", "notes from the morning meeting")
+        self._record(retriever, "get_cpu_info({})", "cpu usage is 12%")
+
+        assert long_term.search_text("command_history", "what is the weather in paris") == []
+        assert retriever.search("commands", "what is the weather in paris", limit=5) == []
+        # Shares "morning" with a row, but is not about it
+        assert retriever.search("commands", "good morning weather forecast for paris today", limit=5) == []
+        print("[PASSED] Unrelated query returned nothing")
+    
+    def test_lexical_corroboration_uses_stored_vectors(self, retriever, long_term):
+        """Test that corroboration never embeds documents, and unindexed rows are dropped."""
+        print("\n[TEST] Testing lexical corroboration without model calls...")
+        indexed = self._record(retriever, "read_file(config.yaml)", "config.yaml port 8080")
+        long_term.add_command("read_file(config.yaml)", "config.yaml error E1042", False)
+        query_embedding = retriever.vector_store.embed_query("config.yaml")
+        embedded = []
+        original = retriever.vector_store.embedder.embedding_function
+        retriever.vector_store.embedder.embedding_function = lambda texts: embedded.append(texts) or original(texts)
+        
+        hits = retriever._lexical_leg("commands", "config.yaml", query_embedding)
+        
+        assert embedded == []
+        assert [hit["metadata"]["row_id"] for hit in hits] == [indexed]
+        print("[PASSED] Lexical hits corroborated from stored vectors")
+    
+    def test_malformed_row_skipped(self, retriever, long_term):
+        """Test that one bad timestamp does not fail the whole retrieval."""
+        print("\n[TEST] Testing malformed history rows...")
+        good = self._record(retriever, "get_cpu_info({})", "cpu usage 12%")
+        bad = self._record(retriever, "get_cpu_info({'verbose': true})", "cpu usage 12% per core")
+        with sqlite3.connect(long_term.db_path) as conn:
+            conn.execute("UPDATE command_history SET timestamp = 'yesterday' WHERE id = ?", (bad,))
+            conn.commit()
+        
+        results = retriever.search("commands", "cpu usage", limit=5)
+        
+        assert good in [hit["metadata"]["row_id"] for hit in results]
+        assert bad not in [hit["metadata"]["row_id"] for hit in results if "lexical" in hit["sources"]]
+        print("[PASSED] Malformed row skipped")
+    
+    def test_lexical_leg_scoped_to_namespace(self, retriever, long_term):
+        """Test that full-text hits come from the current namespace, others only as fallback."""
+        print("\n[TEST] Testing namespace-scoped lexical search...")
+        other = long_term.add_command("read_file(config.yaml)", "project a", True, namespace="proj-a")
+        own = long_term.add_command("read_file(config.yaml)", "project b", True, namespace="proj-b")
+        retriever.namespace, retriever.fallback = "proj-b", False
+        
+        hits = retriever._lexical_leg("commands", "config.yaml")
+        assert [hit["metadata"]["row_id"] for hit in hits] == [own]
+        assert hits[0]["metadata"]["namespace"] == "proj-b"
+        
+        retriever.fallback = True
+        assert [hit["metadata"]["row_id"] for hit in retriever._lexical_leg("commands", "config.yaml")] == [own, other]
+        assert len(long_term.get_command_history(namespace="proj-a")) == 1
+        print("[PASSED] Lexical search scoped to namespace")
+
+
+class TestMemoryReranker:
+    """Test recency, outcome and MMR re-ranking."""
+    
+    def _candidate(self, document, days_old=0.0, success=True, doc_id=None):
+        return {
+            "id": doc_id or document,
+            "document": document,
+            "metadata": {"timestamp": time.time() - days_old * 86400, "success": success},
+        }
+    
+    def test_recency_and_failure_weighting(self, hash_embedding):
+        """Test that older and failed matches rank below fresh successful ones."""
+        print("\n[TEST] Testing recency decay and success weighting...")
+        reranker = MemoryReranker(hash_embedding, half_life_days=7, recency_weight=0.5, failure_weight=0.3, mmr_lambda=1.0)
+        query = hash_embedding(["disk usage"])[0]
+        candidates = [
+            self._candidate("disk usage", days_old=60, doc_id="old"),
+            self._candidate("disk usage", success=False, doc_id="failed"),
+            self._candidate("disk usage", doc_id="fresh"),
+        ]
+        
+        ranked = reranker.rerank(query, candidates, limit=3)
+        
+        assert [c["id"] for c in ranked] == ["fresh", "old", "failed"]
+        assert ranked[0]["relevance"] > ranked[1]["relevance"] > ranked[2]["relevance"]
+        print("[PASSED] Fresh successful match ranked first")
+    
+    def test_mmr_skips_near_duplicates(self, hash_embedding):
+        """Test that MMR fills slots with distinct items instead of repeats."""
+        print("\n[TEST] Testing MMR diversity...")
+        reranker = MemoryReranker(hash_embedding, recency_weight=0.0, mmr_lambda=0.5)
+        query = hash_embedding(["check disk usage"])[0]
+        candidates = [
+            self._candidate("check disk usage df"),
+            self._candidate("check disk usage df"),
+            self._candidate("check disk usage du folder"),
+        ]
+        
+        ranked = reranker.rerank(query, candidates, limit=2)
+        
+        assert [c["document"] for c in ranked] == ["check disk usage df", "check disk usage du folder"]
+        print("[PASSED] Near-duplicate skipped")
 
 
 class TestCircularBuffer:
@@ -352,6 +1727,7 @@ class TestCircularBuffer:
         recent = buffer.get_recent(3)
         assert len(recent) == 3
         assert recent[-1] == "item4"
+        assert buffer.get_recent(0) == []
         print("[PASSED] Recent items retrieved correctly")
     
     def test_clear(self, buffer):
@@ -367,20 +1743,51 @@ class TestCircularBuffer:
         print("[PASSED] Buffer cleared successfully")
 
 
+class TestNamespace:
+    """Test memory namespace resolution."""
+    
+    def test_namespace_follows_git_root(self, temp_dir):
+        """Test that every directory of a project maps to the project's namespace."""
+        print("\n[TEST] Testing namespace resolution...")
+        project = temp_dir / "My Project"
+        (project / ".git").mkdir(parents=True)
+        (project / "src" / "pkg").mkdir(parents=True)
+        
+        assert project_root(project / "src" / "pkg") == project.resolve()
+        assert namespace_for(project / "src" / "pkg") == namespace_for(project)
+        assert namespace_for(project).startswith("My-Project-")
+        assert namespace_for(project) != namespace_for(temp_dir)
+        assert resolve_namespace("client work") == "client-work"
+        print("[PASSED] Namespace derived from git root")
+
+
 class TestContextManager:
     """Test ContextManager class."""
     
     @pytest.fixture
-    def context_manager(self):
-        """Create a ContextManager instance."""
+    def context_manager(self, temp_dir, hash_embedding, monkeypatch):
+        """Create a ContextManager on a temporary data directory with an offline embedder."""
         print("\n[FIXTURE] Creating ContextManager instance...")
+        memory = settings.memory
+        monkeypatch.setattr(memory, "db_path", temp_dir / "agentos.db")
+        monkeypatch.setattr(memory, "vector_db_path", temp_dir / "embeddings")
+        monkeypatch.setattr(memory, "sessions_path", temp_dir / "sessions")
+        monkeypatch.setattr(memory, "archive_path", temp_dir / "archive")
+        monkeypatch.setattr(memory, "embedding_cache_path", temp_dir / "embedding_cache.db")
+        
+        class OfflineVectorStore(VectorStore):
+            def __init__(self, **kwargs):
+                super().__init__(embedding_function=hash_embedding, **kwargs)
+        monkeypatch.setattr(context_manager_module, "VectorStore", OfflineVectorStore)
         # This will fail if dependencies aren't available
         # but we'll catch it gracefully
         try:
-            return ContextManager()
+            instance = ContextManager()
         except Exception as e:
             print(f"[WARNING] Could not initialize ContextManager: {e}")
             pytest.skip(f"ContextManager initialization failed: {e}")
+        yield instance
+        instance.close()
     
     def test_initialization(self, context_manager):
         """Test ContextManager initialization."""
@@ -455,6 +1862,59 @@ class TestContextManager:
         
         assert len(context_manager.short_term._memory) == 0
         print("[PASSED] Session cleared successfully")
+    
+    def test_context_cache_invalidation(self, context_manager):
+        """Test that repeated queries are memoized until memory changes."""
+        print("\n[TEST] Testing memoized context builds...")
+        # Background passes also invalidate; keep them out of the way
+        context_manager.retention.stop()
+        context_manager.indexer.stop()
+        # Fresh data directory: no restored session or history to depend on
+        assert len(context_manager.short_term) == 0
+        assert context_manager.long_term.get_command_history(limit=1) == []
+        calls = []
+        retrieve = context_manager.retriever.retrieve
+        context_manager.retriever.retrieve = lambda *args, **kwargs: calls.append(args) or retrieve(*args, **kwargs)
+        
+        first = context_manager.get_context_for_query("Show  CPU usage")
+        context_manager.get_context_for_query("show cpu usage")
+        assert len(calls) == 1
+        
+        context_manager.clear_session()
+        context = context_manager.get_context_for_query("show cpu usage")
+        assert len(calls) == 1
+        assert context["recent_actions"] == []
+        
+        context_manager.record_command("get_cpu_info({})", "cpu 12%", True)
+        context = context_manager.get_context_for_query("show cpu usage")
+        assert len(calls) == 2
+        assert len(context["recent_actions"]) == 1
+        assert context["summary"] != first["summary"]
+        print("[PASSED] Context cache invalidated precisely")
+    
+    def test_concurrent_requests(self, context_manager):
+        """Concurrent record/query calls all land and never race."""
+        print("\n[TEST] Testing concurrent ContextManager use...")
+        context_manager.clear_session()
+        errors = []
+        
+        def request(n):
+            try:
+                for i in range(5):
+                    context_manager.get_context_for_query(f"request {n}")
+                    context_manager.record_command(f"echo {n}-{i}", f"{n}-{i}", True)
+            except Exception as e:
+                errors.append(e)
+        
+        threads = [threading.Thread(target=request, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert errors == []
+        assert len(context_manager.short_term.get_recent(50, item_type="command")) == 20
+        print("[PASSED] Concurrent requests handled safely")
 
 
 class TestMemoryIntegration: